@@ -1,67 +1,68 @@
-﻿import re
-import time
+﻿import time
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from datetime import datetime
 from pytz import timezone
-from selenium import webdriver
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from dateutil.parser import parse
 from newspaper import Article
 from NewspaperScraper import NewspaperScraper, NewspaperScraperWithAuthentication
+from listing_parser import parse_browser_results
+from date_normalizer import normalize_date, normalize_dates
+from url_normalizer import normalize_url
 
 
 class MarketWatchScraper(NewspaperScraper):
     def get_pages(self, sleep_time=3):
         print('running get_pages()...')
 
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        stop = False
-        index = 1
+        with self.browser_pool.lease() as browser:
+            links = []
+            seen = set()
+            stop = False
+            index = 1
 
-        while not stop:
-            browser.get('https://www.marketwatch.com/search?q=' 
-                        + self.searchTerm 
-                        + '&m=Keyword&rpp=100'
-                        + '&mp=' + str(index)
-                        + '&bd=false&bd=false'
-                        + '&bd=' + self.dateStart.strftime('%m/%d/%Y')
-                        + '&ed=' + self.dateEnd.strftime('%m/%d/%Y')
-                        + '&ts=0')
+            while not stop:
+                search_url = ('https://www.marketwatch.com/search?q=' 
+                              + self.searchTerm 
+                              + '&m=Keyword&rpp=100'
+                              + '&mp=' + str(index)
+                              + '&bd=false&bd=false'
+                              + '&bd=' + self.dateStart.strftime('%m/%d/%Y')
+                              + '&ed=' + self.dateEnd.strftime('%m/%d/%Y')
+                              + '&ts=0')
             
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            results = soup.find_all('div', class_='searchresult')
+                self.load_page(browser, search_url)
+                self.wait_for_results(browser, 'div.searchresult', sleep_time)
             
-            if not results:
-                stop = True
-                continue
+                # Parse only the result containers, not the whole page
+                results = parse_browser_results(browser, 'div.searchresult', 'div', class_='searchresult')
+            
+                if not results:
+                    stop = True
+                    continue
                 
-            for result in results:
-                date_element = result.find('span', class_='deemphasized')
-                if date_element:
-                    pub_date = date_element.get_text().strip()
-                    if self.check_dates(pub_date):
-                        link_element = result.find('a', class_='link')
-                        if link_element:
-                            ltext = link_element.get('href')
-                            if ltext not in links:
-                                print(ltext)
-                                links.append(ltext)
-                    else:
-                        stop = True
-                        break
+                for result in results:
+                    date_element = result.find('span', class_='deemphasized')
+                    if date_element:
+                        pub_date = normalize_date(date_element.get_text())
+                        if self.check_dates(pub_date):
+                            link_element = result.find('a', class_='link')
+                            if link_element:
+                                ltext = normalize_url(link_element.get('href'), base='https://www.marketwatch.com')
+                                if self.reached_high_water_mark(ltext, pub_date):
+                                    stop = True
+                                    break
+                                if self.is_new_link(ltext, seen):
+                                    print(ltext)
+                                    links.append(ltext)
+                        else:
+                            stop = True
+                            break
             
-            index += 1
-            time.sleep(sleep_time)
+                index += 1
         
-        browser.close()
         self.links = links
         return links
 
@@ -70,87 +71,75 @@ class YahooFinanceScraper(NewspaperScraper):
     def get_pages(self, sleep_time=3):
         print('running get_pages()...')
         
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        stop = False
-        start_date_unix = int(datetime.combine(self.dateStart, datetime.min.time()).timestamp())
-        end_date_unix = int(datetime.combine(self.dateEnd, datetime.max.time()).timestamp())
+        with self.browser_pool.lease() as browser:
+            links = []
+            seen = set()
+            stop = False
+            start_date_unix = int(datetime.combine(self.dateStart, datetime.min.time()).timestamp())
+            end_date_unix = int(datetime.combine(self.dateEnd, datetime.max.time()).timestamp())
         
-        browser.get('https://finance.yahoo.com/search?q=' + self.searchTerm)
+            search_url = 'https://finance.yahoo.com/search?q=' + self.searchTerm
+            self.load_page(browser, search_url)
         
-        # Click on News tab
-        try:
-            tabs = browser.find_elements(By.CSS_SELECTOR, '.SearchTabs_root li')
-            for tab in tabs:
-                if 'News' in tab.text:
-                    tab.click()
-                    time.sleep(2)
-                    break
-        except:
-            pass
+            # Click on News tab
+            try:
+                tabs = browser.find_elements(By.CSS_SELECTOR, '.SearchTabs_root li')
+                for tab in tabs:
+                    if 'News' in tab.text:
+                        tab.click()
+                        time.sleep(2)
+                        break
+            except:
+                pass
             
-        last_height = browser.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_attempts = 20
+            last_height = browser.execute_script("return document.body.scrollHeight")
+            scroll_attempts = 0
+            max_attempts = 20
+            # Results handled by earlier scrolls; each scroll only parses the new ones
+            parsed = 0
         
-        while not stop and scroll_attempts < max_attempts:
-            # Scroll down
-            browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(sleep_time)
+            while not stop and scroll_attempts < max_attempts:
+                # Scroll down, which loads more results from the same host
+                self.rate_limiter.wait(search_url)
+                browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                time.sleep(sleep_time)
             
-            # Get current page content
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            articles = soup.find_all('div', {'data-test': 'article'})
+                # Parse only the results this scroll loaded
+                articles = parse_browser_results(browser, 'div[data-test="article"]', 'div',
+                                                 {'data-test': 'article'}, start=parsed)
+                parsed += len(articles)
             
-            for article in articles:
-                time_element = article.find('span', {'data-test': 'article-timestamp'})
-                if not time_element:
-                    continue
-                    
-                # Extract timestamp and convert to date
-                timestamp_text = time_element.get_text()
-                current_date = datetime.now()
-                
-                if 'minute' in timestamp_text:
-                    minutes = int(re.search(r'(\d+)', timestamp_text).group(1))
-                    pub_date = current_date - timedelta(minutes=minutes)
-                elif 'hour' in timestamp_text:
-                    hours = int(re.search(r'(\d+)', timestamp_text).group(1))
-                    pub_date = current_date - timedelta(hours=hours)
-                elif 'day' in timestamp_text:
-                    days = int(re.search(r'(\d+)', timestamp_text).group(1))
-                    pub_date = current_date - timedelta(days=days)
-                else:
-                    try:
-                        pub_date = datetime.strptime(timestamp_text, '%B %d, %Y')
-                    except:
+                # Convert the timestamps ("5 minutes ago", "January 5, 2025") in one batch
+                time_elements = [article.find('span', {'data-test': 'article-timestamp'}) for article in articles]
+                pub_dates = normalize_dates(element.get_text() if element else None for element in time_elements)
+            
+                for article, pub_date in zip(articles, pub_dates):
+                    if pub_date is None:
                         continue
                 
-                if self.check_dates(pub_date.strftime('%Y-%m-%d')):
-                    link_element = article.find('a')
-                    if link_element:
-                        ltext = link_element.get('href')
-                        if not ltext.startswith('http'):
-                            ltext = 'https://finance.yahoo.com' + ltext
-                        if ltext not in links:
-                            print(ltext)
-                            links.append(ltext)
-                else:
-                    oldest_date_found = pub_date.strftime('%Y-%m-%d')
-                    if pub_date < self.dateStart:
-                        stop = True
-                        break
+                    if self.check_dates(pub_date):
+                        link_element = article.find('a')
+                        if link_element:
+                            ltext = normalize_url(link_element.get('href'), base='https://finance.yahoo.com')
+                            if self.reached_high_water_mark(ltext, pub_date):
+                                stop = True
+                                break
+                            if self.is_new_link(ltext, seen):
+                                print(ltext)
+                                links.append(ltext)
+                    else:
+                        if pub_date < self.dateStart:
+                            stop = True
+                            break
             
-            # Check if we've reached the bottom
-            new_height = browser.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                scroll_attempts += 1
-            else:
-                scroll_attempts = 0
-                last_height = new_height
+                # Check if we've reached the bottom
+                new_height = browser.execute_script("return document.body.scrollHeight")
+                if new_height == last_height:
+                    scroll_attempts += 1
+                else:
+                    scroll_attempts = 0
+                    last_height = new_height
         
-        browser.close()
         self.links = links
         return links
 
@@ -159,58 +148,60 @@ class BarronsScraperWithAuthentication(NewspaperScraperWithAuthentication):
     def get_pages(self, sleep_time=3):
         print('running get_pages()...')
         
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        stop = False
-        page = 1
+        with self.browser_pool.lease() as browser:
+            links = []
+            seen = set()
+            stop = False
+            page = 1
         
-        # Login first
-        browser.get(self.login_url)
-        time.sleep(3)
+            # Login first
+            self.load_page(browser, self.login_url)
+            time.sleep(3)
         
-        # Fill in credentials
-        cred_keys = list(self.credentials.keys())
-        browser.find_element(By.ID, cred_keys[0]).send_keys(self.credentials[cred_keys[0]])
-        browser.find_element(By.ID, cred_keys[1]).send_keys(self.credentials[cred_keys[1]])
-        browser.find_element(By.ID, self.submit_id).click()
-        time.sleep(10)  # Wait for login to complete
+            # Fill in credentials
+            cred_keys = list(self.credentials.keys())
+            browser.find_element(By.ID, cred_keys[0]).send_keys(self.credentials[cred_keys[0]])
+            browser.find_element(By.ID, cred_keys[1]).send_keys(self.credentials[cred_keys[1]])
+            browser.find_element(By.ID, self.submit_id).click()
+            time.sleep(10)  # Wait for login to complete
         
-        # Now search for articles
-        while not stop:
-            search_url = ('https://www.barrons.com/search?keyword=' + self.searchTerm +
-                         '&page=' + str(page) +
-                         '&min-date=' + self.dateStart.strftime('%Y/%m/%d') +
-                         '&max-date=' + self.dateEnd.strftime('%Y/%m/%d'))
+            # Now search for articles
+            while not stop:
+                search_url = ('https://www.barrons.com/search?keyword=' + self.searchTerm +
+                             '&page=' + str(page) +
+                             '&min-date=' + self.dateStart.strftime('%Y/%m/%d') +
+                             '&max-date=' + self.dateEnd.strftime('%Y/%m/%d'))
             
-            browser.get(search_url)
-            time.sleep(sleep_time)
+                self.load_page(browser, search_url)
+                self.wait_for_results(browser, 'article.SearchResult', sleep_time)
             
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            results = soup.find_all('article', class_='SearchResult')
+                # Parse only the result containers, not the whole page
+                results = parse_browser_results(browser, 'article.SearchResult', 'article', class_='SearchResult')
             
-            if not results:
-                stop = True
-                continue
+                if not results:
+                    stop = True
+                    continue
                 
-            for result in results:
-                date_element = result.find('p', class_='SearchResult-time')
-                if date_element:
-                    pub_date = date_element.get_text().strip()
-                    if self.check_dates(pub_date):
-                        link_element = result.find('h3', class_='SearchResult-headline').find('a')
-                        if link_element:
-                            ltext = link_element.get('href')
-                            if ltext not in links:
-                                print(ltext)
-                                links.append(ltext)
-                    else:
-                        stop = True
-                        break
+                for result in results:
+                    date_element = result.find('p', class_='SearchResult-time')
+                    if date_element:
+                        pub_date = normalize_date(date_element.get_text())
+                        if self.check_dates(pub_date):
+                            link_element = result.find('h3', class_='SearchResult-headline').find('a')
+                            if link_element:
+                                ltext = normalize_url(link_element.get('href'), base='https://www.barrons.com')
+                                if self.reached_high_water_mark(ltext, pub_date):
+                                    stop = True
+                                    break
+                                if self.is_new_link(ltext, seen):
+                                    print(ltext)
+                                    links.append(ltext)
+                        else:
+                            stop = True
+                            break
             
-            page += 1
+                page += 1
             
-        browser.close()
         self.links = links
         return links
         
@@ -229,59 +220,61 @@ class FinancialTimesScraper(NewspaperScraperWithAuthentication):
     def get_pages(self, sleep_time=3):
         print('running get_pages()...')
         
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        stop = False
-        page = 1
+        with self.browser_pool.lease() as browser:
+            links = []
+            seen = set()
+            stop = False
+            page = 1
         
-        # Login first
-        browser.get(self.login_url)
-        time.sleep(3)
+            # Login first
+            self.load_page(browser, self.login_url)
+            time.sleep(3)
         
-        # Fill in credentials
-        browser.find_element(By.ID, 'email').send_keys(self.credentials['email'])
-        browser.find_element(By.ID, 'password').send_keys(self.credentials['password'])
-        browser.find_element(By.CSS_SELECTOR, 'button[type="submit"]').click()
-        time.sleep(10)  # Wait for login to complete
+            # Fill in credentials
+            browser.find_element(By.ID, 'email').send_keys(self.credentials['email'])
+            browser.find_element(By.ID, 'password').send_keys(self.credentials['password'])
+            browser.find_element(By.CSS_SELECTOR, 'button[type="submit"]').click()
+            time.sleep(10)  # Wait for login to complete
         
-        # Now search for articles
-        while not stop:
-            # Format for FT's search
-            from_date = self.dateStart.strftime('%Y-%m-%d')
-            to_date = self.dateEnd.strftime('%Y-%m-%d')
+            # Now search for articles
+            while not stop:
+                # Format for FT's search
+                from_date = self.dateStart.strftime('%Y-%m-%d')
+                to_date = self.dateEnd.strftime('%Y-%m-%d')
             
-            search_url = (f'https://www.ft.com/search?q={self.searchTerm}'
-                         f'&dateTo={to_date}&dateFrom={from_date}&page={page}')
+                search_url = (f'https://www.ft.com/search?q={self.searchTerm}'
+                             f'&dateTo={to_date}&dateFrom={from_date}&page={page}')
             
-            browser.get(search_url)
-            time.sleep(sleep_time)
+                self.load_page(browser, search_url)
+                self.wait_for_results(browser, 'li.o-teaser', sleep_time)
             
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            results = soup.find_all('li', class_='o-teaser')
+                # Parse only the result containers, not the whole page
+                results = parse_browser_results(browser, 'li.o-teaser', 'li', class_='o-teaser')
             
-            if not results:
-                stop = True
-                continue
+                if not results:
+                    stop = True
+                    continue
                 
-            for result in results:
-                date_element = result.find('div', class_='o-teaser__timestamp')
-                if date_element:
-                    pub_date = date_element.get_text().strip()
-                    if self.check_dates(pub_date):
-                        link_element = result.find('a', class_='js-teaser-heading-link')
-                        if link_element:
-                            ltext = 'https://www.ft.com' + link_element.get('href')
-                            if ltext not in links:
-                                print(ltext)
-                                links.append(ltext)
-                    else:
-                        stop = True
-                        break
+                for result in results:
+                    date_element = result.find('div', class_='o-teaser__timestamp')
+                    if date_element:
+                        pub_date = normalize_date(date_element.get_text())
+                        if self.check_dates(pub_date):
+                            link_element = result.find('a', class_='js-teaser-heading-link')
+                            if link_element:
+                                ltext = normalize_url(link_element.get('href'), base='https://www.ft.com')
+                                if self.reached_high_water_mark(ltext, pub_date):
+                                    stop = True
+                                    break
+                                if self.is_new_link(ltext, seen):
+                                    print(ltext)
+                                    links.append(ltext)
+                        else:
+                            stop = True
+                            break
             
-            page += 1
+                page += 1
             
-        browser.close()
         self.links = links
         return links
         
@@ -299,53 +292,56 @@ class SeekingAlphaScraper(NewspaperScraper):
     def get_pages(self, sleep_time=3):
         print('running get_pages()...')
         
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        stop = False
-        page = 1
+        with self.browser_pool.lease() as browser:
+            links = []
+            seen = set()
+            stop = False
+            page = 1
         
-        while not stop:
-            browser.get('https://seekingalpha.com/search?q=' + self.searchTerm + '&page=' + str(page))
-            time.sleep(sleep_time)
+            while not stop:
+                search_url = 'https://seekingalpha.com/search?q=' + self.searchTerm + '&page=' + str(page)
+                self.load_page(browser, search_url)
+                self.wait_for_results(browser, 'li.search-pages-result', sleep_time)
             
-            # Select Articles tab if on first page
-            if page == 1:
-                try:
-                    tabs = browser.find_elements(By.CSS_SELECTOR, '.tabs__tab-label')
-                    for tab in tabs:
-                        if 'Articles' in tab.text:
-                            tab.click()
-                            time.sleep(2)
-                            break
-                except:
-                    pass
+                # Select Articles tab if on first page
+                if page == 1:
+                    try:
+                        tabs = browser.find_elements(By.CSS_SELECTOR, '.tabs__tab-label')
+                        for tab in tabs:
+                            if 'Articles' in tab.text:
+                                tab.click()
+                                time.sleep(2)
+                                break
+                    except:
+                        pass
             
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            results = soup.find_all('li', class_='search-pages-result')
+                # Parse only the result containers, not the whole page
+                results = parse_browser_results(browser, 'li.search-pages-result', 'li', class_='search-pages-result')
             
-            if not results:
-                stop = True
-                continue
+                if not results:
+                    stop = True
+                    continue
                 
-            for result in results:
-                date_element = result.find('span', class_='search-result-date')
-                if date_element:
-                    pub_date = date_element.get_text().strip()
-                    if self.check_dates(pub_date):
-                        link_element = result.find('a', class_='search-result-title')
-                        if link_element:
-                            ltext = 'https://seekingalpha.com' + link_element.get('href')
-                            if ltext not in links:
-                                print(ltext)
-                                links.append(ltext)
-                    else:
-                        stop = True
-                        break
+                for result in results:
+                    date_element = result.find('span', class_='search-result-date')
+                    if date_element:
+                        pub_date = normalize_date(date_element.get_text())
+                        if self.check_dates(pub_date):
+                            link_element = result.find('a', class_='search-result-title')
+                            if link_element:
+                                ltext = normalize_url(link_element.get('href'), base='https://seekingalpha.com')
+                                if self.reached_high_water_mark(ltext, pub_date):
+                                    stop = True
+                                    break
+                                if self.is_new_link(ltext, seen):
+                                    print(ltext)
+                                    links.append(ltext)
+                        else:
+                            stop = True
+                            break
             
-            page += 1
+                page += 1
             
-        browser.close()
         self.links = links
         return links
 
@@ -354,99 +350,85 @@ class ReutersFinanceScraper(NewspaperScraper):
     def get_pages(self, sleep_time=3):
         print('running get_pages()...')
         
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        stop = False
+        with self.browser_pool.lease() as browser:
+            links = []
+            seen = set()
+            stop = False
         
-        # Reuters has a different search structure - we need to load all results by scrolling
-        search_url = 'https://www.reuters.com/site-search/?query=' + self.searchTerm + '&sort=newest'
-        browser.get(search_url)
-        time.sleep(sleep_time)
+            # Reuters has a different search structure - we need to load all results by scrolling
+            search_url = 'https://www.reuters.com/site-search/?query=' + self.searchTerm + '&sort=newest'
+            self.load_page(browser, search_url)
+            self.wait_for_results(browser, 'li.search-results__item__22R6z', sleep_time)
         
-        # Try to select "Business" category if available
-        try:
-            categories = browser.find_elements(By.CSS_SELECTOR, '.search-results__section-filter button')
-            for cat in categories:
-                if 'Business' in cat.text:
-                    cat.click()
-                    time.sleep(sleep_time)
-                    break
-        except:
-            pass
+            # Try to select "Business" category if available
+            try:
+                categories = browser.find_elements(By.CSS_SELECTOR, '.search-results__section-filter button')
+                for cat in categories:
+                    if 'Business' in cat.text:
+                        cat.click()
+                        time.sleep(sleep_time)
+                        break
+            except:
+                pass
             
-        # Scroll down to load more results until we hit the date limit or no more results
-        last_height = browser.execute_script("return document.body.scrollHeight")
-        continue_scrolling = True
-        scroll_count = 0
-        max_scrolls = 50  # Set a limit to prevent infinite scrolling
+            # Scroll down to load more results until we hit the date limit or no more results
+            last_height = browser.execute_script("return document.body.scrollHeight")
+            continue_scrolling = True
+            scroll_count = 0
+            max_scrolls = 50  # Set a limit to prevent infinite scrolling
         
-        while continue_scrolling and scroll_count < max_scrolls:
-            browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(sleep_time)
+            while continue_scrolling and scroll_count < max_scrolls:
+                # Scroll down, which loads more results from the same host
+                self.rate_limiter.wait(search_url)
+                browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                time.sleep(sleep_time)
             
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            
-            # Check the date of the last article loaded
-            results = soup.find_all('li', class_='search-results__item__22R6z')
-            if results:
-                last_result = results[-1]
-                date_element = last_result.find('time')
-                if date_element:
-                    # Parse date
-                    pub_date = date_element.get_text().strip()
-                    try:
-                        # Parse different possible date formats
-                        if 'ago' in pub_date:
-                            # Current date for relative dates like "1 hour ago"
-                            pub_date = datetime.now().strftime('%Y-%m-%d')
-                        else:
-                            # Parse absolute dates
-                            pub_date = parse(pub_date).strftime('%Y-%m-%d')
-                            
-                        # Check if we've gone past our start date
-                        if parse(pub_date) < self.dateStart:
+                # Check the date of the last article loaded, parsing only that result
+                results = parse_browser_results(browser, 'li.search-results__item__22R6z', 'li',
+                                                class_='search-results__item__22R6z', start=-1)
+                if results:
+                    last_result = results[-1]
+                    date_element = last_result.find('time')
+                    # Relative ("1 hour ago") and absolute dates are both handled
+                    pub_date = normalize_date(date_element.get_text()) if date_element else None
+                    if pub_date is not None:
+                        # Check if we've gone past our start date or into results we already have
+                        if pub_date < self.dateStart:
+                            continue_scrolling = False
+                        link_element = last_result.find('a')
+                        if link_element and self.reached_high_water_mark(
+                                normalize_url(link_element.get('href'), base='https://www.reuters.com'), pub_date):
                             continue_scrolling = False
-                    except:
-                        pass
             
-            # Check if we've reached the bottom or no new content is loading
-            new_height = browser.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                scroll_count += 1
-                # Wait a bit longer to see if more content loads
-                time.sleep(2)
-                if scroll_count >= 3:  # If we've waited for a while with no new content
-                    continue_scrolling = False
-            else:
-                scroll_count = 0
-                last_height = new_height
+                # Check if we've reached the bottom or no new content is loading
+                new_height = browser.execute_script("return document.body.scrollHeight")
+                if new_height == last_height:
+                    scroll_count += 1
+                    # Wait a bit longer to see if more content loads
+                    time.sleep(2)
+                    if scroll_count >= 3:  # If we've waited for a while with no new content
+                        continue_scrolling = False
+                else:
+                    scroll_count = 0
+                    last_height = new_height
         
-        # Now extract all the links within our date range
-        soup = BeautifulSoup(browser.page_source, 'html.parser')
-        results = soup.find_all('li', class_='search-results__item__22R6z')
+            # Now extract all the links within our date range
+            results = parse_browser_results(browser, 'li.search-results__item__22R6z', 'li',
+                                            class_='search-results__item__22R6z')
         
-        for result in results:
-            date_element = result.find('time')
-            if date_element:
-                pub_date = date_element.get_text().strip()
-                try:
-                    # Convert relative dates
-                    if 'ago' in pub_date:
-                        pub_date = datetime.now().strftime('%Y-%m-%d')
-                    else:
-                        pub_date = parse(pub_date).strftime('%Y-%m-%d')
-                        
-                    if self.check_dates(pub_date):
-                        link_element = result.find('a')
-                        if link_element:
-                            ltext = 'https://www.reuters.com' + link_element.get('href')
-                            if ltext not in links:
-                                print(ltext)
-                                links.append(ltext)
-                except:
-                    continue
+            date_elements = [result.find('time') for result in results]
+            pub_dates = normalize_dates(element.get_text() if element else None for element in date_elements)
+        
+            for result, pub_date in zip(results, pub_dates):
+                if pub_date is not None and self.check_dates(pub_date):
+                    link_element = result.find('a')
+                    if link_element:
+                        ltext = normalize_url(link_element.get('href'), base='https://www.reuters.com')
+                        if self.reached_high_water_mark(ltext, pub_date):
+                            break
+                        if self.is_new_link(ltext, seen):
+                            print(ltext)
+                            links.append(ltext)
                     
-        browser.close()
         self.links = links
-        return links
+        return links
@@ -1,17 +1,18 @@
 ﻿import re
-import time
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from dateutil.parser import parse
 from newspaper import Article
 from NewspaperScraper import NewspaperScraper
+from rate_limiter import get_rate_limiter
+from browser_pool import get_browser_pool
+from http_client import fetch_html
+from listing_parser import parse_results, parse_browser_results
+from url_normalizer import normalize_url
 
 class FinancialStockScraper:
     """
@@ -48,7 +49,8 @@ class FinancialStockScraper:
         
         self.results["Yahoo Finance"] = {
             "links": links,
-            "count": len(links)
+            "count": len(links),
+            "listing_path": scraper.listing_path
         }
         
         return links
@@ -58,10 +60,9 @@ class FinancialStockScraper:
         print(f"Scraping MarketWatch for {self.ticker}...")
         
         links = []
+        seen = set()
+        listing_path = None
         try:
-            service = Service(ChromeDriverManager().install())
-            browser = webdriver.Chrome(service=service)
-            
             # MarketWatch uses different URL format for stocks
             # Extract the ticker without exchange suffix if any
             base_ticker = self.ticker.split('.')[0]
@@ -76,49 +77,92 @@ class FinancialStockScraper:
             if '.AX' in self.ticker:
                 urls_to_try.append(f"https://www.marketwatch.com/investing/stock/{base_ticker}?countrycode=au")
             
-            success = False
+            # Try plain HTTP first; stock pages usually list their news server-side
+            articles = []
             for url in urls_to_try:
-                browser.get(url)
-                time.sleep(3)
-                
-                # Check if we landed on a valid page
-                if "not found" not in browser.title.lower():
-                    success = True
-                    break
+                html = fetch_html(url)
+                if html:
+                    articles = parse_results(html, 'div', class_='element--article')
+                    if articles:
+                        listing_path = 'http'
+                        break
+            
+            # Fall back to a browser when no page had the article containers
+            if not articles:
+                with get_browser_pool().lease() as browser:
+                    success = False
+                    rate_limiter = get_rate_limiter()
+                    for url in urls_to_try:
+                        rate_limiter.wait(url)
+                        browser.get(url)
+                        
+                        # Check if we landed on a valid page
+                        if "not found" not in browser.title.lower():
+                            success = True
+                            break
+                    
+                    if success:
+                        # Find news articles
+                        articles = parse_browser_results(browser, 'div.element--article', 'div',
+                                                         class_='element--article')
+                        listing_path = 'browser'
             
-            if success:
-                # Find news articles
-                soup = BeautifulSoup(browser.page_source, 'html.parser')
-                articles = soup.find_all('div', class_='element--article')
-                
-                for article in articles:
-                    link_element = article.find('a', class_='link')
-                    if link_element:
-                        link = link_element.get('href')
-                        if link not in links:
-                            print(f"Found MarketWatch article: {link}")
-                            links.append(link)
+            for article in articles:
+                link_element = article.find('a', class_='link')
+                if link_element:
+                    link = normalize_url(link_element.get('href'), base='https://www.marketwatch.com')
+                    if link not in seen:
+                        seen.add(link)
+                        print(f"Found MarketWatch article: {link}")
+                        links.append(link)
             
-            browser.close()
         except Exception as e:
             print(f"Error scraping MarketWatch: {e}")
         
         self.results["MarketWatch"] = {
             "links": links,
-            "count": len(links)
+            "count": len(links),
+            "listing_path": listing_path
         }
         
         return links
     
-    def scrape_all_sources(self):
-        """Scrape news from all available sources"""
-        self.scrape_yahoo_finance()
-        self.scrape_marketwatch()
+    def _scrape_source(self, source, scrape):
+        """Run one source's scraper, recording an empty result if it fails"""
+        try:
+            scrape()
+        except Exception as e:
+            print(f"Error scraping {source}: {e}")
+            self.results[source] = {
+                "links": [],
+                "count": 0,
+                "error": str(e)
+            }
+    
+    def scrape_all_sources(self, workers=1):
+        """Scrape news from all available sources
         
-        # Combine all results
+        Args:
+            workers (int, optional): Number of sources to scrape at the same
+                time. Each source runs on its own thread with its own browser
+                from the shared pool; a failing source doesn't stop the others.
+        """
+        sources = [
+            ("Yahoo Finance", self.scrape_yahoo_finance),
+            ("MarketWatch", self.scrape_marketwatch)
+        ]
+        
+        # Make sure every concurrent source can lease a browser
+        get_browser_pool(workers)
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for source, scrape in sources:
+                executor.submit(self._scrape_source, source, scrape)
+        
+        # Combine all results, in source order whatever order they finished in
         all_links = []
-        for source, data in self.results.items():
-            all_links.extend(data["links"])
+        for source, _ in sources:
+            all_links.extend(self.results[source]["links"])
         
         return all_links
     
@@ -150,7 +194,7 @@ class FinancialStockScraper:
         for source, data in self.results.items():
             count = data["count"]
             total += count
-            print(f"{source}: {count} articles")
+            print(f"{source}: {count} articles (via {data.get('listing_path') or 'n/a'})")
         
         print("----------------------------")
         print(f"Total: {total} articles")
@@ -158,4 +202,4 @@ class FinancialStockScraper:
 
 
 # Import Yahoo Finance stock scraper implementation
-from YahooFinanceStockScraper import YahooFinanceStockScraper
+from YahooFinanceStockScraper import YahooFinanceStockScraper
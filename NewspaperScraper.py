@@ -1,6 +1,8 @@
 ﻿import re
+import os
 import csv
 import time
+import itertools
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
@@ -10,17 +12,36 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from dateutil.parser import parse
 from newspaper import Article
+from selenium.common.exceptions import TimeoutException
+from rate_limiter import get_rate_limiter
+from browser_pool import get_browser_pool
+from http_client import download_html
+from date_normalizer import normalize_date, LOCAL_TZ
+from url_normalizer import normalize_url, canonical_link
+from metrics import timed
 
 
 class NewspaperScraper:
-    def __init__ (self, newspaper, searchTerm, dateStart, dateEnd):
+    def __init__ (self, newspaper, searchTerm, dateStart, dateEnd, url_index=None):
         self.newspaper = newspaper
         self.searchTerm = searchTerm
-        self.dateStart = parse(dateStart)
-        self.dateEnd = parse(dateEnd)
+        # The date range, as timezone-aware local datetimes
+        self.dateStart = normalize_date(dateStart).astimezone(LOCAL_TZ)
+        self.dateEnd = normalize_date(dateEnd).astimezone(LOCAL_TZ)
         self.links = []
+        self.rate_limiter = get_rate_limiter()
+        self.browser_pool = get_browser_pool()
+        # Optional UrlIndex of stored articles, shared with the fetch stage
+        self.url_index = url_index
+        # Optional HtmlCache that keeps downloaded article HTML
+        self.html_cache = None
+        # Newest (date, url) stored by an earlier run; listings stop once they reach it
+        self.high_water_mark = None
+        # Newest (date, url) listed by this run, saved as the next high-water mark
+        self.newest_seen = None
+        # Articles iter_articles could not download or parse in this run
+        self.failed_count = 0
 
     def get_newspaper_name (self):
         return self.newspaper
@@ -29,33 +50,114 @@ class NewspaperScraper:
         print('Unimplemented for ' + self.newspaper + ' scraper')
         return
 
+    def is_new_link (self, link, seen):
+        # O(1) dedup against links collected so far and articles already stored.
+        # Links are normalized by the scrapers as they are read, so variants
+        # of one URL (tracking parameters, AMP pages, regional hosts) match.
+        if link in seen:
+            return False
+        seen.add(link)
+        return self.url_index is None or link not in self.url_index
+
+    def reached_high_water_mark (self, link, pub_date):
+        # Record the newest listing entry, and tell the caller to stop once it
+        # reaches the link or date an earlier run ended at. Listings are newest
+        # first, so everything after that point is already known.
+        pub_date = normalize_date(pub_date)
+        if pub_date is not None and (self.newest_seen is None or pub_date > self.newest_seen[0]):
+            self.newest_seen = (pub_date, link)
+
+        if self.high_water_mark is None:
+            return False
+        mark_date, mark_url = self.high_water_mark
+        return link == mark_url or (pub_date is not None and pub_date < mark_date)
+
+    def load_high_water_mark (self, db):
+        # Resume from where the last run for this search term and source ended.
+        # A mark newer than the date range would stop the listing at its first
+        # entry, so it only applies to ranges that run up to the mark.
+        mark = db.get_scrape_state(self.searchTerm, self.newspaper)
+        if mark is not None and mark[0].astimezone(LOCAL_TZ).date() > self.dateEnd.date():
+            mark = None
+        if mark is not None:
+            # Marks saved before links were normalized hold the raw link
+            mark = (mark[0], normalize_url(mark[1]))
+        self.high_water_mark = mark
+        return mark
+
+    def save_high_water_mark (self, db):
+        # Call once the listed articles are stored; the mark only moves forward.
+        # It stays put if any article failed, so the next run lists it again.
+        if self.failed_count:
+            print(f'Keeping the previous high-water mark: {self.failed_count} articles failed')
+            return
+        if self.newest_seen is not None:
+            db.update_scrape_state(self.searchTerm, self.newspaper, *self.newest_seen)
+
+    def load_page (self, browser, url):
+        # Wait for the site's rate limit, then load a page in a leased browser
+        self.rate_limiter.wait(url)
+        with timed('listing.page_load', source=self.newspaper):
+            browser.get(url)
+
+    def wait_for_results (self, browser, css_selector, timeout=10):
+        # Wait until the results have rendered instead of sleeping a fixed time
+        with timed('listing.wait_for_results', source=self.newspaper) as timing:
+            try:
+                WebDriverWait(browser, timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+                )
+                return True
+            except TimeoutException:
+                timing.outcome = 'timeout'
+                return False
+
     def check_dates (self, date):
-        page_date = parse(date)
-        if page_date >= self.dateStart and page_date <= self.dateEnd:
-            return True
-        return False
+        # date can be a listing string ("Jan 5, 2025", "3 hours ago") or a
+        # datetime; both ends of the range are whole days in local time
+        page_date = normalize_date(date)
+        if page_date is None:
+            return False
+        page_day = page_date.astimezone(LOCAL_TZ).date()
+        return self.dateStart.date() <= page_day <= self.dateEnd.date()
 
     def newspaper_parser (self, sleep_time=0):
+        # Builds the full list in memory; prefer iter_articles() for large runs
+        return list(self.iter_articles(sleep_time))
+
+    def iter_articles (self, sleep_time=0):
+        # Yield each parsed article as soon as it is ready, so writers can
+        # consume records one at a time and memory stays flat
         print('running newspaper_parser()...')
 
-        results = []
         count = 0
 
         for l in self.links:
             article = Article(url=l)
             try:
-                article.build()
+                with timed('article.download', source=self.newspaper) as timing:
+                    html = download_html(l, cache=self.html_cache, extra={'source': self.newspaper},
+                                         rate_limiter=self.rate_limiter)
+                    timing.bytes = len(html)
+                with timed('article.parse', source=self.newspaper) as timing:
+                    timing.bytes = len(html)
+                    article.download(input_html=html)
+                    article.parse()
+                with timed('article.nlp', source=self.newspaper) as timing:
+                    timing.bytes = len(article.text or '')
+                    article.nlp()
             except:
+                self.failed_count += 1
                 time.sleep(60)
                 continue
 
             data = {
                 'title': article.title,
-                'date_published': article.publish_date,
+                'date_published': normalize_date(article.publish_date),
                 'news_outlet': self.newspaper,
                 'authors': article.authors,
                 'feature_img': article.top_image,
-                'article_link': article.canonical_link,
+                'article_link': canonical_link(l, article.canonical_link),
                 'keywords': article.keywords,
                 'movies': article.movies,
                 'summary': article.summary,
@@ -67,24 +169,50 @@ class NewspaperScraper:
             print(data['text'])
             print()
             print()
-            results.append(data)
 
             count += 1
             print(count)
+            yield data
             time.sleep(sleep_time)
 
-        return results
-
-    def write_to_csv (self, data, file_name):
+    def write_to_csv (self, data, file_name, append=False):
+        # data can be a list or a generator such as iter_articles(); rows are
+        # written and flushed one at a time. Returns the number of rows written.
+        # With append=True (an incremental run) rows are added to an existing
+        # file, skipping articles it already holds, instead of replacing it.
         print('writing to CSV...')
 
-        keys = data[0].keys()
-        with open(file_name, 'w', newline='', encoding='utf-8') as output_file:
-            dict_writer = csv.DictWriter(output_file, keys)
-            dict_writer.writeheader()
-            dict_writer.writerows(data)
+        data = iter(data)
+        first = next(data, None)
+        if first is None:
+            return 0
+
+        fieldnames = list(first.keys())
+        stored_links = set()
+        if append and os.path.exists(file_name):
+            with open(file_name, newline='', encoding='utf-8') as input_file:
+                reader = csv.DictReader(input_file)
+                if reader.fieldnames:
+                    fieldnames = reader.fieldnames
+                stored_links = {row.get('article_link') for row in reader}
+
+        count = 0
+        with open(file_name, 'a' if stored_links else 'w', newline='', encoding='utf-8') as output_file:
+            dict_writer = csv.DictWriter(output_file, fieldnames, extrasaction='ignore')
+            if not stored_links:
+                dict_writer.writeheader()
+            for d in itertools.chain([first], data):
+                if d['article_link'] in stored_links:
+                    continue
+                stored_links.add(d['article_link'])
+                dict_writer.writerow(d)
+                output_file.flush()
+                count += 1
+
+        return count
 
     def write_to_mongo (self, data, collection):
+        # data can be a list or a generator; each record is inserted as it arrives
         print('writing to mongoDB...')
         count = 0
 
@@ -93,9 +221,11 @@ class NewspaperScraper:
             count += 1
             print(count)
 
+        return count
+
 
 class NewspaperScraperWithAuthentication(NewspaperScraper):
     def __init__ (self, newspaper, searchTerm, dateStart, dateEnd, userID, password):
         NewspaperScraper.__init__(self, newspaper, searchTerm, dateStart, dateEnd)
         self.userId = userID
-        self.password = password
+        self.password = password
@@ -1,6 +1,12 @@
 ﻿import sys
+import argparse
 from pymongo import MongoClient
 from NewspaperScraper import NewspaperScraper
+from news_database import NewsDatabase
+from html_cache import HtmlCache
+from browser_pool import get_browser_pool
+from concurrent.futures import ThreadPoolExecutor
+from metrics import get_metrics, profiled, timed, PROFILERS
 from FinancialNewsScraper import (
     MarketWatchScraper,
     YahooFinanceScraper,
@@ -20,26 +26,43 @@ except Exception as e:
     mongodb_available = False
 
 
+html_cache = None
+
+
+def get_html_cache():
+    """Get the HTML cache shared by the scrapers in this run"""
+    global html_cache
+    if html_cache is None:
+        html_cache = HtmlCache()
+    return html_cache
+
+
 def run_scraper(scraper):
     """
     Run the scraper workflow: get pages, parse articles, and store in MongoDB or CSV
     """
     print(f"Starting scraper for {scraper.get_newspaper_name()}...")
-    scraper.get_pages()
-    data = scraper.newspaper_parser()
+    if scraper.html_cache is None:
+        scraper.html_cache = get_html_cache()
+    with timed('listing.get_pages', source=scraper.get_newspaper_name()):
+        scraper.get_pages()
     
-    if not data:
-        print(f"No articles found or parsed for {scraper.get_newspaper_name()}")
-        return
+    # Stream parsed articles straight into the output as they are ready
+    data = scraper.iter_articles()
     
     if mongodb_available:
         collection_name = f"articles_{scraper.searchTerm.replace(' ', '_').lower()}"
-        scraper.write_to_mongo(data, db[collection_name])
+        count = scraper.write_to_mongo(data, db[collection_name])
     else:
         file_name = f"{scraper.get_newspaper_name().replace(' ', '_').lower()}_{scraper.searchTerm.replace(' ', '_').lower()}.csv"
-        scraper.write_to_csv(data, file_name)
+        # An incremental run only lists new articles, so add them to the last run's file
+        count = scraper.write_to_csv(data, file_name, append=scraper.high_water_mark is not None)
     
-    print(f"Completed scraper for {scraper.get_newspaper_name()}. Found {len(data)} articles.")
+    if not count:
+        print(f"No articles found or parsed for {scraper.get_newspaper_name()}")
+        return
+    
+    print(f"Completed scraper for {scraper.get_newspaper_name()}. Found {count} articles.")
 
 
 def initialize_financial_scraper(args):
@@ -47,12 +70,16 @@ def initialize_financial_scraper(args):
     Initialize the appropriate scraper based on command line arguments
     
     Usage: python RunFinancialScrapers.py [news_source] [search_term] [start_date] [end_date] [username] [password]
+           [--metrics PREFIX] [--profile cprofile|pyinstrument] [--profile-output FILE]
     
-    Username and password are only required for Barrons and Financial Times
+    Username and password are only required for Barrons and Financial Times.
+    Use "All" as the news source to run every source that doesn't need a login,
+    with an optional number of parallel sources in place of the username.
     """
     if len(args) < 5:
         print("Usage: python RunFinancialScrapers.py [news_source] [search_term] [start_date] [end_date] [username] [password]")
         print("Username and password are only required for Barrons and Financial Times")
+        print("Options: --metrics PREFIX (write a run report), --profile cprofile|pyinstrument")
         return
         
     source = args[1]
@@ -60,25 +87,77 @@ def initialize_financial_scraper(args):
     start_date = args[3]
     end_date = args[4]
     
-    if source == "MarketWatch":
-        run_scraper(MarketWatchScraper(source, search_term, start_date, end_date))
+    if source == "All":
+        workers = int(args[5]) if len(args) >= 6 else 4
+        run_all_financial_scrapers(search_term, start_date, end_date, workers=workers)
+    elif source == "MarketWatch":
+        run_scrapers([MarketWatchScraper(source, search_term, start_date, end_date)])
     elif source == "Yahoo Finance":
-        run_scraper(YahooFinanceScraper(source, search_term, start_date, end_date))
+        run_scrapers([YahooFinanceScraper(source, search_term, start_date, end_date)])
     elif source == "Seeking Alpha":
-        run_scraper(SeekingAlphaScraper(source, search_term, start_date, end_date))
+        run_scrapers([SeekingAlphaScraper(source, search_term, start_date, end_date)])
     elif source == "Reuters Finance":
-        run_scraper(ReutersFinanceScraper(source, search_term, start_date, end_date))
+        run_scrapers([ReutersFinanceScraper(source, search_term, start_date, end_date)])
     elif source == "Barrons" and len(args) >= 7:
-        run_scraper(BarronsScraperWithAuthentication(source, search_term, start_date, end_date, args[5], args[6]))
+        run_scrapers([BarronsScraperWithAuthentication(source, search_term, start_date, end_date, args[5], args[6])])
     elif source == "Financial Times" and len(args) >= 7:
-        run_scraper(FinancialTimesScraper(source, search_term, start_date, end_date, args[5], args[6]))
+        run_scrapers([FinancialTimesScraper(source, search_term, start_date, end_date, args[5], args[6])])
     else:
         print(f"Error: {source} is either not supported or requires username/password")
-        print("Supported sources: MarketWatch, Yahoo Finance, Seeking Alpha, Reuters Finance, Barrons*, Financial Times*")
+        print("Supported sources: All, MarketWatch, Yahoo Finance, Seeking Alpha, Reuters Finance, Barrons*, Financial Times*")
         print("* Requires login credentials")
 
 
-def run_all_financial_scrapers(search_term, start_date, end_date, barrons_creds=None, ft_creds=None):
+def run_scraper_isolated(scraper):
+    """
+    Run a scraper, reporting its errors instead of raising them
+    """
+    try:
+        run_scraper(scraper)
+        return True
+    except Exception as e:
+        print(f"Error with {scraper.get_newspaper_name()} scraper: {str(e)}")
+        return False
+
+
+def run_scrapers(scrapers, workers=1, incremental=True):
+    """
+    Run scrapers one after another, or up to `workers` at the same time
+    
+    With incremental=True each scraper's listing stops at the newest article
+    the last run for its search term and source saw. The marks are kept in
+    the article database and only move forward for scrapers that finished
+    without failed articles. CSV output is then appended to the last run's file.
+    """
+    state_db = NewsDatabase() if incremental else None
+    try:
+        if state_db:
+            for scraper in scrapers:
+                scraper.load_high_water_mark(state_db)
+        
+        if workers <= 1:
+            results = [run_scraper_isolated(scraper) for scraper in scrapers]
+        else:
+            # Make sure every concurrent source can lease a browser
+            get_browser_pool(workers)
+            # Create the shared cache up front rather than racing to create it on the threads
+            get_html_cache()
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run_scraper_isolated, scrapers))
+        
+        # Save the marks here; the database connection stays on this thread
+        if state_db:
+            for scraper, finished in zip(scrapers, results):
+                if finished:
+                    scraper.save_high_water_mark(state_db)
+    finally:
+        if state_db:
+            state_db.close()
+
+
+def run_all_financial_scrapers(search_term, start_date, end_date, barrons_creds=None, ft_creds=None, workers=1,
+                               incremental=True):
     """
     Run all available financial news scrapers with the same search parameters
     
@@ -88,6 +167,11 @@ def run_all_financial_scrapers(search_term, start_date, end_date, barrons_creds=
         end_date (str): End date in format YYYY-MM-DD
         barrons_creds (tuple): Optional (username, password) for Barrons
         ft_creds (tuple): Optional (username, password) for Financial Times
+        workers (int): Number of sources to run at the same time. Each source
+            runs on its own thread and browser, so total time is about that
+            of the slowest source instead of the sum of all of them.
+        incremental (bool): Stop each listing at the newest article the
+            last run for that source saw
     """
     scrapers = [
         MarketWatchScraper("MarketWatch", search_term, start_date, end_date),
@@ -107,13 +191,28 @@ def run_all_financial_scrapers(search_term, start_date, end_date, barrons_creds=
             "Financial Times", search_term, start_date, end_date, ft_creds[0], ft_creds[1]
         ))
     
-    for scraper in scrapers:
-        try:
-            run_scraper(scraper)
-        except Exception as e:
-            print(f"Error with {scraper.get_newspaper_name()} scraper: {str(e)}")
-            continue
+    run_scrapers(scrapers, workers=workers, incremental=incremental)
+
+
+def main(argv):
+    """
+    Run the scrapers named on the command line, optionally recording per-stage
+    metrics (--metrics PREFIX) or profiling the run (--profile)
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('--metrics', metavar='PREFIX')
+    parser.add_argument('--profile', choices=PROFILERS)
+    parser.add_argument('--profile-output')
+    options, args = parser.parse_known_args(argv[1:])
+    
+    with profiled(options.profile, options.profile_output):
+        initialize_financial_scraper(argv[:1] + args)
+    
+    if options.metrics:
+        print(get_metrics().summary())
+        json_path, prom_path = get_metrics().write_report(options.metrics)
+        print(f"Run report written to {json_path} and {prom_path}")
 
 
 if __name__ == "__main__":
-    initialize_financial_scraper(sys.argv)
+    main(sys.argv)
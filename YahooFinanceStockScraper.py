@@ -1,22 +1,19 @@
-﻿from datetime import datetime, timedelta
-import time
-import re
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+﻿import requests
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from dateutil.parser import parse
 from newspaper import Article
 from NewspaperScraper import NewspaperScraper
+from http_client import fetch_html, NotModified
+from listing_parser import parse_results, parse_browser_results
+from date_normalizer import normalize_dates
+from url_normalizer import normalize_url
 
 class YahooFinanceStockScraper(NewspaperScraper):
     """A specialized scraper for Yahoo Finance stock news"""
     
-    def __init__(self, newspaper, ticker, dateStart, dateEnd):
+    def __init__(self, newspaper, ticker, dateStart, dateEnd, url_index=None):
         """
         Initialize with a stock ticker instead of a search term
         
@@ -25,122 +22,145 @@ class YahooFinanceStockScraper(NewspaperScraper):
             ticker (str): Stock ticker symbol (e.g., 'AAPL', 'WOW.AX')
             dateStart (str): Start date in format YYYY-MM-DD
             dateEnd (str): End date in format YYYY-MM-DD
+            url_index (UrlIndex, optional): Index of stored articles; links
+                already in it are skipped
         """
-        super().__init__(newspaper, ticker, dateStart, dateEnd)
+        super().__init__(newspaper, ticker, dateStart, dateEnd, url_index)
         self.ticker = ticker
+        # Which path loaded the last quote page: 'http' or 'browser'
+        self.listing_path = None
         
     def get_pages(self, sleep_time=3):
         print(f'running get_pages() for ticker {self.ticker}...')
         
-        service = Service(ChromeDriverManager().install())
-        browser = webdriver.Chrome(service=service)
-        links = []
-        
         # Go directly to the stock quote page
         quote_url = f'https://au.finance.yahoo.com/quote/{self.ticker}'
-        browser.get(quote_url)
-        
-        print(f"Loaded quote page for {self.ticker}")
-        time.sleep(sleep_time)
+        links = []
         
         # Find the News tab content
         try:
+            news_panel = self._load_quote_page(quote_url)
+            links = self._extract_links(news_panel)
+        except NotModified:
+            # Same page as last time, so there is nothing new to list
+            self.listing_path = 'not modified'
+        except Exception as e:
+            print(f"Error extracting news: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        print(f"Found {len(links)} articles for {self.ticker} (via {self.listing_path})")
+        self.links = links
+        return links
+    
+    def _has_news(self, news_panel):
+        """Check whether a parsed news panel contains the news story items"""
+        return news_panel is not None and news_panel.find('section', attrs={'data-testid': 'storyitem'}) is not None
+    
+    def _load_quote_page(self, quote_url):
+        """Load the quote page and parse its news panel, trying plain HTTP
+        before starting a browser
+        
+        Only the news panel is parsed, not the rest of the page. It is
+        returned, or None if the page has no news panel.
+        
+        The news panel is usually server-rendered, so the browser is only
+        needed when the HTTP response doesn't contain it. The path used is
+        recorded in self.listing_path ('http' or 'browser').
+        
+        If self.html_cache is set, the HTTP request is conditional and raises
+        NotModified when the page hasn't changed since the last scrape.
+        """
+        html = fetch_html(quote_url, rate_limiter=self.rate_limiter, cache=self.html_cache)
+        if html:
+            panels = parse_results(html, 'div', id='tabpanel-news')
+            if panels and self._has_news(panels[0]):
+                self.listing_path = 'http'
+                print(f"Loaded quote page for {self.ticker} over HTTP")
+                return panels[0]
+            print("News panel missing from HTTP response, falling back to browser")
+            if self.html_cache is not None:
+                # An unchanged copy of this page would still need the browser
+                self.html_cache.set_validators(quote_url, {})
+        
+        self.listing_path = 'browser'
+        with self.browser_pool.lease() as browser:
+            self.load_page(browser, quote_url)
+            
+            print(f"Loaded quote page for {self.ticker}")
+            
             # Wait for the news panel to load
             WebDriverWait(browser, 10).until(
                 EC.presence_of_element_located((By.ID, "tabpanel-news"))
             )
             
-            # Get all story items
-            soup = BeautifulSoup(browser.page_source, 'html.parser')
-            news_panel = soup.find('div', id='tabpanel-news')
+            panels = parse_browser_results(browser, '#tabpanel-news', 'div', id='tabpanel-news')
+            return panels[0] if panels else None
+    
+    def _story_time(self, story):
+        """Get the relative publish time of a story item, e.g. "2 hours ago"
+        
+        The publishing line reads "<source> • <time>"; None if there is no time.
+        """
+        date_element = story.find('div', class_='publishing')
+        if date_element:
+            date_text = date_element.get_text().strip()
+            if "•" in date_text:
+                return date_text.split("•")[1].strip()
+        return None
+    
+    def _extract_links(self, news_panel):
+        """Get the article links from the parsed news panel of a quote page"""
+        links = []
+        seen = set()
+    
+        if news_panel:
+            # Find all story items - trying multiple selectors
+            story_items = news_panel.find_all('section', attrs={'data-testid': 'storyitem'})
+        
+            print(f"Found {len(story_items)} news articles")
+        
+            # Convert the stories' relative times ("2 hours ago") in one batch
+            pub_dates = normalize_dates(self._story_time(story) for story in story_items)
+        
+            for story, pub_date in zip(story_items, pub_dates):
+                # Try multiple ways to find the link
+                link_element = None
+            
+                # Method 1: Look for the title link
+                link_element = story.find('a', class_='subtle-link fin-size-small titles noUnderline')
             
-            if news_panel:
-                # Find all story items - trying multiple selectors
-                story_items = news_panel.find_all('section', attrs={'data-testid': 'storyitem'})
+                # Method 2: Try any a tag with 'subtle-link' class
+                if not link_element:
+                    link_element = story.find('a', class_='subtle-link')
+            
+                # Method 3: Try any a tag
+                if not link_element:
+                    link_element = story.find('a')
+            
+                if link_element and link_element.get('href'):
+                    article_url = normalize_url(link_element.get('href'), base='https://au.finance.yahoo.com')
+                    print(f"Found article URL: {article_url}")
                 
-                print(f"Found {len(story_items)} news articles")
+                    # Default - include all articles regardless of date
+                    include_article = True
                 
-                for story in story_items:
-                    # Try multiple ways to find the link
-                    link_element = None
-                    
-                    # Method 1: Look for the title link
-                    link_element = story.find('a', class_='subtle-link fin-size-small titles noUnderline')
-                    
-                    # Method 2: Try any a tag with 'subtle-link' class
-                    if not link_element:
-                        link_element = story.find('a', class_='subtle-link')
-                    
-                    # Method 3: Try any a tag
-                    if not link_element:
-                        link_element = story.find('a')
-                    
-                    if link_element and link_element.get('href'):
-                        article_url = link_element.get('href')
-                        print(f"Found article URL: {article_url}")
-                        
-                        # Default - include all articles regardless of date
-                        include_article = True
-                        
-                        # Try to get the date
-                        date_element = story.find('div', class_='publishing')
-                        if date_element:
-                            date_text = date_element.get_text().strip()
-                            print(f"Found date text: {date_text}")
-                            
-                            # Extract the time ago part (after the "•" symbol)
-                            if "•" in date_text:
-                                time_ago = date_text.split("•")[1].strip()
-                                
-                                # Try to convert relative time to date
-                                try:
-                                    current_date = datetime.now()
-                                    
-                                    if 'minute' in time_ago:
-                                        minutes = int(re.search(r'(\d+)', time_ago).group(1))
-                                        pub_date = current_date - timedelta(minutes=minutes)
-                                    elif 'hour' in time_ago:
-                                        hours = int(re.search(r'(\d+)', time_ago).group(1))
-                                        pub_date = current_date - timedelta(hours=hours)
-                                    elif 'day' in time_ago:
-                                        days = int(re.search(r'(\d+)', time_ago).group(1))
-                                        pub_date = current_date - timedelta(days=days)
-                                    elif 'month' in time_ago:
-                                        months = int(re.search(r'(\d+)', time_ago).group(1))
-                                        # Approximate months as 30 days
-                                        pub_date = current_date - timedelta(days=30*months)
-                                    elif 'year' in time_ago:
-                                        years = int(re.search(r'(\d+)', time_ago).group(1))
-                                        # Approximate years as 365 days
-                                        pub_date = current_date - timedelta(days=365*years)
-                                    else:
-                                        # Default to current date if format not recognized
-                                        pub_date = current_date
-                                    
-                                    print(f"Parsed date: {pub_date}, Looking for range {self.dateStart} to {self.dateEnd}")
-                                    
-                                    # Check if date is within our range
-                                    if pub_date.date() >= self.dateStart.date() and pub_date.date() <= self.dateEnd.date():
-                                        print(f"Date is within range")
-                                        include_article = True
-                                    else:
-                                        print(f"Article date out of range: {time_ago}")
-                                        # For now, include all articles as we're debugging
-                                        include_article = True
-                                except Exception as e:
-                                    print(f"Error parsing date '{time_ago}': {e}")
-                                    # If we can't parse the date, include the article anyway
-                                    include_article = True
-                        
-                        if include_article and article_url not in links:
-                            print(f"Adding article: {article_url}")
-                            links.append(article_url)
-        except Exception as e:
-            print(f"Error extracting news: {e}")
-            import traceback
-            traceback.print_exc()
+                    if pub_date is not None:
+                        print(f"Parsed date: {pub_date}, Looking for range {self.dateStart} to {self.dateEnd}")
+                        if self.check_dates(pub_date):
+                            print(f"Date is within range")
+                        else:
+                            print(f"Article date out of range: {pub_date}")
+                            # For now, include all articles as we're debugging
+                            include_article = True
+                
+                    # Stories are newest first, so stop at the first one an earlier run saw
+                    if self.reached_high_water_mark(article_url, pub_date):
+                        print(f"Reached previously seen article: {article_url}")
+                        break
+                
+                    if include_article and self.is_new_link(article_url, seen):
+                        print(f"Adding article: {article_url}")
+                        links.append(article_url)
         
-        browser.close()
-        print(f"Found {len(links)} articles for {self.ticker}")
-        self.links = links
-        return links
+        return links
@@ -1,108 +1,421 @@
-﻿import time
-import random
+﻿from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from itertools import islice, repeat
 from newspaper import Article
+from newspaper import nlp as newspaper_nlp
+from newspaper.configuration import Configuration
 from datetime import datetime
-from news_database import NewsDatabase
+from news_database import NewsDatabase, NLP_PENDING, NLP_DONE, NLP_FAILED
+from rate_limiter import get_rate_limiter
+from http_client import download_html, NotModified
+from html_cache import HtmlCache
+from metrics import timed
+from near_duplicates import fingerprint
+from url_normalizer import normalize_url, canonical_link
+
+def get_source_name(url):
+    """Get the news source name from an article URL"""
+    source = 'Unknown'
+    if 'yahoo.com' in url:
+        source = 'Yahoo Finance'
+    elif 'bloomberg.com' in url:
+        source = 'Bloomberg'
+    elif 'reuters.com' in url:
+        source = 'Reuters'
+    elif 'marketwatch.com' in url:
+        source = 'MarketWatch'
+    elif 'seekingalpha.com' in url:
+        source = 'Seeking Alpha'
+    elif 'ft.com' in url:
+        source = 'Financial Times'
+    return source
+
+# Summary length and keyword count limits, the same ones Article.nlp() uses
+NLP_CONFIG = Configuration()
+
+def summarize_text(title, text):
+    """Compute an article's summary and keywords, returning (summary, keywords)
+
+    Does what newspaper3k's Article.nlp() does, from the stored title and
+    text alone, so it can run long after the article was downloaded.
+    """
+    with timed('article.nlp') as timing:
+        timing.bytes = len(text or '')
+        newspaper_nlp.load_stopwords(NLP_CONFIG.get_language())
+        title_keywords = list(newspaper_nlp.keywords(title or '').keys())
+        text_keywords = list(newspaper_nlp.keywords(text or '').keys())
+        keywords = list(set(title_keywords + text_keywords))[:NLP_CONFIG.MAX_KEYWORDS]
+        sentences = newspaper_nlp.summarize(title=title or '', text=text or '',
+                                            max_sents=NLP_CONFIG.MAX_SUMMARY_SENT)
+        return '\n'.join(sentences), keywords
+
+def _safe_summarize(article_id, title, text):
+    """Run summarize_text, returning (article_id, summary, keywords, error)"""
+    try:
+        return (article_id,) + summarize_text(title, text) + (None,)
+    except Exception as e:
+        return article_id, None, None, str(e)
+
+def extract_article(url, html, nlp=True, duplicates=None):
+    """Parse downloaded article HTML, returning its fields as a dict
+
+    This is a module-level function so it can run in worker processes.
+    With nlp=False the summary and keywords are left for summarize_pending
+    and the article is marked pending, which keeps CPU-heavy NLP off the
+    download path. The text is fingerprinted for the duplicate index; if a
+    NearDuplicateIndex is passed and the text copies a stored article,
+    cluster_url is set and no NLP is run, as the copy shares its results.
+    The url is returned normalized, with the page's canonical URL.
+    """
+    url = normalize_url(url)
+
+    # Use newspaper3k to parse the article
+    with timed('article.parse') as timing:
+        timing.bytes = len(html or '')
+        article = Article(url)
+        article.download(input_html=html)
+        article.parse()
+
+    signature, bands = fingerprint(article.text)
+    cluster_url = None
+    if duplicates is not None and signature is not None:
+        match = duplicates.find(signature, bands, exclude_url=url)
+        if match:
+            cluster_url = match[0]
+            print(f"Copy of {cluster_url} ({match[1]:.0%} similar): {url}")
+        else:
+            duplicates.add_pending(url, signature, bands)
+
+    # Get NLP analysis; if it fails here the summarize worker retries it
+    summary = keywords = None
+    nlp_status = NLP_PENDING
+    if cluster_url:
+        nlp_status = None
+    elif nlp:
+        try:
+            summary, keywords = summarize_text(article.title, article.text)
+            nlp_status = NLP_DONE
+        except Exception as e:
+            print(f"NLP failed for {url}, leaving it for the summarize worker: {e}")
+
+    return {
+        'url': url,
+        'canonical_url': canonical_link(url, article.canonical_link),
+        'title': article.title,
+        'date_published': article.publish_date or datetime.now(),
+        'source': get_source_name(url),
+        'author': ', '.join(article.authors) if article.authors else 'Unknown',
+        'text': article.text,
+        'summary': summary,
+        'keywords': keywords,
+        'nlp_status': nlp_status,
+        'sentiment': None,  # Scored in batches by 'news_manager.py sentiment'
+        'signature': signature,
+        'bands': bands,
+        'cluster_url': cluster_url
+    }
+
+def _safe_extract_article(url, html, nlp=True):
+    """Run extract_article, returning (data, error) instead of raising"""
+    try:
+        return extract_article(url, html, nlp), None
+    except Exception as e:
+        return None, str(e)
 
 class ArticleFetcher:
-    def __init__(self, db_path='financial_news.db'):
-        """Initialize the ArticleFetcher with a database connection"""
+    def __init__(self, db_path='financial_news.db', workers=1, rate_limiter=None, cache_dir='html_cache',
+                 defer_nlp=False):
+        """Initialize the ArticleFetcher with a database connection
+
+        Downloaded HTML is kept in an HtmlCache under cache_dir so articles
+        can be re-extracted later without the network. Pass cache_dir=None
+        to disable the cache. With defer_nlp=True articles are stored as soon
+        as they are parsed, and their summary and keywords are filled in
+        later by summarize_pending.
+        """
         self.db = NewsDatabase(db_path)
-        
-    def fetch_article(self, url, ticker_symbol, sleep_time=2):
+        self.workers = workers
+        self.defer_nlp = defer_nlp
+
+        # Requests are paced per host by the limiter shared with the scrapers
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.cache = HtmlCache(cache_dir) if cache_dir else None
+
+        # Opened here so worker threads share one index of stored texts
+        self.duplicates = self.db.duplicate_index
+
+    def _download_article(self, url, ticker_symbol=None, revalidate=False):
+        """Download and parse an article, returning its fields as a dict
+
+        This does not use the database connection so it can run on worker
+        threads; the duplicate index reads through a connection of its own.
+        With revalidate=True, NotModified is raised if the page is unchanged
+        since it was cached, before any parsing. The whole of it is timed as
+        the article.fetch stage, around the download, parse and nlp stages.
+        """
+        with timed('article.fetch'):
+            with timed('article.download') as timing:
+                html = download_html(url, cache=self.cache, extra={'ticker': ticker_symbol},
+                                     rate_limiter=self.rate_limiter, revalidate=revalidate)
+                timing.bytes = len(html)
+            return extract_article(url, html, nlp=not self.defer_nlp, duplicates=self.duplicates)
+
+    def _store_article(self, ticker_symbol, data):
+        """Add a downloaded article to the database"""
+        success = self.db.add_article(ticker_symbol=ticker_symbol, **data)
+
+        if success:
+            print(f"Successfully added article: {data['title']}")
+            return True
+        else:
+            print(f"Failed to add article to database")
+            return False
+
+    def fetch_article(self, url, ticker_symbol):
         """Fetch and parse an article from the given URL"""
+        url = normalize_url(url)
         print(f"Fetching article: {url}")
-        
+
         # Check if article already exists in the database
         if self.db.url_exists(url):
             print(f"Article already exists in database: {url}")
             return False
-        
-        # Add a random delay to avoid rate limiting
-        time.sleep(sleep_time + random.uniform(0, 1))
-        
+
         try:
-            # Use newspaper3k to download and parse the article
-            article = Article(url)
-            article.download()
-            article.parse()
-            
-            # Get NLP analysis
-            try:
-                article.nlp()
-                summary = article.summary
-            except:
-                summary = None
-            
-            # Extract information
-            title = article.title
-            text = article.text
-            date_published = article.publish_date or datetime.now()
-            authors = ', '.join(article.authors) if article.authors else 'Unknown'
-            
-            # Extract source from URL
-            source = 'Unknown'
-            if 'yahoo.com' in url:
-                source = 'Yahoo Finance'
-            elif 'bloomberg.com' in url:
-                source = 'Bloomberg'
-            elif 'reuters.com' in url:
-                source = 'Reuters'
-            elif 'marketwatch.com' in url:
-                source = 'MarketWatch'
-            elif 'seekingalpha.com' in url:
-                source = 'Seeking Alpha'
-            elif 'ft.com' in url:
-                source = 'Financial Times'
-            
-            # Add to database
-            success = self.db.add_article(
-                ticker_symbol=ticker_symbol,
-                url=url,
-                title=title,
-                date_published=date_published,
-                source=source,
-                author=authors,
-                text=text,
-                summary=summary,
-                sentiment=None  # We'll add sentiment analysis in a future update
-            )
-            
-            if success:
-                print(f"Successfully added article: {title}")
-                return True
-            else:
-                print(f"Failed to add article to database")
-                return False
-                
+            data = self._download_article(url, ticker_symbol)
+            return self._store_article(ticker_symbol, data)
+
         except Exception as e:
             print(f"Error fetching article {url}: {e}")
             return False
-    
-    def fetch_articles_from_csv(self, csv_file, ticker_symbol):
+
+    def _download_all(self, urls, ticker_symbol, workers, revalidate=False):
+        """Download URLs, yielding (url, data, error) as each one finishes
+
+        With more than one worker, downloads run on a thread pool so requests
+        to different hosts overlap, while requests to the same host are still
+        paced by the rate limiter.
+        """
+        if workers <= 1:
+            for url in urls:
+                print(f"Fetching article: {url}")
+                try:
+                    yield url, self._download_article(url, ticker_symbol, revalidate), None
+                except Exception as e:
+                    yield url, None, e
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for url in urls:
+                print(f"Fetching article: {url}")
+                futures[executor.submit(self._download_article, url, ticker_symbol, revalidate)] = url
+
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+    def fetch_articles(self, urls, ticker_symbol, workers=None, batch_size=50, refresh=False):
+        """Fetch a list of article URLs, returning (success_count, fail_count)
+
+        Downloaded articles are written to the database in batches rather
+        than one commit per article. Database access stays on the calling
+        thread.
+
+        With refresh=True, articles already in the database are fetched again
+        with a conditional request. Pages the server reports unchanged are
+        neither parsed nor written, and don't count as failures.
+
+        Articles already stored, whether found before downloading or after it
+        by their canonical URL, count as neither; they are reported as known.
+        """
+        workers = workers or self.workers
+
+        fail_count = 0
+        downloaded = 0
+        unchanged = 0
+        known = 0
+
+        # Skip known articles up front, the same way fetch_article does. Links
+        # are normalized first, so variants of one URL are fetched once.
+        pending = []
+        seen = set()
+        for url in map(normalize_url, urls):
+            if url in seen or (not refresh and self.db.url_exists(url)):
+                print(f"Article already exists in database: {url}")
+                known += 1
+            else:
+                seen.add(url)
+                pending.append(url)
+
+        def downloaded_articles():
+            nonlocal fail_count, downloaded, unchanged
+            for url, data, error in self._download_all(pending, ticker_symbol, workers, revalidate=refresh):
+                if isinstance(error, NotModified):
+                    unchanged += 1
+                    continue
+                if error:
+                    print(f"Error fetching article {url}: {error}")
+                    fail_count += 1
+                    continue
+
+                print(f"Downloaded article: {data['title']}")
+                downloaded += 1
+                yield dict(data, ticker_symbol=ticker_symbol)
+
+        # Pages skipped as already stored under their canonical URL
+        aliases = []
+        success_count = self.db.add_articles(downloaded_articles(), batch_size=batch_size, known=aliases)
+        for url in aliases:
+            print(f"Article already stored under its canonical URL: {url}")
+        known += len(aliases)
+        fail_count += downloaded - success_count - len(aliases)
+
+        if known:
+            print(f"{known} articles already in the database")
+        if unchanged:
+            print(f"{unchanged} articles unchanged since they were last fetched")
+
+        return success_count, fail_count
+
+    def fetch_articles_from_csv(self, csv_file, ticker_symbol, workers=None, refresh=False):
         """Fetch all articles from a CSV file of URLs"""
         import csv
-        
-        success_count = 0
-        fail_count = 0
-        
+
+        urls = []
+
         with open(csv_file, 'r') as f:
             reader = csv.reader(f)
             next(reader)  # Skip header
-            
+
             for row in reader:
-                if not row:
+                if not row or not row[0].strip():
                     continue
-                    
-                url = row[0]
-                if self.fetch_article(url, ticker_symbol):
-                    success_count += 1
-                else:
-                    fail_count += 1
-        
+
+                urls.append(normalize_url(row[0]))
+
+        success_count, fail_count = self.fetch_articles(urls, ticker_symbol, workers, refresh=refresh)
+
         print(f"Completed fetching articles. Success: {success_count}, Failed: {fail_count}")
         return success_count, fail_count
-    
+
+    def reextract_from_cache(self, ticker_symbol=None, workers=None, batch_size=200):
+        """Rebuild articles in the database from cached HTML, without the network
+
+        Useful after improving extraction. Pages are parsed on a process pool
+        when workers > 1. The ticker comes from the cache metadata, or from
+        the stored article if the page was cached without one. Returns
+        (success_count, fail_count).
+        """
+        if self.cache is None:
+            print("No HTML cache configured")
+            return 0, 0
+
+        workers = workers or self.workers
+        fail_count = 0
+        extracted = 0
+
+        def cached_pages():
+            nonlocal fail_count
+            for page in self.cache.pages():
+                ticker = page.extra.get('ticker') or self.db.get_article_ticker(page.url)
+                if not ticker:
+                    print(f"No ticker known for cached page: {page.url}")
+                    fail_count += 1
+                elif ticker_symbol is None or ticker == ticker_symbol:
+                    yield page.url, page.html, ticker
+
+        def extracted_articles():
+            nonlocal fail_count, extracted
+            executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+            pages = cached_pages()
+
+            try:
+                # Work through the cache in chunks so only a chunk of HTML is in memory
+                while True:
+                    chunk = list(islice(pages, 256))
+                    if not chunk:
+                        break
+
+                    urls = [url for url, html, ticker in chunk]
+                    htmls = [html for url, html, ticker in chunk]
+                    if executor:
+                        results = executor.map(_safe_extract_article, urls, htmls, repeat(not self.defer_nlp),
+                                               chunksize=16)
+                    else:
+                        results = map(_safe_extract_article, urls, htmls, repeat(not self.defer_nlp))
+
+                    for (url, html, ticker), (data, error) in zip(chunk, results):
+                        if error:
+                            print(f"Error extracting article {url}: {error}")
+                            fail_count += 1
+                            continue
+
+                        extracted += 1
+                        yield dict(data, ticker_symbol=ticker)
+            finally:
+                if executor:
+                    executor.shutdown()
+
+        # Cached pages of articles since stored under their canonical URL
+        aliases = []
+        success_count = self.db.add_articles(extracted_articles(), batch_size=batch_size, known=aliases)
+        fail_count += extracted - success_count - len(aliases)
+
+        print(f"Re-extracted articles from cache. Success: {success_count}, Failed: {fail_count}")
+        return success_count, fail_count
+
+    def summarize_pending(self, ticker_symbol=None, workers=None, batch_size=200, limit=None):
+        """Fill in the summary and keywords of articles stored with deferred NLP
+
+        Pending articles are read in batches and summarized on a process pool
+        when workers > 1; each batch's results are written in one transaction.
+        Articles that fail are marked failed rather than retried forever.
+        Returns (success_count, fail_count).
+        """
+        workers = workers or self.workers
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        success_count = 0
+        fail_count = 0
+        after_id = 0
+
+        print(f"{self.db.count_pending_nlp()} articles waiting for summaries")
+
+        try:
+            while limit is None or success_count + fail_count < limit:
+                size = batch_size if limit is None else min(batch_size, limit - success_count - fail_count)
+                pending = self.db.get_pending_nlp(size, after_id, ticker_symbol)
+                if not pending:
+                    break
+                after_id = pending[-1][0]
+
+                ids, titles, texts = zip(*pending)
+                if executor:
+                    results = executor.map(_safe_summarize, ids, titles, texts, chunksize=8)
+                else:
+                    results = map(_safe_summarize, ids, titles, texts)
+
+                rows = []
+                for article_id, summary, keywords, error in results:
+                    if error:
+                        print(f"NLP failed for article {article_id}: {error}")
+                        rows.append((article_id, None, None, NLP_FAILED))
+                        fail_count += 1
+                    else:
+                        rows.append((article_id, summary, keywords, NLP_DONE))
+                        success_count += 1
+
+                self.db.set_nlp_results(rows)
+                print(f"Summarized {success_count} articles, {fail_count} failed")
+        finally:
+            if executor:
+                executor.shutdown()
+
+        return success_count, fail_count
+
     def close(self):
         """Close the database connection"""
-        self.db.close()
+        self.db.close()
+        if self.cache is not None:
+            self.cache.close()
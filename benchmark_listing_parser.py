@@ -0,0 +1,135 @@
+﻿import argparse
+import random
+import statistics
+import time
+from bs4 import BeautifulSoup
+import listing_parser
+from listing_parser import parse_results
+
+# Result containers of each listing page: (tag name, find_all filters)
+LAYOUTS = {
+    'marketwatch': ('div', {'class_': 'searchresult'}),
+    'yahoo-search': ('div', {'attrs': {'data-test': 'article'}}),
+    'yahoo-quote': ('div', {'id': 'tabpanel-news'}),
+    'reuters': ('li', {'class_': 'search-results__item__22R6z'}),
+    'seekingalpha': ('li', {'class_': 'search-pages-result'}),
+}
+
+WORDS = ('shares market profit guidance revenue quarter dividend earnings analyst outlook '
+         'retail supermarket inflation rates growth margin').split()
+
+
+def _sentence(rng, n=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+
+def _result_html(layout, i, rng):
+    """One result container, shaped like the real page's markup"""
+    title = _sentence(rng, 8)
+    if layout == 'marketwatch':
+        return (f'<div class="searchresult"><a class="link" href="https://www.marketwatch.com/story/{i}">{title}</a>'
+                f'<p>{_sentence(rng)}</p><span class="deemphasized">Jan 5, 2025 10:32 a.m. ET</span></div>')
+    if layout == 'yahoo-search':
+        return (f'<div data-test="article"><a href="/news/story-{i}.html">{title}</a>'
+                f'<p>{_sentence(rng)}</p><span data-test="article-timestamp">{i % 23 + 1} hours ago</span></div>')
+    if layout == 'yahoo-quote':
+        return (f'<section data-testid="storyitem"><a class="subtle-link fin-size-small titles noUnderline" '
+                f'href="https://au.finance.yahoo.com/news/story-{i}.html"><h3>{title}</h3></a>'
+                f'<p>{_sentence(rng)}</p><div class="publishing">Reuters • {i % 23 + 1} hours ago</div></section>')
+    if layout == 'reuters':
+        return (f'<li class="search-results__item__22R6z"><a href="/business/story-{i}/">{title}</a>'
+                f'<time>January 5, 2025</time></li>')
+    return (f'<li class="search-pages-result"><a class="search-result-title" href="/article/{i}">{title}</a>'
+            f'<span class="search-result-date">Jan. 5, 2025</span></li>')
+
+
+def synthesize_page(layout, results=100, seed=1):
+    """Build a listing page with result containers among the usual page chrome"""
+    rng = random.Random(seed)
+    chrome = []
+    for i in range(400):
+        chrome.append(f'<div class="nav-item-{i}"><a href="/section/{i}">{rng.choice(WORDS)}</a>'
+                      f'<span>{_sentence(rng, 6)}</span></div>')
+    script = '<script>' + 'var x = {"k": "v"};' * 2000 + '</script>'
+    items = ''.join(_result_html(layout, i, rng) for i in range(results))
+
+    if layout == 'yahoo-quote':
+        items = f'<div id="tabpanel-news">{items}</div>'
+    elif layout in ('reuters', 'seekingalpha'):
+        items = f'<ul>{items}</ul>'
+
+    return (f'<html><head>{script}</head><body><header>{"".join(chrome[:200])}</header>'
+            f'<main>{items}</main><footer>{"".join(chrome[200:])}</footer></body></html>')
+
+
+def full_parse(html, name, filters):
+    """The approach the listing loops used before: parse everything, then find_all"""
+    return BeautifulSoup(html, 'html.parser').find_all(name, **filters)
+
+
+def strained_parse(html, name, filters, parser):
+    listing_parser.PARSER = parser
+    return parse_results(html, name, **filters)
+
+
+def time_it(func, repeat):
+    """Run func repeat times, returning (median seconds, result of the last run)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def benchmark(pages, repeat=5):
+    """Time each parsing approach on each (label, layout, html) page"""
+    default_parser = listing_parser.PARSER
+    approaches = [('full html.parser + find_all', lambda html, name, filters: full_parse(html, name, filters)),
+                  ('strained html.parser', lambda html, name, filters: strained_parse(html, name, filters, 'html.parser'))]
+    if default_parser == 'lxml':
+        approaches.append(('strained lxml', lambda html, name, filters: strained_parse(html, name, filters, 'lxml')))
+
+    try:
+        for label, layout, html in pages:
+            name, filters = LAYOUTS[layout]
+            print(f"\n{label} ({layout}, {len(html) / 1024:.0f} KB)")
+            baseline = None
+            for approach, parse in approaches:
+                seconds, results = time_it(lambda: parse(html, name, filters), repeat)
+                baseline = baseline or seconds
+                print(f"  {approach:<28} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x  "
+                      f"{len(results)} containers")
+    finally:
+        listing_parser.PARSER = default_parser
+
+    if default_parser != 'lxml':
+        print("\nlxml is not installed; install it to include the fastest parser")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full-page and targeted parsing of listing pages')
+    parser.add_argument('--page', action='append', default=[], metavar='LAYOUT=FILE',
+                        help=f'Saved listing page to time, e.g. reuters=reuters.html. Layouts: {", ".join(LAYOUTS)}')
+    parser.add_argument('--results', type=int, default=100, help='Results per synthesized page')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (the median is shown)')
+    args = parser.parse_args()
+
+    pages = []
+    for spec in args.page:
+        layout, _, path = spec.partition('=')
+        if layout not in LAYOUTS or not path:
+            parser.error(f"--page must be LAYOUT=FILE with a layout from: {', '.join(LAYOUTS)}")
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append((path, layout, f.read()))
+
+    # Without saved pages, time synthesized ones for every layout
+    if not pages:
+        pages = [(f'synthesized {layout}', layout, synthesize_page(layout, args.results)) for layout in LAYOUTS]
+
+    benchmark(pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+﻿import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from benchmark_listing_parser import LAYOUTS, WORDS, synthesize_page
+from http_client import fetch_html
+from listing_parser import parse_results
+from metrics import get_metrics
+from news_database import NewsDatabase
+from rate_limiter import HostRateLimiter
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ('fetch', 'listing', 'database')
+
+# Search queries timed by the database stage
+QUERIES = ('earnings', 'profit guidance', '"dividend growth"', 'retail*', 'inflation OR rates')
+
+
+class FixtureSite:
+    """A local stand-in for the news sites, serving listing and article pages
+
+    Listing pages are served at /listing/<layout>.html and any other path is
+    an article. Pages come from recorded HTML when given, otherwise they are
+    synthesized. Each response is delayed by latency seconds (plus up to
+    jitter more), and error_rate of the requests get error_status instead.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 listing_pages=None, article_pages=None, results=100, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.listing_pages = listing_pages or {}
+        self.article_pages = article_pages or []
+        self.results = results
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.server = None
+
+    def start(self):
+        """Start serving on a free local port, returning the base URL"""
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def page(self, path):
+        """The HTML served at a path"""
+        if path.startswith('/listing/'):
+            layout = path[len('/listing/'):].rsplit('.', 1)[0]
+            if layout not in self.listing_pages:
+                self.listing_pages[layout] = synthesize_page(layout, self.results)
+            return self.listing_pages[layout]
+
+        if self.article_pages:
+            return self.article_pages[hash(path) % len(self.article_pages)]
+        return synthesize_article(path)
+
+    def handle(self, request):
+        with self.rng_lock:
+            self.requests += 1
+            delay = self.latency + self.rng.random() * self.jitter
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        time.sleep(delay)
+        path = urlsplit(request.path).path
+        if failed or (path.startswith('/listing/') and path[len('/listing/'):].rsplit('.', 1)[0] not in LAYOUTS):
+            request.send_response(self.error_status if failed else 404)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+
+        body = self.page(path).encode('utf-8')
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/html; charset=utf-8')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def synthesize_article(path, paragraphs=12):
+    """Build an article page with the metadata newspaper3k reads"""
+    rng = random.Random(path)
+    slug = path.rstrip('/').rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    title = slug.replace('-', ' ').capitalize()
+    published = datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(60 * 24 * 60))
+    body = ''.join(
+        '<p>' + ' '.join(rng.choice(WORDS) for _ in range(60)).capitalize() + '.</p>'
+        for _ in range(paragraphs)
+    )
+    return (f'<html><head><title>{title}</title>'
+            f'<meta property="og:title" content="{title}">'
+            f'<meta property="article:published_time" content="{published.isoformat()}">'
+            f'<meta name="author" content="Bench Reporter"></head>'
+            f'<body><header><nav><a href="/">Home</a></nav></header>'
+            f'<article><h1>{title}</h1>{body}</article><footer>Fixture site</footer></body></html>')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers, or None if it's empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None on Windows)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def stage_result(count, seconds, latencies, errors=0, **extra):
+    """Summarize a stage: throughput, latency percentiles (ms) and peak RSS"""
+    return dict({
+        'count': count,
+        'seconds': round(seconds, 3),
+        'per_sec': round(count / seconds, 2) if seconds else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'errors': errors,
+        'peak_rss_mb': peak_rss_mb(),
+    }, **extra)
+
+
+def unlimited_rate_limiter():
+    """A limiter that never waits, so the fixture site's latency is what's measured"""
+    return HostRateLimiter(default_rate=1e9, default_burst=1e9, domain_limits={})
+
+
+def read_links(links_file):
+    """Read the article URLs from a links CSV such as WOW.AX_links.csv"""
+    with open(links_file, 'r') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        return [row[0] for row in reader if row]
+
+
+def bench_fetch(base_url, links, articles, workers, work_dir):
+    """Fetch, parse and store articles from the fixture site via a links CSV
+
+    The recorded links are pointed at the fixture site, and repeated with a
+    numbered suffix until there are `articles` of them.
+    """
+    # newspaper3k is only needed for this stage
+    from article_fetcher import ArticleFetcher
+
+    paths = [urlsplit(link).path for link in links] or ['/news/article.html']
+    urls = []
+    for i in range(articles):
+        stem, dot, ext = paths[i % len(paths)].rpartition('.')
+        urls.append(f'{base_url}{stem}-{i}{dot}{ext}' if dot else f'{base_url}{ext}-{i}')
+
+    csv_file = os.path.join(work_dir, 'links.csv')
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['article_link'])
+        writer.writerows([url] for url in urls)
+
+    fetcher = ArticleFetcher(db_path=os.path.join(work_dir, 'fetch.db'), workers=workers,
+                             rate_limiter=unlimited_rate_limiter(),
+                             cache_dir=os.path.join(work_dir, 'html_cache'))
+
+    # Each article's download and extraction is recorded by the fetcher as
+    # the article.fetch stage; start from empty metrics to read only this run
+    metrics = get_metrics()
+    metrics.reset()
+
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            success_count, fail_count = fetcher.fetch_articles_from_csv(csv_file, 'BENCH', workers)
+        elapsed = time.perf_counter() - started
+    finally:
+        fetcher.close()
+
+    result = stage_result(success_count, elapsed, [], fail_count, workers=workers)
+    for stage in metrics.report()['stages']:
+        if stage['stage'] == 'article.fetch' and stage['quantiles_ms']:
+            result['p50_ms'] = round(stage['quantiles_ms']['0.5'], 2)
+            result['p99_ms'] = round(stage['quantiles_ms']['0.99'], 2)
+    return result
+
+
+def bench_listing(base_url, repeat):
+    """Download and parse each layout's listing page from the fixture site"""
+    limiter = unlimited_rate_limiter()
+    latencies = []
+    containers = 0
+    errors = 0
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for layout, (name, filters) in LAYOUTS.items():
+            page_started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                html = fetch_html(f'{base_url}/listing/{layout}.html', rate_limiter=limiter)
+            if html is None:
+                errors += 1
+                continue
+            containers += len(parse_results(html, name, **filters))
+            latencies.append(time.perf_counter() - page_started)
+    elapsed = time.perf_counter() - started
+
+    return stage_result(len(latencies), elapsed, latencies, errors, containers=containers)
+
+
+def synthesize_articles(count, ticker='BENCH', seed=1):
+    """Article dicts in the form ArticleFetcher passes to add_articles"""
+    rng = random.Random(seed)
+    for i in range(count):
+        text = '\n\n'.join(' '.join(rng.choice(WORDS) for _ in range(60)).capitalize() + '.' for _ in range(12))
+        yield {
+            'ticker_symbol': ticker,
+            'url': f'https://bench.example.com/news/article-{i}.html',
+            'title': ' '.join(rng.choice(WORDS) for _ in range(8)).capitalize(),
+            'date_published': datetime(2025, 1, 1) + timedelta(minutes=i),
+            'source': 'Bench',
+            'author': 'Bench Reporter',
+            'text': text,
+            'summary': text[:300],
+            'sentiment': rng.uniform(-1, 1),
+        }
+
+
+def bench_database(articles, repeat, work_dir):
+    """Time batch ingestion, full-text search and paged listing"""
+    db = NewsDatabase(os.path.join(work_dir, 'ingest.db'))
+    try:
+        started = time.perf_counter()
+        written = db.add_articles(synthesize_articles(articles))
+        ingest = stage_result(written, time.perf_counter() - started, [])
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for query in QUERIES:
+                query_started = time.perf_counter()
+                db.search_articles(query, limit=20)
+                latencies.append(time.perf_counter() - query_started)
+        search = stage_result(len(latencies), time.perf_counter() - started, latencies,
+                              fts=db.fts_enabled)
+
+        latencies = []
+        started = time.perf_counter()
+        after = None
+        while True:
+            page_started = time.perf_counter()
+            rows, after = db.get_article_page('BENCH', after=after, page_size=50)
+            latencies.append(time.perf_counter() - page_started)
+            if not after:
+                break
+        listing = stage_result(len(latencies), time.perf_counter() - started, latencies)
+    finally:
+        db.close()
+
+    return {'ingest': ingest, 'search': search, 'list_pages': listing}
+
+
+def git_revision():
+    """The checked-out commit, to tell results from different versions apart"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline):
+    """Print each stage's throughput and p99 against a previous results file"""
+    print(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    for stage, result in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before:
+            continue
+        line = f"  {stage:<12}"
+        if result.get('per_sec') and before.get('per_sec'):
+            line += f" throughput {result['per_sec'] / before['per_sec']:5.2f}x"
+        if result.get('p99_ms') and before.get('p99_ms'):
+            line += f"  p99 {result['p99_ms'] / before['p99_ms']:5.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline offline against a local fixture news site')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f'Comma-separated stages to run: {", ".join(STAGES)}')
+    parser.add_argument('--links', default='WOW.AX_links.csv', help='Links CSV whose article paths the fixture site serves')
+    parser.add_argument('--articles', type=int, default=200, help='Articles to fetch and to ingest')
+    parser.add_argument('--workers', '-w', type=int, default=8, help='Concurrent article downloads')
+    parser.add_argument('--repeat', type=int, default=5, help='Rounds of listing pages and search queries')
+    parser.add_argument('--latency', type=float, default=50, help='Response delay of the fixture site in ms')
+    parser.add_argument('--jitter', type=float, default=50, help='Random extra delay of up to this many ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected errors')
+    parser.add_argument('--listing-page', action='append', default=[], metavar='LAYOUT=FILE',
+                        help='Recorded listing page to serve instead of a synthesized one')
+    parser.add_argument('--article-page', action='append', default=[], metavar='FILE',
+                        help='Recorded article page to serve (repeat to serve several in turn)')
+    parser.add_argument('--output', '-o', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}")
+
+    listing_pages = {}
+    for spec in args.listing_page:
+        layout, _, path = spec.partition('=')
+        if layout not in LAYOUTS or not path:
+            parser.error(f"--listing-page must be LAYOUT=FILE with a layout from: {', '.join(LAYOUTS)}")
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            listing_pages[layout] = f.read()
+
+    article_pages = []
+    for path in args.article_page:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            article_pages.append(f.read())
+
+    site = FixtureSite(args.latency / 1000, args.jitter / 1000, args.error_rate, args.error_status,
+                       listing_pages, article_pages)
+    base_url = site.start()
+    work_dir = tempfile.mkdtemp(prefix='news_bench_')
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'stages': {},
+    }
+
+    try:
+        if 'listing' in stages:
+            print("Listing pages...")
+            results['stages']['listing'] = bench_listing(base_url, args.repeat)
+        if 'fetch' in stages:
+            print(f"Fetching {args.articles} articles with {args.workers} workers...")
+            links = read_links(args.links) if os.path.exists(args.links) else []
+            results['stages']['fetch'] = bench_fetch(base_url, links, args.articles, args.workers, work_dir)
+        if 'database' in stages:
+            print(f"Ingesting and searching {args.articles} articles...")
+            results['stages'].update(bench_database(args.articles, args.repeat, work_dir))
+    finally:
+        site.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results['requests'] = site.requests
+    results['injected_errors'] = site.errors
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    print(f"\n{'stage':<12} {'count':>7} {'per sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for stage, result in results['stages'].items():
+        print(f"{stage:<12} {result['count']:>7} {result['per_sec'] or 0:>10.1f} "
+              f"{result['p50_ms'] or 0:>9.2f} {result['p99_ms'] or 0:>9.2f} {result['errors']:>7}")
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -42,26 +42,64 @@ EXCERPT:
 """
     return output
 
-def list_articles(ticker=None, limit=10):
-    """List articles from the database"""
+# Columns format_article shows, in its order
+ARTICLE_COLUMNS = ('id', 'url', 'title', 'date_published', 'source', 'author', 'text', 'summary', 'sentiment')
+
+def list_articles(ticker=None, limit=10, after=None, page=None, brief=False, collapse=False):
+    """List a page of articles from the database
+    
+    Articles are printed as they are read. With brief=True only the ID, date
+    and title are read, so article text is never loaded or decompressed.
+    With collapse=True copies of the same story are shown once, with a count.
+    """
     db = NewsDatabase()
     
     try:
-        if ticker:
-            articles = db.get_articles_for_ticker(ticker, limit)
-            print(f"Showing up to {limit} articles for {ticker}:")
-        else:
+        if not ticker:
             print("Please specify a ticker symbol")
             return
+        
+        if page and page > 1:
+            after = db.find_page_cursor(ticker, page, limit, collapse)
+            if not after:
+                print(f"No page {page} of articles for {ticker}")
+                return
+        
+        columns = ('id', 'date_published', 'title') if brief else ARTICLE_COLUMNS
+        if collapse:
+            columns += ('copies',)
+        print(f"Showing up to {limit} articles for {ticker}:")
+        
+        count = 0
+        last = None
+        more = False
+        # One row past the page tells whether there is a next page
+        for article in db.iter_articles_for_ticker(ticker, columns, after=after, limit=limit + 1, collapse=collapse):
+            if count == limit:
+                more = True
+                break
+            count += 1
+            copies = article[-1] if collapse else 0
+            if collapse:
+                article = article[:-1]
+            
+            if brief:
+                id, date_published, title = article
+                print(f"ID: {id} | {date_published or 'Unknown'} | {title}" + (f" (+{copies} copies)" if copies else ""))
+            else:
+                id, date_published = article[0], article[3]
+                print(format_article(article))
+                if copies:
+                    print(f"+{copies} copies of this story from other sources")
+            last = (date_published, id)
             
-        if not articles:
+        if not count:
             print(f"No articles found for {ticker}")
             return
             
-        for article in articles:
-            print(format_article(article))
-            
-        print(f"Found {len(articles)} articles for {ticker}")
+        print(f"Found {count} articles for {ticker}")
+        if more:
+            print(f"Next page: --after '{db.make_page_cursor(*last)}'")
         
     finally:
         db.close()
@@ -73,12 +111,7 @@ def view_article(article_id=None, url=None):
     try:
         article = None
         if article_id:
-            # This needs to be implemented in the NewsDatabase class
-            db.cursor.execute(
-                'SELECT id, url, title, date_published, source, author, text, summary, sentiment FROM articles WHERE id = ?',
-                (article_id,)
-            )
-            article = db.cursor.fetchone()
+            article = db.get_article(article_id)
         elif url:
             article = db.get_article_by_url(url)
             
@@ -91,12 +124,12 @@ def view_article(article_id=None, url=None):
     finally:
         db.close()
 
-def search_articles(query, limit=10):
+def search_articles(query, limit=10, order='rank'):
     """Search for articles containing a query"""
     db = NewsDatabase()
     
     try:
-        results = db.search_articles(query, limit)
+        results = db.search_articles(query, limit, order)
         
         if not results:
             print(f"No articles found matching '{query}'")
@@ -104,7 +137,7 @@ def search_articles(query, limit=10):
             
         print(f"Search results for '{query}':")
         for article in results:
-            id, url, title, date_published, source, author, text, summary, ticker = article
+            id, url, title, date_published, source, author, text, summary, ticker, snippet = article
             # Format date
             if isinstance(date_published, str):
                 date_str = date_published
@@ -112,6 +145,8 @@ def search_articles(query, limit=10):
                 date_str = date_published.strftime('%Y-%m-%d') if date_published else 'Unknown'
                 
             print(f"ID: {id} | {date_str} | {ticker} | {title}")
+            if snippet:
+                print(f"    {snippet}")
             
         print(f"\nFound {len(results)} articles matching '{query}'")
         print("Use 'view --id <ID>' to view a specific article")
@@ -143,12 +178,14 @@ def show_ticker_stats(ticker):
         else:
             newest_str = newest_date.strftime('%Y-%m-%d') if newest_date else 'Unknown'
         
+        sentiment_str = f"{avg_sentiment:.2f}" if avg_sentiment is not None else "N/A"
+        
         print(f"""
 Statistics for {ticker}:
 ------------------------
 Total articles: {article_count}
 Date range: {oldest_str} to {newest_str}
-Average sentiment: {avg_sentiment:.2f if avg_sentiment else 'N/A'}
+Average sentiment: {sentiment_str}
 """)
         
     finally:
@@ -162,7 +199,11 @@ def main():
     # List articles
     list_parser = subparsers.add_parser('list', help='List articles')
     list_parser.add_argument('ticker', help='Ticker symbol')
-    list_parser.add_argument('--limit', '-l', type=int, default=10, help='Maximum number of articles to show')
+    list_parser.add_argument('--limit', '-l', type=int, default=10, help='Number of articles per page')
+    list_parser.add_argument('--after', help='Cursor printed after the previous page')
+    list_parser.add_argument('--page', '-p', type=int, help='Page number to show, from 1')
+    list_parser.add_argument('--brief', '-b', action='store_true', help='Show only the ID, date and title of each article')
+    list_parser.add_argument('--collapse', '-c', action='store_true', help='Show copies of the same story once')
     
     # View article
     view_parser = subparsers.add_parser('view', help='View a specific article')
@@ -171,8 +212,9 @@ def main():
     
     # Search articles
     search_parser = subparsers.add_parser('search', help='Search articles')
-    search_parser.add_argument('query', help='Search query')
+    search_parser.add_argument('query', help='Search query ("exact phrase", prefix*, AND/OR/NOT)')
     search_parser.add_argument('--limit', '-l', type=int, default=10, help='Maximum number of results')
+    search_parser.add_argument('--sort', choices=['rank', 'date'], default='rank', help='Order by relevance or newest first')
     
     # Show ticker stats
     stats_parser = subparsers.add_parser('stats', help='Show ticker statistics')
@@ -181,7 +223,7 @@ def main():
     args = parser.parse_args()
     
     if args.command == 'list':
-        list_articles(args.ticker, args.limit)
+        list_articles(args.ticker, args.limit, args.after, args.page, args.brief, args.collapse)
     elif args.command == 'view':
         if args.id:
             view_article(article_id=args.id)
@@ -190,11 +232,11 @@ def main():
         else:
             print("Please specify either --id or --url")
     elif args.command == 'search':
-        search_articles(args.query, args.limit)
+        search_articles(args.query, args.limit, args.sort)
     elif args.command == 'stats':
         show_ticker_stats(args.ticker)
     else:
         parser.print_help()
 
 if __name__ == "__main__":
-    main()
+    main()
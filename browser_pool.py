@@ -0,0 +1,183 @@
+﻿import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+# Number of browsers kept open by the shared pool
+DEFAULT_POOL_SIZE = 2
+
+
+class BrowserPool:
+    """A pool of warm headless Chrome browsers shared by the listing scrapers
+
+    The chromedriver binary is resolved once per process and browsers are
+    kept open between scrapes. A scraper leases a browser, uses it and hands
+    it back, at which point its cookies and storage are cleared so the next
+    lease starts with a clean session.
+    """
+
+    _driver_path = None
+    _driver_lock = threading.Lock()
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, headless=True):
+        self.size = size
+        self.headless = headless
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    @classmethod
+    def driver_path(cls):
+        """Resolve the chromedriver binary once and reuse it"""
+        with cls._driver_lock:
+            if cls._driver_path is None:
+                cls._driver_path = ChromeDriverManager().install()
+            return cls._driver_path
+
+    def _launch(self):
+        """Start a new browser"""
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless=new')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--window-size=1920,1080')
+
+        service = Service(self.driver_path())
+        return webdriver.Chrome(service=service, options=options)
+
+    def warm(self, count=None):
+        """Start browsers ahead of time so the first leases don't wait"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self.lock:
+                if self.created >= count:
+                    return
+                self.created += 1
+            try:
+                self.idle.put(self._launch())
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+
+    def _is_alive(self, browser):
+        try:
+            browser.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, browser):
+        """Quit a browser and free its slot in the pool"""
+        try:
+            browser.quit()
+        except Exception:
+            pass
+        with self.lock:
+            self.created -= 1
+
+    def acquire(self, timeout=None):
+        """Take a browser from the pool, starting one if the pool isn't full
+
+        Blocks until a browser is returned if all of them are in use, raising
+        queue.Empty if none is available within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                browser = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    can_launch = self.created < self.size
+                    if can_launch:
+                        self.created += 1
+                if can_launch:
+                    try:
+                        return self._launch()
+                    except Exception:
+                        with self.lock:
+                            self.created -= 1
+                        raise
+                # Wake up periodically: a discarded browser frees a slot
+                # without anything being put back on the queue
+                wait = 1.0
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        raise queue.Empty
+                try:
+                    browser = self.idle.get(timeout=wait)
+                except queue.Empty:
+                    continue
+
+            # Replace browsers that crashed while idle
+            if self._is_alive(browser):
+                return browser
+            self._discard(browser)
+
+    def release(self, browser):
+        """Reset a browser's session and put it back in the pool"""
+        if self.closed:
+            self._discard(browser)
+            return
+
+        try:
+            # Storage may be inaccessible on some pages (e.g. error pages)
+            browser.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+        except Exception:
+            pass
+
+        try:
+            browser.delete_all_cookies()
+            browser.get('about:blank')
+        except Exception:
+            # A browser that can't be reset isn't safe to reuse
+            self._discard(browser)
+            return
+
+        self.idle.put(browser)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """Context manager that acquires a browser and always returns it"""
+        browser = self.acquire(timeout)
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    def close(self):
+        """Quit every idle browser; leased ones are quit when released"""
+        self.closed = True
+        while True:
+            try:
+                browser = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(browser)
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_browser_pool(size=None):
+    """Get the browser pool shared by all scrapers in this process
+
+    Passing a size grows the pool if it may hold fewer browsers than that.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = BrowserPool(size or DEFAULT_POOL_SIZE)
+            atexit.register(_shared_pool.close)
+        elif size and size > _shared_pool.size:
+            _shared_pool.size = size
+        return _shared_pool
@@ -0,0 +1,161 @@
+﻿import re
+from datetime import datetime, date, timedelta, timezone
+from functools import lru_cache
+from dateutil import tz
+from dateutil.parser import parse
+
+# Timezone assumed for dates that don't name one (the scraping machine's)
+LOCAL_TZ = tz.tzlocal()
+
+# Timezone abbreviations the news sites print after times, e.g. "10:32 a.m. ET"
+TZINFOS = {
+    'ET': tz.gettz('America/New_York'),
+    'EST': tz.gettz('America/New_York'),
+    'EDT': tz.gettz('America/New_York'),
+    'PT': tz.gettz('America/Los_Angeles'),
+    'PST': tz.gettz('America/Los_Angeles'),
+    'PDT': tz.gettz('America/Los_Angeles'),
+    'BST': tz.gettz('Europe/London'),
+    'AEST': tz.gettz('Australia/Sydney'),
+    'AEDT': tz.gettz('Australia/Sydney'),
+    'GMT': timezone.utc,
+    'UTC': timezone.utc,
+}
+
+# Format of the canonical timestamps stored in the database (always UTC)
+STORAGE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Months and years are approximated, as the listings only give "3 months ago"
+UNIT_SECONDS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400,
+    'year': 365 * 86400,
+}
+
+UNIT_ALIASES = {
+    's': 'second', 'sec': 'second', 'secs': 'second',
+    'm': 'minute', 'min': 'minute', 'mins': 'minute',
+    'h': 'hour', 'hr': 'hour', 'hrs': 'hour',
+    'd': 'day',
+    'w': 'week', 'wk': 'week', 'wks': 'week',
+    'mo': 'month', 'mos': 'month',
+    'y': 'year', 'yr': 'year', 'yrs': 'year',
+}
+
+# "5 minutes ago", "an hour ago", "2 days", "3 mins ago"
+RELATIVE_RE = re.compile(
+    r'\b(\d+|an?|one)\s*(seconds?|secs?|minutes?|mins?|hours?|hrs?|days?|weeks?|wks?|months?|mos?|years?|yrs?)\b',
+    re.IGNORECASE
+)
+# Compact forms such as "5m" or "2h ago"; only accepted as the whole string
+COMPACT_RE = re.compile(r'\s*(\d+)\s*(mo|[smhdwy])\s*(?:ago)?\s*', re.IGNORECASE)
+# Words meaning "no time ago" or "one day ago"
+NOW_RE = re.compile(r'^\s*(just now|now|today)\s*$', re.IGNORECASE)
+YESTERDAY_RE = re.compile(r'^\s*yesterday\s*$', re.IGNORECASE)
+# "10:32 a.m." -> "10:32 AM", which dateutil reads reliably
+MERIDIEM_RE = re.compile(r'\b([ap])\.m\.', re.IGNORECASE)
+# Dates and times such as "2025-01-05" or "2025-01-05 10:32:00", which
+# datetime.fromisoformat handles far faster than dateutil
+ISO_RE = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?([+-]\d{2}:\d{2})?)?$')
+
+
+def _unit_seconds(unit):
+    unit = unit.lower()
+    if unit.endswith('s') and unit[:-1] in UNIT_SECONDS:
+        unit = unit[:-1]
+    return UNIT_SECONDS[UNIT_ALIASES.get(unit, unit)]
+
+
+@lru_cache(maxsize=4096)
+def _parse_text(text):
+    """Parse a date string into ('relative', timedelta) or ('absolute', datetime)
+
+    The result doesn't depend on the current time, so it can be memoized;
+    listings repeat the same strings ("2 hours ago", "Jan 5, 2025") across
+    results and pages. Absolute dates without a timezone stay naive.
+    Returns None for strings that aren't dates.
+    """
+    text = text.strip()
+    if not text:
+        return None
+
+    if ISO_RE.match(text):
+        return 'absolute', datetime.fromisoformat(text)
+
+    if NOW_RE.match(text):
+        return 'relative', timedelta(0)
+    if YESTERDAY_RE.match(text):
+        return 'relative', timedelta(days=1)
+
+    match = COMPACT_RE.fullmatch(text) or RELATIVE_RE.search(text)
+    if match:
+        count, unit = match.group(1).lower(), match.group(2)
+        count = 1 if count in ('a', 'an', 'one') else int(count)
+        return 'relative', timedelta(seconds=count * _unit_seconds(unit))
+
+    try:
+        return 'absolute', parse(MERIDIEM_RE.sub(r'\1M', text), tzinfos=TZINFOS)
+    except (ValueError, OverflowError):
+        return None
+
+
+def normalize_date(value, now=None, assume_tz=LOCAL_TZ):
+    """Turn a listing or article date into a timezone-aware UTC datetime
+
+    value can be a string (absolute like "Jan 5, 2025 10:32 a.m. ET" or
+    relative like "5 minutes ago"), a datetime or a date. Naive values are
+    taken to be in assume_tz. Relative strings count back from now, which
+    defaults to the current time. Returns None if the value isn't a date.
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, datetime):
+        result = value
+    elif isinstance(value, date):
+        result = datetime(value.year, value.month, value.day)
+    else:
+        parsed = _parse_text(str(value))
+        if parsed is None:
+            return None
+        kind, result = parsed
+        if kind == 'relative':
+            result = (now or datetime.now(timezone.utc)) - result
+
+    if result.tzinfo is None:
+        result = result.replace(tzinfo=assume_tz)
+    return result.astimezone(timezone.utc)
+
+
+def normalize_dates(values, now=None, assume_tz=LOCAL_TZ):
+    """Normalize many dates at once, e.g. every result on a listing page
+
+    All relative dates count back from the same moment, so results on one
+    page stay in order. Returns a list with None for values that aren't dates.
+    """
+    now = now or datetime.now(timezone.utc)
+    return [normalize_date(value, now, assume_tz) for value in values]
+
+
+def to_storage(value, now=None, assume_tz=LOCAL_TZ):
+    """Format a date as the canonical UTC timestamp stored in the database
+
+    Returns None if the value isn't a date.
+    """
+    result = normalize_date(value, now, assume_tz)
+    return result.strftime(STORAGE_FORMAT) if result else None
+
+
+def from_storage(value):
+    """Read a canonical timestamp from the database as an aware UTC datetime"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        result = value
+    else:
+        result = datetime.fromisoformat(value)
+    return result if result.tzinfo else result.replace(tzinfo=timezone.utc)
@@ -0,0 +1,293 @@
+﻿import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+from url_normalizer import normalize_url
+
+# Default cache limits
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB of compressed HTML
+DEFAULT_MAX_AGE_DAYS = 180
+
+# Run eviction after this many new pages have been stored
+EVICT_EVERY = 200
+
+# Version of the URL keys, kept in the index's user_version. Version 1 keys
+# are url_normalizer's normalize_url; earlier caches used a simpler form.
+KEY_VERSION = 1
+
+CachedPage = namedtuple('CachedPage', ['url', 'html', 'fetched_at', 'status', 'headers', 'extra'])
+
+
+class HtmlCache:
+    """Compressed, content-addressed on-disk cache of downloaded pages
+
+    Page bodies are stored zlib-compressed under objects/, named by the
+    SHA-256 of the HTML, so identical pages are stored once. An SQLite index
+    maps each normalized URL to its body and keeps the fetch time, HTTP
+    status, response headers and any extra metadata (e.g. the ticker the
+    page was fetched for). Old entries are evicted by age and total size.
+    """
+
+    def __init__(self, cache_dir='html_cache', max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            original_url TEXT,
+            content_hash TEXT,
+            size INTEGER,
+            fetched_at REAL,
+            status INTEGER,
+            headers TEXT,
+            extra TEXT
+        )
+        ''')
+        # HTTP validators per URL, for conditional re-fetches. Kept apart from
+        # pages so listing pages can be revalidated without storing their HTML.
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS validators (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            checked_at REAL
+        )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages (fetched_at)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_hash ON pages (content_hash)')
+        self._rekey()
+        self.conn.commit()
+        self._puts_since_evict = 0
+
+    def _rekey(self):
+        """Move entries stored under older URL keys to their current keys
+
+        Runs once per cache. Pages are re-keyed from the URL they were
+        fetched under, validators from their old key. Where several entries
+        end up under one key, the most recently fetched or checked one is
+        kept; bodies left unreferenced go at the next eviction.
+        """
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] >= KEY_VERSION:
+            return
+
+        pages = self.conn.execute('SELECT url, original_url FROM pages').fetchall()
+        moved_pages = [(url, normalize_url(original_url or url)) for url, original_url in pages]
+        moved_pages = [(url, key) for url, key in moved_pages if key != url]
+        validators = self.conn.execute('SELECT url FROM validators').fetchall()
+        moved_validators = [(url, normalize_url(url)) for (url,) in validators]
+        moved_validators = [(url, key) for url, key in moved_validators if key != url]
+
+        if moved_pages or moved_validators:
+            print("Re-keying cached pages by normalized URL (one-time migration)...")
+        for url, key in moved_pages:
+            self.conn.execute('''
+            INSERT INTO pages (url, original_url, content_hash, size, fetched_at, status, headers, extra)
+            SELECT ?, original_url, content_hash, size, fetched_at, status, headers, extra FROM pages WHERE url = ?
+            ON CONFLICT(url) DO UPDATE SET
+                original_url = excluded.original_url,
+                content_hash = excluded.content_hash,
+                size = excluded.size,
+                fetched_at = excluded.fetched_at,
+                status = excluded.status,
+                headers = excluded.headers,
+                extra = excluded.extra
+            WHERE excluded.fetched_at > pages.fetched_at
+            ''', (key, url))
+            self.conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+        for url, key in moved_validators:
+            self.conn.execute('''
+            INSERT INTO validators (url, etag, last_modified, checked_at)
+            SELECT ?, etag, last_modified, checked_at FROM validators WHERE url = ?
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                checked_at = excluded.checked_at
+            WHERE excluded.checked_at > validators.checked_at
+            ''', (key, url))
+            self.conn.execute('DELETE FROM validators WHERE url = ?', (url,))
+        self.conn.execute(f'PRAGMA user_version = {KEY_VERSION}')
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash[2:] + '.z')
+
+    def put(self, url, html, status=200, headers=None, extra=None):
+        """Store a page, returning its content hash"""
+        data = html.encode('utf-8')
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._object_path(content_hash)
+        compressed = None if os.path.exists(path) else zlib.compress(data, 6)
+
+        with self.lock:
+            # The body is checked under the lock, as evict removes unreferenced
+            # bodies under it too and may have deleted this one meanwhile
+            if not os.path.exists(path):
+                if compressed is None:
+                    compressed = zlib.compress(data, 6)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write to a temp file first so readers never see a partial body
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+
+            self.conn.execute('''
+            INSERT OR REPLACE INTO pages (url, original_url, content_hash, size, fetched_at, status, headers, extra)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (normalize_url(url), url, content_hash, size, time.time(), status,
+                  json.dumps(dict(headers or {})), json.dumps(extra or {})))
+            self._store_validators(url, headers)
+            self.conn.commit()
+            self._puts_since_evict += 1
+            evict_now = self._puts_since_evict >= EVICT_EVERY
+
+        if evict_now:
+            self.evict()
+
+        return content_hash
+
+    def _store_validators(self, url, headers):
+        # Caller holds the lock. Header names are matched case-insensitively.
+        headers = {k.lower(): v for k, v in dict(headers or {}).items()}
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if etag or last_modified:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO validators (url, etag, last_modified, checked_at) VALUES (?, ?, ?, ?)',
+                (normalize_url(url), etag, last_modified, time.time())
+            )
+        else:
+            self.conn.execute('DELETE FROM validators WHERE url = ?', (normalize_url(url),))
+
+    def set_validators(self, url, headers):
+        """Remember the ETag and Last-Modified response headers for a URL"""
+        with self.lock:
+            self._store_validators(url, headers)
+            self.conn.commit()
+
+    def conditional_headers(self, url):
+        """Get If-None-Match/If-Modified-Since headers for a conditional request
+
+        Returns an empty dict if no validators are stored for the URL.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified FROM validators WHERE url = ?', (normalize_url(url),)
+            ).fetchone()
+
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def touch(self, url):
+        """Mark a page as just checked, after the server said it is unchanged"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute('UPDATE pages SET fetched_at = ? WHERE url = ?', (now, normalize_url(url)))
+            self.conn.execute('UPDATE validators SET checked_at = ? WHERE url = ?', (now, normalize_url(url)))
+            self.conn.commit()
+
+    def _read_object(self, content_hash):
+        try:
+            with open(self._object_path(content_hash), 'rb') as f:
+                return zlib.decompress(f.read()).decode('utf-8')
+        except (OSError, zlib.error):
+            return None
+
+    def _to_page(self, row):
+        url, content_hash, fetched_at, status, headers, extra = row
+        html = self._read_object(content_hash)
+        if html is None:
+            return None
+        return CachedPage(url, html, fetched_at, status, json.loads(headers or '{}'), json.loads(extra or '{}'))
+
+    def get(self, url):
+        """Get a cached page, or None if it isn't cached or has expired"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT original_url, content_hash, fetched_at, status, headers, extra FROM pages WHERE url = ?',
+                (normalize_url(url),)
+            ).fetchone()
+
+        if not row:
+            return None
+        if self.max_age and time.time() - row[2] > self.max_age:
+            return None
+        return self._to_page(row)
+
+    def pages(self):
+        """Iterate over every cached page, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT original_url, content_hash, fetched_at, status, headers, extra FROM pages ORDER BY fetched_at'
+            ).fetchall()
+
+        for row in rows:
+            page = self._to_page(row)
+            if page is not None:
+                yield page
+
+    def evict(self):
+        """Remove expired entries, then the oldest ones until under max_bytes
+
+        Returns the number of entries removed.
+        """
+        with self.lock:
+            removed = 0
+            if self.max_age:
+                cursor = self.conn.execute('DELETE FROM pages WHERE fetched_at < ?', (time.time() - self.max_age,))
+                removed += cursor.rowcount
+                self.conn.execute('DELETE FROM validators WHERE checked_at < ?', (time.time() - self.max_age,))
+
+            if self.max_bytes:
+                # Each body counts once, however many URLs point at it
+                total = self.conn.execute(
+                    'SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content_hash, size FROM pages)'
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    oldest = self.conn.execute('SELECT url, size FROM pages ORDER BY fetched_at').fetchall()
+                    for url, size in oldest:
+                        if total <= self.max_bytes:
+                            break
+                        self.conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+                        total -= size
+                        removed += 1
+
+            self.conn.commit()
+            self._puts_since_evict = 0
+
+            # Delete bodies no longer referenced by any URL. This stays under
+            # the lock so a concurrent put can't store a row for a body that
+            # is about to be removed.
+            referenced = {h for (h,) in self.conn.execute('SELECT DISTINCT content_hash FROM pages')}
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    if name.endswith('.z') and prefix + name[:-2] not in referenced:
+                        try:
+                            os.remove(os.path.join(prefix_dir, name))
+                        except OSError:
+                            pass
+
+        return removed
+
+    def close(self):
+        """Close the index database"""
+        self.conn.close()
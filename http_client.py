@@ -0,0 +1,122 @@
+﻿import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rate_limiter import get_rate_limiter
+from metrics import timed
+
+# Connections kept open per host by the shared session
+POOL_SIZE = 20
+
+# Sent with every request; some sites serve a stripped page to unknown clients
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-AU,en;q=0.9'
+}
+
+
+def create_session(pool_size=POOL_SIZE):
+    """Create a requests session with connection pooling and retries"""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+
+    # Retry connection errors and transient server errors with backoff
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class NotModified(Exception):
+    """Raised when a conditional request finds the page unchanged (HTTP 304)"""
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Get the HTTP session shared by all scrapers in this process"""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+def fetch_html(url, timeout=10, session=None, rate_limiter=None, cache=None):
+    """Fetch a page over plain HTTP, waiting for the host's rate limit first
+
+    Returns the HTML, or None if the request failed or didn't return 200.
+    If an HtmlCache is given, the request is conditional on the validators
+    from the last fetch and NotModified is raised when the page is unchanged.
+    Only the validators are kept, not the page.
+    """
+    session = session or get_http_session()
+    rate_limiter = rate_limiter or get_rate_limiter()
+    headers = cache.conditional_headers(url) if cache is not None else {}
+
+    rate_limiter.wait(url)
+    with timed('listing.fetch') as timing:
+        try:
+            response = session.get(url, timeout=timeout, headers=headers)
+        except requests.RequestException as e:
+            print(f"HTTP request failed for {url}: {e}")
+            timing.outcome = 'error'
+            return None
+
+        if response.status_code == 304 and headers:
+            cache.touch(url)
+            raise NotModified(url)
+
+        if response.status_code != 200:
+            print(f"HTTP {response.status_code} for {url}")
+            timing.outcome = f'http_{response.status_code}'
+            return None
+
+        if cache is not None:
+            cache.set_validators(url, response.headers)
+
+        timing.bytes = len(response.content)
+        return response.text
+
+
+def download_html(url, cache=None, extra=None, timeout=15, session=None, rate_limiter=None, revalidate=False):
+    """Download a page, using and filling an HtmlCache if one is given
+
+    Unlike fetch_html this raises on failure, so it suits callers that
+    handle errors per article. extra is stored with the cached page.
+    With revalidate=True a cached page is not returned as is; the server is
+    asked whether it changed, and NotModified is raised if it hasn't.
+    """
+    headers = {}
+    if cache is not None:
+        if revalidate:
+            headers = cache.conditional_headers(url)
+        else:
+            cached = cache.get(url)
+            if cached is not None:
+                return cached.html
+
+    session = session or get_http_session()
+    rate_limiter = rate_limiter or get_rate_limiter()
+
+    rate_limiter.wait(url)
+    response = session.get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304 and headers:
+        cache.touch(url)
+        raise NotModified(url)
+    response.raise_for_status()
+
+    # requests assumes ISO-8859-1 when no charset is given; news sites are UTF-8
+    if 'charset' not in response.headers.get('Content-Type', '').lower():
+        response.encoding = 'utf-8'
+    html = response.text
+
+    if cache is not None:
+        cache.put(url, html, response.status_code, response.headers, extra)
+
+    return html
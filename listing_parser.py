@@ -0,0 +1,63 @@
+﻿import importlib.util
+from bs4 import BeautifulSoup, SoupStrainer
+from metrics import timed
+
+# lxml's tokenizer is several times faster than html.parser; newspaper3k
+# already depends on it, but fall back to the standard library without it
+PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Returns the outer HTML of the elements matching a CSS selector, from index
+# arguments[1] on (negative counts back from the end)
+RESULTS_SCRIPT = '''
+var nodes = document.querySelectorAll(arguments[0]);
+var start = arguments[1] < 0 ? Math.max(0, nodes.length + arguments[1]) : arguments[1];
+var html = [];
+for (var i = start; i < nodes.length; i++) {
+    html.push(nodes[i].outerHTML);
+}
+return html;
+'''
+
+
+def parse_results(html, name, attrs=None, **kwargs):
+    """Parse only the elements of a page that match name and attrs
+
+    Takes the same filters as find_all(), e.g. parse_results(html, 'div',
+    class_='searchresult'). Everything outside the matching elements is
+    skipped while parsing instead of being built into a tree, so this is
+    much cheaper than parsing the whole page and then calling find_all().
+    """
+    attrs = attrs or {}
+    with timed('listing.parse') as timing:
+        timing.bytes = len(html or '')
+        strainer = SoupStrainer(name, attrs, **kwargs)
+        soup = BeautifulSoup(html, PARSER, parse_only=strainer)
+        return soup.find_all(name, attrs, **kwargs)
+
+
+def browser_results(browser, css_selector, start=0):
+    """Get the outer HTML of the elements matching a CSS selector in a browser
+
+    Only the result containers are copied out of the browser, instead of
+    the whole page_source. start skips results already handled, which
+    keeps scroll loops from re-reading the results loaded by earlier
+    scrolls; start=-1 returns just the last result. Returns a list of HTML
+    strings.
+    """
+    with timed('listing.browser_extract') as timing:
+        fragments = browser.execute_script(RESULTS_SCRIPT, css_selector, start) or []
+        timing.bytes = sum(len(fragment) for fragment in fragments)
+    return fragments
+
+
+def parse_browser_results(browser, css_selector, name, attrs=None, start=0, **kwargs):
+    """Parse the result containers matching a CSS selector in a browser
+
+    css_selector picks the elements in the browser; name, attrs and kwargs
+    describe the same elements for the parser. Scroll loops can pass the
+    number of results handled so far as start.
+    """
+    fragments = browser_results(browser, css_selector, start)
+    if not fragments:
+        return []
+    return parse_results(''.join(fragments), name, attrs, **kwargs)
@@ -0,0 +1,257 @@
+﻿import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# Durations kept per stage for percentiles; beyond this a random sample is kept
+MAX_SAMPLES = 10000
+
+# Percentiles reported for each stage
+QUANTILES = (0.5, 0.9, 0.99)
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+class StageStats:
+    """Timings, byte counts and outcomes recorded for one stage"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.outcomes = Counter()
+        self.samples = []
+
+    def add(self, seconds, nbytes, outcome, rng):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += nbytes
+        self.outcomes[outcome] += 1
+
+        # Reservoir sampling keeps memory flat over long runs
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            slot = rng.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = seconds
+
+    def quantile(self, fraction):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class Timing:
+    """Handed out by Metrics.timed; set bytes and outcome before the block ends"""
+
+    def __init__(self):
+        self.bytes = 0
+        self.outcome = None
+
+
+class Metrics:
+    """Thread-safe registry of per-stage timings for a run
+
+    Stages are named like 'article.download' and may carry labels such as
+    source='Reuters Finance'. The report can be written as JSON or in the
+    Prometheus text format (e.g. for node_exporter's textfile collector).
+    """
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.rng = random.Random()
+
+    def record(self, stage, seconds, nbytes=0, outcome='ok', **labels):
+        """Record one run of a stage"""
+        key = (stage, tuple(sorted(labels.items())))
+        with self.lock:
+            stats = self.stages.get(key)
+            if stats is None:
+                stats = self.stages[key] = StageStats()
+            stats.add(seconds, nbytes or 0, outcome, self.rng)
+
+    @contextmanager
+    def timed(self, stage, **labels):
+        """Time a block as one run of a stage
+
+        An exception leaving the block is recorded as the outcome (its class
+        name) unless the block set one, and is re-raised.
+        """
+        timing = Timing()
+        started = time.perf_counter()
+        try:
+            yield timing
+        except BaseException as e:
+            timing.outcome = timing.outcome or type(e).__name__
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - started, timing.bytes, timing.outcome or 'ok', **labels)
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.started = datetime.now()
+
+    def report(self):
+        """The recorded stages as a dict, ready for JSON"""
+        with self.lock:
+            stages = []
+            for (stage, labels), stats in sorted(self.stages.items()):
+                stages.append({
+                    'stage': stage,
+                    'labels': dict(labels),
+                    'count': stats.count,
+                    'seconds': round(stats.seconds, 6),
+                    'mean_ms': round(stats.seconds / stats.count * 1000, 3) if stats.count else None,
+                    'max_ms': round(stats.max_seconds * 1000, 3),
+                    'quantiles_ms': {str(q): round(stats.quantile(q) * 1000, 3) for q in QUANTILES
+                                     if stats.samples},
+                    'bytes': stats.bytes,
+                    'outcomes': dict(stats.outcomes),
+                })
+
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'stages': stages,
+        }
+
+    def prometheus_text(self, prefix='news_pipeline'):
+        """The recorded stages in the Prometheus text exposition format"""
+        report = self.report()
+        lines = [
+            f'# HELP {prefix}_stage_seconds Time spent in each pipeline stage',
+            f'# TYPE {prefix}_stage_seconds summary',
+        ]
+        for stage in report['stages']:
+            labels = _labels(stage)
+            for q, value in stage['quantiles_ms'].items():
+                lines.append(f'{prefix}_stage_seconds{{{labels},quantile="{q}"}} {value / 1000:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{{labels}}} {stage["seconds"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{{labels}}} {stage["count"]}')
+
+        lines += [f'# HELP {prefix}_stage_bytes_total Bytes handled by each pipeline stage',
+                  f'# TYPE {prefix}_stage_bytes_total counter']
+        lines += [f'{prefix}_stage_bytes_total{{{_labels(stage)}}} {stage["bytes"]}' for stage in report['stages']]
+
+        lines += [f'# HELP {prefix}_stage_outcomes_total Runs of each pipeline stage by outcome',
+                  f'# TYPE {prefix}_stage_outcomes_total counter']
+        for stage in report['stages']:
+            for outcome, count in sorted(stage['outcomes'].items()):
+                lines.append(f'{prefix}_stage_outcomes_total{{{_labels(stage)},outcome="{_escape(outcome)}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path_prefix):
+        """Write the run report to <path_prefix>.json and <path_prefix>.prom
+
+        Returns the two paths. Files are replaced atomically, so a collector
+        never reads a half-written file.
+        """
+        json_path = path_prefix + '.json'
+        prom_path = path_prefix + '.prom'
+        _write_atomic(json_path, json.dumps(self.report(), indent=2))
+        _write_atomic(prom_path, self.prometheus_text())
+        return json_path, prom_path
+
+    def summary(self):
+        """A short table of the stages, slowest in total first"""
+        stages = sorted(self.report()['stages'], key=lambda stage: stage['seconds'], reverse=True)
+        lines = [f"{'stage':<28} {'count':>7} {'total s':>9} {'p50 ms':>9} {'p99 ms':>9} {'MB':>8}"]
+        for stage in stages:
+            name = stage['stage'] + ''.join(f' [{value}]' for value in stage['labels'].values())
+            lines.append(f"{name[:28]:<28} {stage['count']:>7} {stage['seconds']:>9.2f} "
+                         f"{stage['quantiles_ms'].get('0.5', 0):>9.1f} {stage['quantiles_ms'].get('0.99', 0):>9.1f} "
+                         f"{stage['bytes'] / 1024 ** 2:>8.2f}")
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(stage):
+    labels = {'stage': stage['stage'], **stage['labels']}
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _write_atomic(path, content):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Get the metrics registry shared by everything in this process"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+
+def timed(stage, **labels):
+    """Time a block as a stage in the shared registry (see Metrics.timed)"""
+    return get_metrics().timed(stage, **labels)
+
+
+@contextmanager
+def profiled(profiler=None, output=None):
+    """Profile a block with cProfile or pyinstrument, if profiler is set
+
+    cProfile stats are saved to output (default run.prof, for snakeviz or
+    pstats) and the top functions by cumulative time are printed.
+    pyinstrument, if installed, writes an HTML report (default run.html).
+    """
+    if not profiler:
+        yield
+        return
+
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; profiling with cProfile instead")
+            profiler = 'cprofile'
+
+    if profiler == 'pyinstrument':
+        profiler_obj = Profiler()
+        profiler_obj.start()
+        try:
+            yield
+        finally:
+            profiler_obj.stop()
+            output = output or 'run.html'
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(profiler_obj.output_html())
+            print(f"Profile written to {output}")
+        return
+
+    import cProfile
+    import pstats
+
+    profiler_obj = cProfile.Profile()
+    profiler_obj.enable()
+    try:
+        yield
+    finally:
+        profiler_obj.disable()
+        output = output or 'run.prof'
+        profiler_obj.dump_stats(output)
+        pstats.Stats(profiler_obj).sort_stats('cumulative').print_stats(25)
+        print(f"Profile written to {output}")
@@ -0,0 +1,210 @@
+﻿import re
+import sqlite3
+import hashlib
+import threading
+import zlib
+
+# NumPy computes the signatures; without it articles are stored unfingerprinted
+# and the dedup command, which needs it, clusters them later
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# MinHash signature length, split into BANDS bands of ROWS values for LSH.
+# Two articles become candidates when any band matches exactly, which for
+# 16 bands of 8 rows is likely above ~70% similarity and rare below ~50%.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Estimated Jaccard similarity of word shingles above which a candidate is
+# treated as the same story
+THRESHOLD = 0.8
+
+# Words per shingle, and the fewest shingles worth comparing; shorter texts
+# (paywall stubs, video pages) would match each other on boilerplate alone
+SHINGLE_SIZE = 5
+MIN_SHINGLES = 20
+
+WORD_RE = re.compile(r'\w+')
+
+# Multiply-shift hash functions, one per signature slot; fixed so that
+# signatures stored by earlier runs stay comparable
+if np is not None:
+    _rng = np.random.default_rng(20250101)
+    _MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+    _INCREMENTS = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def minhash_signature(text):
+    """Compute the MinHash signature of a text as NUM_PERM uint32 values
+
+    Returns None if the text is too short to compare reliably, or if
+    NumPy isn't installed.
+    """
+    if np is None:
+        return None
+    words = WORD_RE.findall((text or '').lower())
+    if len(words) - SHINGLE_SIZE + 1 < MIN_SHINGLES:
+        return None
+
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                         dtype=np.uint64, count=len(shingles))
+
+    # Every hash function over every shingle at once; uint64 wraps around,
+    # and the top 32 bits of the product are the hash value
+    with np.errstate(over='ignore'):
+        values = (_MULTIPLIERS[:, None] * hashes[None, :] + _INCREMENTS[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature):
+    """LSH bucket keys of a signature, one signed 64-bit integer per band"""
+    keys = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return float(np.mean(signature == other))
+
+
+def fingerprint(text):
+    """Signature bytes and band keys of a text, as stored with the article
+
+    Returns (None, None) for texts too short to compare, and when NumPy
+    isn't installed (see fingerprinting_available).
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return None, None
+    return signature.tobytes(), band_keys(signature)
+
+
+def fingerprinting_available():
+    """Whether texts can be fingerprinted, i.e. NumPy is installed"""
+    return np is not None
+
+
+class NearDuplicateIndex:
+    """LSH index of stored article texts, for finding syndicated copies
+
+    Band keys of each cluster's first article are kept in the minhash_bands
+    table, so lookups are a few indexed queries rather than a scan. Articles
+    accepted but not yet committed are held in memory, so copies of a story
+    in the same batch also find each other. Like UrlIndex, it reads through
+    its own connection and can be used from any thread.
+    """
+
+    def __init__(self, db_name, threshold=THRESHOLD):
+        self.db_name = db_name
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        # url -> (signature, band keys) of articles not committed yet
+        self.pending = {}
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        return self._conn
+
+    def find(self, signature, bands, exclude_url=None):
+        """Find the stored or pending article a text duplicates
+
+        signature is the stored bytes form. Returns (url, similarity) of the
+        most similar article at or above the threshold, or None.
+        """
+        if signature is None:
+            return None
+        signature = np.frombuffer(signature, dtype=np.uint32)
+        candidates = []
+
+        with self.lock:
+            for url, (other, other_bands) in self.pending.items():
+                if url != exclude_url and not set(bands).isdisjoint(other_bands):
+                    candidates.append((url, other))
+
+            placeholders = ', '.join('?' * len(bands))
+            rows = self._connection().execute(f'''
+            SELECT a.url, m.signature
+            FROM minhash_bands k
+            JOIN article_minhash m ON m.article_id = k.article_id
+            JOIN articles a ON a.id = k.article_id
+            WHERE k.bucket IN ({placeholders}) AND m.signature IS NOT NULL
+            GROUP BY k.article_id
+            ''', bands).fetchall()
+            candidates += [(url, other) for url, other in rows if url != exclude_url]
+
+        best = None
+        for url, other in candidates:
+            score = similarity(signature, np.frombuffer(other, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (url, score)
+        return best
+
+    def add_pending(self, url, signature, bands):
+        """Hold an article that will start a new cluster until it is committed"""
+        if signature is not None:
+            with self.lock:
+                self.pending[url] = (signature, bands)
+
+    def committed(self, urls):
+        """Forget pending articles once their rows are committed, or weren't written"""
+        with self.lock:
+            for url in urls:
+                self.pending.pop(url, None)
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+
+def cluster_stored_articles(db, batch_size=500, drop_text=False):
+    """Fingerprint stored articles that predate the index, clustering copies
+
+    Articles are visited oldest id first, so the first stored copy of a
+    story stays its cluster's representative. With drop_text=True the text
+    of each copy is deleted, as it is for copies found while fetching.
+    Returns (indexed, linked).
+    """
+    if np is None:
+        raise RuntimeError('Finding copies needs NumPy; install numpy to run dedup')
+    index = db.duplicate_index
+    indexed = 0
+    linked = 0
+    after_id = 0
+
+    while True:
+        articles = db.get_unfingerprinted_articles(batch_size, after_id)
+        if not articles:
+            break
+        after_id = articles[-1][0]
+
+        fingerprints = []
+        links = []
+        for article_id, url, text in articles:
+            signature, bands = fingerprint(text)
+            match = index.find(signature, bands, exclude_url=url)
+            if match:
+                links.append((match[0], article_id))
+            else:
+                index.add_pending(url, signature, bands)
+                fingerprints.append((url, signature, bands))
+
+        db.store_fingerprints(fingerprints)
+        db.link_duplicates(links, drop_text)
+        index.committed(url for url, signature, bands in fingerprints)
+
+        indexed += len(fingerprints)
+        linked += len(links)
+        print(f"Fingerprinted {indexed + linked} articles, {linked} linked to an earlier copy")
+
+    return indexed, linked
@@ -1,6 +1,167 @@
-﻿import sqlite3
-import os
+﻿import re
+import zlib
+import sqlite3
+import time
 from datetime import datetime
+from url_index import UrlIndex
+from metrics import timed
+from date_normalizer import to_storage, from_storage
+from near_duplicates import NearDuplicateIndex, fingerprint, fingerprinting_available
+from url_normalizer import normalize_url, canonical_link
+
+# zstandard compresses article text better and faster than zlib; it is
+# optional, and zlib is used when it isn't installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Article metadata. The body text lives in article_bodies, so scans of
+# this table (listing, stats, dedup) don't drag full articles through the
+# page cache.
+ARTICLES_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    ticker_id INTEGER,
+    url TEXT UNIQUE,
+    title TEXT,
+    date_published TIMESTAMP,
+    source TEXT,
+    author TEXT,
+    summary TEXT,
+    sentiment REAL,
+    fetch_date TIMESTAMP,
+    keywords TEXT,
+    nlp_status TEXT,
+    cluster_id INTEGER,
+    canonical_url TEXT,
+    FOREIGN KEY (ticker_id) REFERENCES tickers (id)
+)
+'''
+
+# Columns added to articles after it was first released, with their types;
+# older databases get them on open
+ADDED_ARTICLE_COLUMNS = (('keywords', 'TEXT'), ('nlp_status', 'TEXT'), ('cluster_id', 'INTEGER'),
+                         ('canonical_url', 'TEXT'))
+
+# nlp_status values. Articles stored with deferred NLP are pending until
+# ArticleFetcher.summarize_pending computes their summary and keywords.
+# Articles stored before the column existed have NULL.
+NLP_PENDING = 'pending'
+NLP_DONE = 'done'
+NLP_FAILED = 'failed'
+
+# Dates stored before they were normalized, which older databases may hold,
+# and a GLOB pattern matching the canonical STORAGE_FORMAT timestamps
+DATE_COLUMNS = (('articles', ('date_published', 'fetch_date')), ('scrape_state', ('newest_date', 'last_run')))
+STORAGE_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+
+# Insert an article, or update it in place if the URL is already stored.
+# Updating (rather than INSERT OR REPLACE) keeps the article id stable and
+# fires the UPDATE trigger that keeps the full-text index in sync. The 12th
+# parameter is the URL of the article this one is a copy of, or None, and
+# the 13th its canonical URL. An article whose canonical URL is already
+# stored under another URL is the same page, and is skipped.
+UPSERT_ARTICLE_SQL = '''
+INSERT INTO articles 
+(ticker_id, url, title, date_published, source, author, summary, sentiment, fetch_date, keywords, nlp_status,
+ cluster_id, canonical_url) 
+SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, (SELECT id FROM articles WHERE url = ?), ?
+WHERE NOT EXISTS (SELECT 1 FROM articles WHERE canonical_url = ?13 AND url <> ?2)
+ON CONFLICT(url) DO UPDATE SET
+    ticker_id = excluded.ticker_id,
+    title = excluded.title,
+    date_published = excluded.date_published,
+    source = excluded.source,
+    author = excluded.author,
+    summary = excluded.summary,
+    sentiment = excluded.sentiment,
+    fetch_date = excluded.fetch_date,
+    keywords = excluded.keywords,
+    nlp_status = excluded.nlp_status,
+    cluster_id = excluded.cluster_id,
+    canonical_url = excluded.canonical_url
+'''
+
+# Record a skipped URL as an alias of the stored article with its canonical
+# URL, so the page isn't downloaded again. Parameters are the URL and the
+# canonical URL; a URL stored as an article itself is left alone.
+INSERT_ALIAS_SQL = '''
+INSERT OR REPLACE INTO article_aliases (url, article_id)
+SELECT ?1, id FROM articles
+WHERE canonical_url = ?2 AND url <> ?1 AND NOT EXISTS (SELECT 1 FROM articles WHERE url = ?1)
+ORDER BY id LIMIT 1
+'''
+
+# Store the compressed body of the article with the given URL. Identical
+# bodies are left alone so re-fetching an unchanged article doesn't
+# re-index it. Copies of another article share its body and store none;
+# if that article is deleted, one of them takes the body over.
+UPSERT_BODY_SQL = '''
+INSERT INTO article_bodies (article_id, codec, text)
+SELECT id, ?, ? FROM articles WHERE url = ? AND cluster_id IS NULL
+ON CONFLICT(article_id) DO UPDATE SET
+    codec = excluded.codec,
+    text = excluded.text
+WHERE excluded.text IS NOT article_bodies.text
+'''
+
+# Columns for the (id, url, title, date_published, source, author, text,
+# summary, sentiment) rows returned by the query methods. The body comes
+# back compressed and is expanded by _article_row() for returned rows only.
+ARTICLE_COLUMNS = 'a.id, a.url, a.title, a.date_published, a.source, a.author, b.codec, b.text, a.summary, a.sentiment'
+# A copy of another article (cluster_id set) reads that article's body
+BODY_JOIN = 'LEFT JOIN article_bodies b ON b.article_id = coalesce(a.cluster_id, a.id)'
+ARTICLE_FROM = f'articles a {BODY_JOIN}'
+
+# Columns that can be requested from iter_articles_for_ticker; 'text' joins
+# article_bodies, 'copies' counts the article's copies in the same ticker,
+# and everything else is read from articles alone
+ARTICLE_FIELDS = ('id', 'url', 'title', 'date_published', 'source', 'author', 'text',
+                  'summary', 'sentiment', 'fetch_date', 'keywords', 'nlp_status', 'cluster_id', 'canonical_url',
+                  'copies')
+
+# What a copy shares with the article it copies
+CLUSTER_SHARED_COLUMNS = ('summary', 'keywords', 'nlp_status', 'sentiment')
+
+# Default projection for listings
+LISTING_COLUMNS = ('id', 'date_published', 'title')
+
+
+def compress_body(text):
+    """Compress article text for storage, returning (codec, data)"""
+    if text is None:
+        return None, None
+    data = text.encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=6).compress(data)
+    return 'zlib', zlib.compress(data, 6)
+
+
+def decompress_body(codec, data):
+    """Expand text stored by compress_body (also SQL function body_text)"""
+    if data is None:
+        return None
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Article text is zstd-compressed; install zstandard to read it')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == 'zlib':
+        data = zlib.decompress(data)
+    return data.decode('utf-8') if isinstance(data, bytes) else data
+
+
+def _keywords_text(keywords):
+    """Store keywords (a list from newspaper3k, or a string) as one string"""
+    if keywords is None or isinstance(keywords, str):
+        return keywords
+    return ', '.join(keywords)
+
+
+def _article_row(row):
+    """Replace the (codec, compressed text) pair in a query row with the text"""
+    return row[:6] + (decompress_body(row[6], row[7]),) + row[8:]
+
 
 class NewsDatabase:
     def __init__(self, db_name='financial_news.db'):
@@ -8,8 +169,25 @@ class NewsDatabase:
         self.db_name = db_name
         self.conn = sqlite3.connect(db_name)
         self.cursor = self.conn.cursor()
+        self._url_index = None
+        self._duplicate_index = None
+        # Ticker registry: symbol -> id. Ids never change once assigned.
+        self._ticker_ids = {}
+        self._configure_connection()
         self._create_tables()
         
+    def _configure_connection(self):
+        """Set pragmas for faster writes"""
+        # WAL lets readers continue while we write and makes commits cheaper
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL only syncs at checkpoints and is still crash-safe
+        self.cursor.execute('PRAGMA synchronous=NORMAL')
+        self.cursor.execute('PRAGMA temp_store=MEMORY')
+        self.cursor.execute('PRAGMA cache_size=-20000')  # ~20 MB page cache
+        self.cursor.execute('PRAGMA busy_timeout=5000')
+        # Lets SQL (the search index and its triggers) read compressed bodies
+        self.conn.create_function('body_text', 2, decompress_body, deterministic=True)
+        
     def _create_tables(self):
         """Create necessary tables if they don't exist"""
         # Table for storing ticker information
@@ -24,81 +202,782 @@ class NewsDatabase:
         ''')
         
         # Table for storing article information
+        self.cursor.execute(ARTICLES_TABLE_SQL.format(name='articles'))
+        
+        # Compressed article text, one row per article, read only when needed
         self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS articles (
-            id INTEGER PRIMARY KEY,
-            ticker_id INTEGER,
-            url TEXT UNIQUE,
-            title TEXT,
-            date_published TIMESTAMP,
+        CREATE TABLE IF NOT EXISTS article_bodies (
+            article_id INTEGER PRIMARY KEY,
+            codec TEXT,
+            text BLOB,
+            FOREIGN KEY (article_id) REFERENCES articles (id)
+        )
+        ''')
+        self._migrate_article_bodies()
+        self._add_missing_columns('articles', ADDED_ARTICLE_COLUMNS)
+        
+        # Lookups of links by the page's canonical URL
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_canonical ON articles (canonical_url)')
+        
+        # Other URLs a stored page was found under, skipped as the same page
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_aliases (
+            url TEXT PRIMARY KEY,
+            article_id INTEGER,
+            FOREIGN KEY (article_id) REFERENCES articles (id)
+        )
+        ''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_alias_article ON article_aliases (article_id)')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_delete_aliases AFTER DELETE ON articles BEGIN
+            DELETE FROM article_aliases WHERE article_id = old.id;
+        END
+        ''')
+        
+        # A deleted article's body goes with it, unless copies of the article
+        # still share it (articles_cluster_handover gives it to one of them).
+        # This replaces articles_delete_body, which always deleted it.
+        self.cursor.execute('DROP TRIGGER IF EXISTS articles_delete_body')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_delete_unshared_body AFTER DELETE ON articles BEGIN
+            DELETE FROM article_bodies WHERE article_id = old.id
+                AND NOT EXISTS (SELECT 1 FROM articles WHERE cluster_id = old.id);
+        END
+        ''')
+        
+        # Newest article seen per ticker (or search term) and source, so
+        # repeat scrapes can stop listing once they reach known content
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_state (
+            subject TEXT,
             source TEXT,
-            author TEXT,
-            text TEXT,
-            summary TEXT,
-            sentiment REAL,
-            fetch_date TIMESTAMP,
-            FOREIGN KEY (ticker_id) REFERENCES tickers (id)
+            newest_date TIMESTAMP,
+            newest_url TEXT,
+            last_run TIMESTAMP,
+            PRIMARY KEY (subject, source)
         )
         ''')
         
-        # Create indexes for faster lookups
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_ticker_symbol ON tickers (symbol)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_url ON articles (url)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_ticker ON articles (ticker_id)')
+        # Articles waiting for the summarize worker; the index only holds those
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_article_nlp_pending ON articles (id) "
+                            f"WHERE nlp_status = '{NLP_PENDING}'")
+        
+        # Articles the sentiment scorer hasn't reached yet
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_unscored ON articles (id) WHERE sentiment IS NULL')
+        
+        # The UNIQUE constraints on tickers.symbol and articles.url already
+        # index those columns, so these copies only took up space
+        self.cursor.execute('DROP INDEX IF EXISTS idx_ticker_symbol')
+        self.cursor.execute('DROP INDEX IF EXISTS idx_article_url')
+        # A ticker's articles in date order (id, the rowid, breaks ties), so
+        # listings and their keyset pages walk the index instead of sorting.
+        # It also serves lookups by ticker_id alone, which idx_article_ticker did.
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_ticker_date ON articles (ticker_id, date_published)')
+        self.cursor.execute('DROP INDEX IF EXISTS idx_article_ticker')
+        # Only the LIKE search fallback ordered all articles by date
+        self.cursor.execute('DROP INDEX IF EXISTS idx_article_date')
+        
+        self._migrate_dates()
+        self._create_duplicate_tables()
+        self._migrate_canonical_urls()
+        self._create_ticker_stats()
+        self.fts_enabled = self._create_search_index()
         
         self.conn.commit()
     
+    def _add_missing_columns(self, table, columns):
+        """Add columns that databases created by older versions don't have"""
+        existing = {row[1] for row in self.cursor.execute(f'PRAGMA table_info({table})')}
+        for name, column_type in columns:
+            if name not in existing:
+                self.cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+    
+    def _create_trigger(self, name, definition):
+        """Create a trigger, replacing one of the same name defined differently
+        
+        definition is everything after CREATE TRIGGER <name>. Databases
+        created by older versions get the current definition this way.
+        """
+        sql = f'CREATE TRIGGER {name} {definition}'
+        self.cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+        existing = self.cursor.fetchone()
+        if existing and existing[0] == sql:
+            return
+        if existing:
+            self.cursor.execute(f'DROP TRIGGER {name}')
+        self.cursor.execute(sql)
+    
+    def _migrate_article_bodies(self):
+        """Move article text from articles into article_bodies
+        
+        Databases created before article_bodies existed keep the text inline.
+        The text is compressed into article_bodies and articles is rebuilt
+        without it, in one transaction, then the file is vacuumed to give the
+        space back. The search index is rebuilt afterwards.
+        """
+        columns = [row[1] for row in self.cursor.execute('PRAGMA table_info(articles)')]
+        if 'text' not in columns:
+            return False
+        
+        print("Moving article text to compressed storage (one-time migration)...")
+        self.cursor.execute('BEGIN')
+        try:
+            # The old search index and its triggers read articles.text
+            for trigger in ('articles_fts_insert', 'articles_fts_delete', 'articles_fts_update'):
+                self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            self.cursor.execute('DROP TABLE IF EXISTS articles_fts')
+            
+            rows = self.conn.execute('SELECT id, text FROM articles')
+            self.cursor.executemany(
+                'INSERT OR REPLACE INTO article_bodies (article_id, codec, text) VALUES (?, ?, ?)',
+                ((article_id,) + compress_body(text) for article_id, text in rows)
+            )
+            
+            self.cursor.execute(ARTICLES_TABLE_SQL.format(name='articles_migrated'))
+            self.cursor.execute('''
+            INSERT INTO articles_migrated
+            (id, ticker_id, url, title, date_published, source, author, summary, sentiment, fetch_date)
+            SELECT id, ticker_id, url, title, date_published, source, author, summary, sentiment, fetch_date
+            FROM articles
+            ''')
+            self.cursor.execute('DROP TABLE articles')
+            self.cursor.execute('ALTER TABLE articles_migrated RENAME TO articles')
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        
+        self.cursor.execute('VACUUM')
+        return True
+    
+    def _migrate_dates(self):
+        """Convert dates stored before they were normalized to UTC timestamps
+        
+        Older versions stored datetimes as str() in local time, usually with
+        microseconds ('2025-03-25 14:53:22.814453'). Any date not in the
+        canonical layout is read as local time and rewritten by to_storage.
+        Values that aren't dates are left as they are.
+        """
+        updates = {}
+        for table, columns in DATE_COLUMNS:
+            for column in columns:
+                rows = self.cursor.execute(f'SELECT rowid, {column} FROM {table} WHERE {column} NOT GLOB ?',
+                                           (STORAGE_GLOB,)).fetchall()
+                converted = [(to_storage(value), rowid) for rowid, value in rows]
+                converted = [(value, rowid) for value, rowid in converted if value]
+                if converted:
+                    updates[table, column] = converted
+        if not updates:
+            return False
+        
+        print("Converting stored dates to UTC (one-time migration)...")
+        for (table, column), converted in updates.items():
+            self.cursor.executemany(f'UPDATE {table} SET {column} = ? WHERE rowid = ?', converted)
+        return True
+    
+    def _migrate_canonical_urls(self):
+        """Normalize the URLs of articles stored before links were normalized
+        
+        Each such article's URL is rewritten to its normalized form, which is
+        also its canonical URL. Where several stored URLs normalize to the
+        same one, the later articles keep their old URL and become copies of
+        the first (see _create_duplicate_tables).
+        """
+        rows = self.cursor.execute('SELECT id, url FROM articles WHERE canonical_url IS NULL ORDER BY id').fetchall()
+        if not rows:
+            return False
+        
+        print("Normalizing stored article URLs (one-time migration)...")
+        for article_id, url in rows:
+            normalized = normalize_url(url)
+            if normalized != url:
+                self.cursor.execute('SELECT id FROM articles WHERE url = ?', (normalized,))
+                holder = self.cursor.fetchone()
+                if holder is None:
+                    self.cursor.execute('UPDATE articles SET url = ? WHERE id = ?', (normalized, article_id))
+                else:
+                    self._link_copy(holder[0], article_id)
+            self.cursor.execute('UPDATE articles SET canonical_url = ? WHERE id = ?', (normalized, article_id))
+        return True
+    
+    def _link_copy(self, original_id, article_id):
+        """Make an article, and any copies of it, copies of another article"""
+        self.cursor.execute('SELECT coalesce(cluster_id, id) FROM articles WHERE id = ?', (original_id,))
+        cluster_id = self.cursor.fetchone()[0]
+        if cluster_id == article_id:
+            return
+        self.cursor.execute('UPDATE articles SET cluster_id = ? WHERE id = ? OR cluster_id = ?',
+                            (cluster_id, article_id, article_id))
+        self.cursor.execute('DELETE FROM article_minhash WHERE article_id = ?', (article_id,))
+        self.cursor.execute('DELETE FROM minhash_bands WHERE article_id = ?', (article_id,))
+    
+    def _create_duplicate_tables(self):
+        """Create the MinHash tables and the triggers that keep copies in step
+        
+        article_minhash holds the signature of each article that starts a
+        cluster (NULL if its text is too short to compare) and minhash_bands
+        its LSH bucket keys, which NearDuplicateIndex looks up. A copy has
+        cluster_id set to the article it copies and shares that article's
+        body, summary, keywords and sentiment, so it is never summarized or
+        scored on its own.
+        """
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_minhash (
+            article_id INTEGER PRIMARY KEY,
+            signature BLOB,
+            FOREIGN KEY (article_id) REFERENCES articles (id)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS minhash_bands (
+            bucket INTEGER,
+            article_id INTEGER,
+            PRIMARY KEY (bucket, article_id)
+        ) WITHOUT ROWID
+        ''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_minhash_bands_article ON minhash_bands (article_id)')
+        # Only copies are indexed; most articles start their own cluster
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_article_cluster ON articles (cluster_id) '
+                            'WHERE cluster_id IS NOT NULL')
+        
+        shared = ', '.join(CLUSTER_SHARED_COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in CLUSTER_SHARED_COLUMNS)
+        changed = ' OR '.join(f'old.{column} IS NOT new.{column}' for column in CLUSTER_SHARED_COLUMNS)
+        # Copy the shared columns from the cluster's first article. The
+        # upsert of a re-fetched copy resets them, so this runs on those too.
+        copy_shared = f'''
+            UPDATE articles SET ({shared}) = (SELECT {shared} FROM articles WHERE id = new.cluster_id)
+            WHERE id = new.id AND EXISTS (SELECT 1 FROM articles WHERE id = new.cluster_id);
+        '''
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS articles_cluster_insert AFTER INSERT ON articles
+        WHEN new.cluster_id IS NOT NULL BEGIN
+            {copy_shared}
+        END
+        ''')
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS articles_cluster_update AFTER UPDATE OF cluster_id, {shared} ON articles
+        WHEN new.cluster_id IS NOT NULL BEGIN
+            {copy_shared}
+        END
+        ''')
+        # Hand summaries and scores of a cluster's first article to its copies
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS articles_cluster_share AFTER UPDATE OF {shared} ON articles
+        WHEN new.cluster_id IS NULL AND ({changed}) BEGIN
+            UPDATE articles SET ({shared}) = ({new_values})
+            WHERE cluster_id = new.id;
+        END
+        ''')
+        # When an article with copies is deleted, its oldest copy becomes the
+        # article the other copies copy, and gets the body unless it kept its
+        # own. It has no fingerprint until the dedup command fingerprints it.
+        # This replaces articles_cluster_delete, which left copies without text.
+        self.cursor.execute('DROP TRIGGER IF EXISTS articles_cluster_delete')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_cluster_handover AFTER DELETE ON articles BEGIN
+            DELETE FROM article_minhash WHERE article_id = old.id;
+            DELETE FROM minhash_bands WHERE article_id = old.id;
+            INSERT INTO article_bodies (article_id, codec, text)
+            SELECT (SELECT MIN(id) FROM articles WHERE cluster_id = old.id), codec, text
+            FROM article_bodies WHERE article_id = old.id AND EXISTS (SELECT 1 FROM articles WHERE cluster_id = old.id)
+            ON CONFLICT(article_id) DO NOTHING;
+            DELETE FROM article_bodies WHERE article_id = old.id;
+            UPDATE articles SET cluster_id = (SELECT MIN(id) FROM articles WHERE cluster_id = old.id)
+            WHERE cluster_id = old.id AND id > (SELECT MIN(id) FROM articles WHERE cluster_id = old.id);
+            UPDATE articles SET cluster_id = NULL WHERE cluster_id = old.id;
+        END
+        ''')
+    
+    def _create_ticker_stats(self):
+        """Create the ticker_stats rollup and the triggers that maintain it
+        
+        Each ticker's article count, date range and sentiment total are kept
+        up to date as articles are inserted, updated and deleted, inside the
+        same transaction as the change, so get_ticker_stats is a single row
+        lookup. When an article leaves a ticker its oldest/newest dates are
+        looked up again through idx_article_ticker_date.
+        """
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ticker_stats'")
+        exists = self.cursor.fetchone() is not None
+        
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticker_stats (
+            ticker_id INTEGER PRIMARY KEY,
+            article_count INTEGER NOT NULL DEFAULT 0,
+            oldest_date TIMESTAMP,
+            newest_date TIMESTAMP,
+            sentiment_sum REAL NOT NULL DEFAULT 0,
+            sentiment_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (ticker_id) REFERENCES tickers (id)
+        )
+        ''')
+        
+        # Count an article in its ticker's row. min()/max() would return NULL
+        # for an undated article, so the dates are compared explicitly.
+        add_article = '''
+            INSERT INTO ticker_stats (ticker_id, article_count, oldest_date, newest_date, sentiment_sum, sentiment_count)
+            VALUES (new.ticker_id, 1, new.date_published, new.date_published,
+                    coalesce(new.sentiment, 0), new.sentiment IS NOT NULL)
+            ON CONFLICT(ticker_id) DO UPDATE SET
+                article_count = article_count + 1,
+                oldest_date = CASE WHEN oldest_date IS NULL OR excluded.oldest_date < oldest_date
+                                   THEN coalesce(excluded.oldest_date, oldest_date) ELSE oldest_date END,
+                newest_date = CASE WHEN newest_date IS NULL OR excluded.newest_date > newest_date
+                                   THEN coalesce(excluded.newest_date, newest_date) ELSE newest_date END,
+                sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+                sentiment_count = sentiment_count + excluded.sentiment_count;
+        '''
+        # Take an article out of its ticker's row and find the date range again.
+        # Adding and subtracting floats leaves rounding error in the sum, so
+        # it starts again from 0 once the ticker has no scored articles.
+        remove_article = '''
+            UPDATE ticker_stats SET
+                article_count = article_count - 1,
+                sentiment_sum = CASE WHEN sentiment_count - (old.sentiment IS NOT NULL) = 0 THEN 0
+                                     ELSE sentiment_sum - coalesce(old.sentiment, 0) END,
+                sentiment_count = sentiment_count - (old.sentiment IS NOT NULL),
+                oldest_date = (SELECT MIN(date_published) FROM articles WHERE ticker_id = old.ticker_id),
+                newest_date = (SELECT MAX(date_published) FROM articles WHERE ticker_id = old.ticker_id)
+            WHERE ticker_id = old.ticker_id;
+        '''
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS articles_stats_insert AFTER INSERT ON articles BEGIN
+            {add_article}
+        END
+        ''')
+        self._create_trigger('articles_stats_delete', f'''AFTER DELETE ON articles BEGIN
+            {remove_article}
+        END''')
+        # Re-fetched articles usually change none of these, so most upserts skip it
+        self._create_trigger('articles_stats_update', f'''AFTER UPDATE OF ticker_id, date_published, sentiment ON articles
+        WHEN old.ticker_id IS NOT new.ticker_id OR old.date_published IS NOT new.date_published
+             OR old.sentiment IS NOT new.sentiment BEGIN
+            {remove_article}
+            {add_article}
+        END''')
+        # Clear what rounding left behind before the delete/update triggers reset it
+        self.cursor.execute('UPDATE ticker_stats SET sentiment_sum = 0 WHERE sentiment_count = 0 AND sentiment_sum <> 0')
+        
+        # Count the articles stored before the rollup existed
+        if not exists:
+            self.cursor.execute('''
+            INSERT INTO ticker_stats (ticker_id, article_count, oldest_date, newest_date, sentiment_sum, sentiment_count)
+            SELECT ticker_id, COUNT(*), MIN(date_published), MAX(date_published),
+                   coalesce(SUM(sentiment), 0), COUNT(sentiment)
+            FROM articles GROUP BY ticker_id
+            ''')
+    
+    def _create_search_index(self):
+        """Create the FTS5 full-text index over articles, if SQLite supports it"""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'")
+        exists = self.cursor.fetchone() is not None
+        
+        # What the index sees: each article's title and summary with its text
+        self.cursor.execute('''
+        CREATE VIEW IF NOT EXISTS article_documents AS
+        SELECT a.id AS id, a.title AS title, a.summary AS summary, body_text(b.codec, b.text) AS text
+        FROM articles a LEFT JOIN article_bodies b ON b.article_id = a.id
+        ''')
+        
+        try:
+            # External content table: the index reads title/summary/text
+            # through the view, so article bodies are not stored twice
+            self.cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, summary, text,
+                content='article_documents', content_rowid='id'
+            )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable, falling back to LIKE queries: {e}")
+            return False
+        
+        # Triggers keep the index in sync as articles and their bodies are
+        # inserted, updated and deleted. An article row is written before its
+        # body, so it is first indexed without text and then re-indexed when
+        # the body arrives; only the short title and summary are tokenized twice.
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts (rowid, title, summary, text)
+            VALUES (new.id, new.title, new.summary,
+                    (SELECT body_text(codec, text) FROM article_bodies WHERE article_id = new.id));
+        END
+        ''')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_delete BEFORE DELETE ON articles BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, text)
+            VALUES ('delete', old.id, old.title, old.summary,
+                    (SELECT body_text(codec, text) FROM article_bodies WHERE article_id = old.id));
+        END
+        ''')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, summary ON articles
+        WHEN old.title IS NOT new.title OR old.summary IS NOT new.summary BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, text)
+            VALUES ('delete', old.id, old.title, old.summary,
+                    (SELECT body_text(codec, text) FROM article_bodies WHERE article_id = old.id));
+            INSERT INTO articles_fts (rowid, title, summary, text)
+            VALUES (new.id, new.title, new.summary,
+                    (SELECT body_text(codec, text) FROM article_bodies WHERE article_id = new.id));
+        END
+        ''')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_bodies_fts_insert AFTER INSERT ON article_bodies BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, text)
+            SELECT 'delete', id, title, summary, NULL FROM articles WHERE id = new.article_id;
+            INSERT INTO articles_fts (rowid, title, summary, text)
+            SELECT id, title, summary, body_text(new.codec, new.text) FROM articles WHERE id = new.article_id;
+        END
+        ''')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_bodies_fts_update AFTER UPDATE ON article_bodies BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, text)
+            SELECT 'delete', id, title, summary, body_text(old.codec, old.text) FROM articles WHERE id = old.article_id;
+            INSERT INTO articles_fts (rowid, title, summary, text)
+            SELECT id, title, summary, body_text(new.codec, new.text) FROM articles WHERE id = new.article_id;
+        END
+        ''')
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS article_bodies_fts_delete AFTER DELETE ON article_bodies BEGIN
+            INSERT INTO articles_fts (articles_fts, rowid, title, summary, text)
+            SELECT 'delete', id, title, summary, body_text(old.codec, old.text) FROM articles WHERE id = old.article_id;
+            INSERT INTO articles_fts (rowid, title, summary, text)
+            SELECT id, title, summary, NULL FROM articles WHERE id = old.article_id;
+        END
+        ''')
+        
+        # Index articles stored before the search index existed
+        if not exists:
+            self.cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+        
+        return True
+    
     def add_ticker(self, symbol, name=None, exchange=None):
-        """Add a ticker to the database"""
+        """Add a ticker to the database, or update it if it already exists
+        
+        This is an upsert, so an existing ticker keeps its id and the articles
+        pointing at it. Name and exchange are only overwritten when given.
+        """
         now = datetime.now()
         try:
-            self.cursor.execute(
-                'INSERT OR REPLACE INTO tickers (symbol, name, exchange, last_updated) VALUES (?, ?, ?, ?)',
-                (symbol, name, exchange, now)
-            )
+            self.cursor.execute('''
+            INSERT INTO tickers (symbol, name, exchange, last_updated) VALUES (?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                name = COALESCE(excluded.name, tickers.name),
+                exchange = COALESCE(excluded.exchange, tickers.exchange),
+                last_updated = excluded.last_updated
+            ''', (symbol, name, exchange, now))
             self.conn.commit()
-            return self.cursor.lastrowid
+            
+            # lastrowid isn't set when the upsert updates, so look the id up
+            self._ticker_ids.pop(symbol, None)
+            return self.get_ticker_id(symbol)
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return None
     
     def get_ticker_id(self, symbol):
         """Get the ID for a ticker symbol"""
+        ticker_id = self._ticker_ids.get(symbol)
+        if ticker_id is not None:
+            return ticker_id
+        
         self.cursor.execute('SELECT id FROM tickers WHERE symbol = ?', (symbol,))
         result = self.cursor.fetchone()
         if result:
+            self._ticker_ids[symbol] = result[0]
             return result[0]
         return None
     
-    def add_article(self, ticker_symbol, url, title, date_published, source, author, text, summary=None, sentiment=None):
-        """Add an article to the database"""
+    def get_ticker_ids(self, symbols, create=True):
+        """Resolve many ticker symbols to ids at once
+        
+        Symbols that aren't cached are looked up with a single query (per 500
+        symbols). With create=True, missing tickers are added.
+        
+        Returns:
+            dict: symbol -> id for every symbol that exists (or was created)
+        """
+        symbols = set(symbols)
+        missing = [s for s in symbols if s not in self._ticker_ids]
+        
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            self.cursor.execute(f'SELECT symbol, id FROM tickers WHERE symbol IN ({placeholders})', chunk)
+            self._ticker_ids.update(self.cursor.fetchall())
+        
+        new_symbols = [s for s in missing if s not in self._ticker_ids]
+        if create and new_symbols:
+            now = datetime.now()
+            try:
+                with self.conn:
+                    self.cursor.executemany(
+                        'INSERT INTO tickers (symbol, last_updated) VALUES (?, ?) ON CONFLICT(symbol) DO NOTHING',
+                        [(s, now) for s in new_symbols]
+                    )
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+            return self.get_ticker_ids(symbols, create=False)
+        
+        return {s: self._ticker_ids[s] for s in symbols if s in self._ticker_ids}
+    
+    def _resolve_ticker_id(self, symbol):
+        """Get the id for a ticker symbol, adding the ticker if needed"""
+        return self.get_ticker_id(symbol) or self.add_ticker(symbol)
+    
+    def add_article(self, ticker_symbol, url, title, date_published, source, author, text, summary=None, sentiment=None,
+                    keywords=None, nlp_status=None, signature=None, bands=None, cluster_url=None, canonical_url=None):
+        """Add an article to the database
+        
+        A copy of a stored article is linked to it; see add_articles.
+        """
         # Get or create ticker ID
-        ticker_id = self.get_ticker_id(ticker_symbol)
+        ticker_id = self._resolve_ticker_id(ticker_symbol)
         if not ticker_id:
-            ticker_id = self.add_ticker(ticker_symbol)
-            if not ticker_id:
-                return False
+            return False
         
-        # Add the article
-        fetch_date = datetime.now()
+        article = {
+            'url': url, 'title': title, 'date_published': date_published, 'source': source, 'author': author,
+            'text': text, 'summary': summary, 'sentiment': sentiment, 'keywords': keywords,
+            'nlp_status': nlp_status, 'signature': signature, 'bands': bands, 'cluster_url': cluster_url,
+            'canonical_url': canonical_url,
+        }
+        return self._write_article_batch([self._article_entry(ticker_id, article)]) > 0
+    
+    def add_articles(self, articles, batch_size=500, max_batch_seconds=5.0, known=None):
+        """Add many articles, grouping rows into transactions
+
+        URLs are normalized (see url_normalizer), and an article whose
+        canonical URL is already stored under another URL is skipped as the
+        same page. Each article's text is compared with the stored ones
+        through the duplicate index. A copy of a stored (or earlier in the
+        same call) article is linked to it with cluster_id: it shares that
+        article's body, summary and sentiment instead of storing its own.
+        A skipped article's URL is stored as an alias of the article, so
+        url_exists finds it and the page isn't downloaded again.
+
+        Args:
+            articles (iterable): Dicts with the same keys as the add_article
+                arguments (ticker_symbol, url, title, date_published, source,
+                author, text and optionally summary, sentiment, keywords,
+                nlp_status, and canonical_url, signature, bands and
+                cluster_url from extract_article). It is
+                consumed lazily, so a generator of fetched articles works.
+            batch_size (int): Commit after this many rows
+            max_batch_seconds (float): Commit a partial batch once it has been
+                open this long. The age is checked as each article arrives,
+                so a partial batch still waits for the producer's next
+                article (or the end of articles) before it is written
+            known (list): If given, the URLs of articles skipped as already
+                stored under their canonical URL are appended to it, so they
+                can be told apart from articles that failed to write
+
+        If a batch fails, its articles are written one at a time so that a
+        single bad row only loses itself.
+
+        Returns:
+            int: Number of articles written
+        """
+        batch = []
+        batch_started = time.monotonic()
+        written = 0
         
-        try:
-            self.cursor.execute('''
-            INSERT OR REPLACE INTO articles 
-            (ticker_id, url, title, date_published, source, author, text, summary, sentiment, fetch_date) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (ticker_id, url, title, date_published, source, author, text, summary, sentiment, fetch_date))
+        for article in articles:
+            ticker_id = self._resolve_ticker_id(article['ticker_symbol'])
+            if not ticker_id:
+                # extract_article may have held its fingerprint as pending
+                if self._duplicate_index is not None:
+                    self._duplicate_index.committed([normalize_url(article['url'])])
+                continue
             
-            self.conn.commit()
-            return True
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return False
+            batch.append(self._article_entry(ticker_id, article))
+            
+            if len(batch) >= batch_size or time.monotonic() - batch_started >= max_batch_seconds:
+                written += self._write_article_batch(batch, known)
+                batch = []
+                batch_started = time.monotonic()
+        
+        if batch:
+            written += self._write_article_batch(batch, known)
+        
+        return written
+    
+    def _article_entry(self, ticker_id, article):
+        """Build the rows written for an article dict
+        
+        Returns (articles row, article_bodies row, fingerprint), where the
+        fingerprint is the (url, signature, band keys) row for the MinHash
+        tables, or None for a copy. The text is fingerprinted here unless
+        extract_article already did it, and an article not already known to
+        be a copy is looked up in the duplicate index. Without NumPy there is
+        no fingerprint row either, so the dedup command picks the article up.
+        """
+        url = normalize_url(article['url'])
+        canonical_url = canonical_link(url, article.get('canonical_url'))
+        text = article['text']
+        signature, bands = article.get('signature'), article.get('bands')
+        fingerprinted = signature is not None or fingerprinting_available()
+        if signature is None:
+            signature, bands = fingerprint(text)
+        
+        cluster_url = article.get('cluster_url')
+        if cluster_url is None and signature is not None:
+            match = self.duplicate_index.find(signature, bands, exclude_url=url)
+            if match:
+                cluster_url = match[0]
+            else:
+                self.duplicate_index.add_pending(url, signature, bands)
+        
+        # Dates are stored as canonical UTC timestamps
+        return ((
+            ticker_id, url, article['title'], to_storage(article['date_published']),
+            article['source'], article['author'],
+            article.get('summary'), article.get('sentiment'), to_storage(datetime.now()),
+            _keywords_text(article.get('keywords')), article.get('nlp_status'), cluster_url, canonical_url
+        ), compress_body(text) + (url,), None if cluster_url or not fingerprinted else (url, signature, bands))
+    
+    def _write_article_batch(self, rows, known=None):
+        """Write a batch of (article row, body row, fingerprint) entries in a single transaction
+
+        Returns the number of articles written. URLs of the articles skipped
+        as already stored are recorded as aliases and appended to known.
+        """
+        with timed('db.write') as timing:
+            timing.bytes = sum(len(body[1] or b'') for article, body, minhash in rows)
+            try:
+                with self.conn:
+                    self.cursor.executemany(UPSERT_ARTICLE_SQL, [article for article, body, minhash in rows])
+                    # Articles skipped as an already stored canonical URL aren't counted
+                    written = self.cursor.rowcount
+                    skipped = []
+                    if written < len(rows):
+                        for article, body, minhash in rows:
+                            self.cursor.execute(INSERT_ALIAS_SQL, (article[1], article[12]))
+                            if self.cursor.rowcount > 0:
+                                skipped.append(article[1])
+                    self.cursor.executemany(UPSERT_BODY_SQL, [body for article, body, minhash in rows])
+                    self._insert_fingerprints([minhash for article, body, minhash in rows if minhash])
+                urls = [article[1] for article, body, minhash in rows]
+                if self._url_index is not None:
+                    self._url_index.add_many(urls + [article[12] for article, body, minhash in rows])
+                if self._duplicate_index is not None:
+                    # Rows short of the rowcount were skipped and are forgotten too
+                    self._duplicate_index.committed(urls)
+                if known is not None:
+                    known.extend(skipped)
+                return written
+            except sqlite3.Error as e:
+                timing.outcome = 'error'
+                if len(rows) == 1:
+                    print(f"Database error: {e}")
+                    # Not stored, so later articles mustn't be linked to it
+                    if self._duplicate_index is not None:
+                        self._duplicate_index.committed([rows[0][0][1]])
+                    return 0
+                print(f"Database error, retrying the batch one article at a time: {e}")
+        
+        return sum(self._write_article_batch([entry], known) for entry in rows)
+    
+    def _insert_fingerprints(self, fingerprints):
+        """Store (url, signature, band keys) rows, replacing earlier ones
+        
+        Only articles that start a cluster are stored; the signature is None
+        for texts too short to compare, which marks them as checked.
+        """
+        self.cursor.executemany(
+            'DELETE FROM minhash_bands WHERE article_id = (SELECT id FROM articles WHERE url = ?)',
+            [(url,) for url, signature, bands in fingerprints]
+        )
+        self.cursor.executemany(
+            'INSERT OR REPLACE INTO article_minhash (article_id, signature) '
+            'SELECT id, ? FROM articles WHERE url = ? AND cluster_id IS NULL',
+            [(signature, url) for url, signature, bands in fingerprints]
+        )
+        self.cursor.executemany(
+            'INSERT OR IGNORE INTO minhash_bands (bucket, article_id) '
+            'SELECT ?, id FROM articles WHERE url = ? AND cluster_id IS NULL',
+            [(bucket, url) for url, signature, bands in fingerprints for bucket in bands or ()]
+        )
+    
+    @property
+    def url_index(self):
+        """In-memory index of stored URLs, loaded on first use"""
+        if self._url_index is None:
+            self._url_index = UrlIndex(self.db_name)
+        return self._url_index
     
     def url_exists(self, url):
-        """Check if an article URL already exists in the database"""
-        self.cursor.execute('SELECT id FROM articles WHERE url = ?', (url,))
-        return self.cursor.fetchone() is not None
+        """Check if an article URL already exists in the database
+        
+        The URL is normalized first, and matches stored articles by their
+        URL, their canonical URL or a URL they were skipped under (an alias).
+        """
+        return normalize_url(url) in self.url_index
+    
+    @property
+    def duplicate_index(self):
+        """MinHash index of stored article texts, opened on first use"""
+        if self._duplicate_index is None:
+            self._duplicate_index = NearDuplicateIndex(self.db_name)
+        return self._duplicate_index
+    
+    def get_unfingerprinted_articles(self, limit=500, after_id=0):
+        """Get articles stored before the duplicate index, to fingerprint them
+        
+        Returns up to `limit` rows of (id, url, text) with ids above after_id,
+        in id order. Copies and articles without text are skipped.
+        """
+        self.cursor.execute('''
+        SELECT a.id, a.url, b.codec, b.text
+        FROM articles a JOIN article_bodies b ON b.article_id = a.id
+        WHERE a.id > ? AND a.cluster_id IS NULL
+          AND NOT EXISTS (SELECT 1 FROM article_minhash m WHERE m.article_id = a.id)
+        ORDER BY a.id LIMIT ?
+        ''', (after_id, limit))
+        return [(article_id, url, decompress_body(codec, data))
+                for article_id, url, codec, data in self.cursor.fetchall()]
+    
+    def store_fingerprints(self, fingerprints):
+        """Store (url, signature, band keys) rows in one transaction"""
+        rows = list(fingerprints)
+        with timed('db.write') as timing:
+            try:
+                with self.conn:
+                    self._insert_fingerprints(rows)
+                return len(rows)
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                timing.outcome = 'error'
+                return 0
+    
+    def link_duplicates(self, links, drop_text=False):
+        """Link (cluster url, article_id) pairs, making each article a copy
+        
+        The copies take the summary, keywords and sentiment of the article
+        they copy. With drop_text=True their own text is deleted, as copies
+        share the text of the article they copy. Returns the number linked.
+        """
+        rows = list(links)
+        with timed('db.write') as timing:
+            try:
+                with self.conn:
+                    self.cursor.executemany(
+                        'UPDATE articles SET cluster_id = (SELECT id FROM articles WHERE url = ?) WHERE id = ?', rows
+                    )
+                    if drop_text:
+                        self.cursor.executemany(
+                            'DELETE FROM article_bodies WHERE article_id = '
+                            '(SELECT id FROM articles WHERE id = ? AND cluster_id IS NOT NULL)',
+                            [(article_id,) for url, article_id in rows]
+                        )
+                return len(rows)
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                timing.outcome = 'error'
+                return 0
     
     def get_articles_for_ticker(self, ticker_symbol, limit=None):
         """Get all articles for a specific ticker"""
@@ -106,54 +985,393 @@ class NewsDatabase:
         if not ticker_id:
             return []
         
-        query = 'SELECT id, url, title, date_published, source, author, text, summary, sentiment FROM articles WHERE ticker_id = ? ORDER BY date_published DESC'
+        query = f'SELECT {ARTICLE_COLUMNS} FROM {ARTICLE_FROM} WHERE a.ticker_id = ? ORDER BY a.date_published DESC'
         if limit:
             query += f' LIMIT {int(limit)}'
         
         self.cursor.execute(query, (ticker_id,))
-        return self.cursor.fetchall()
+        return [_article_row(row) for row in self.cursor.fetchall()]
+    
+    @staticmethod
+    def make_page_cursor(date_published, article_id):
+        """Encode the position of an article in a listing as a cursor string"""
+        return f"{date_published or ''}|{article_id}"
+    
+    @staticmethod
+    def _parse_page_cursor(cursor):
+        date_published, _, article_id = cursor.rpartition('|')
+        return date_published or None, int(article_id)
+    
+    def iter_articles_for_ticker(self, ticker_symbol, columns=LISTING_COLUMNS, after=None, limit=None,
+                                 collapse=False):
+        """Stream a ticker's articles, newest first, reading only the given columns
+        
+        Rows are tuples of `columns` (names from ARTICLE_FIELDS); the text is
+        only read and decompressed when 'text' is requested. With
+        collapse=True copies of an article in the same ticker are left out
+        (request 'copies' to count them). Pagination is by
+        keyset on (date_published, id): pass the cursor of the last row seen
+        (from make_page_cursor or get_article_page) as `after` to continue
+        from it. The older dated rows are found by seeking
+        idx_article_ticker_date and the undated ones, which come last, by a
+        second query, so a page costs the same however deep it is. Rows are
+        fetched from SQLite as they are iterated.
+        """
+        ticker_id = self.get_ticker_id(ticker_symbol)
+        if not ticker_id:
+            return
+        
+        unknown = [column for column in columns if column not in ARTICLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown article columns: {', '.join(unknown)}")
+        
+        select = ', '.join(self._field_sql(column) for column in columns)
+        query = f'SELECT {select} FROM articles a'
+        if 'text' in columns:
+            query += f' {BODY_JOIN}'
+        query += ' WHERE a.ticker_id = ?'
+        params = [ticker_id]
+        
+        if collapse:
+            query += (' AND NOT EXISTS (SELECT 1 FROM articles r'
+                      ' WHERE r.id = a.cluster_id AND r.ticker_id = a.ticker_id)')
+        
+        # (condition, parameters) of each query to run, in listing order.
+        # NULL dates sort after every date when descending.
+        if not after:
+            parts = [('', [])]
+        else:
+            after_date, after_id = self._parse_page_cursor(after)
+            if after_date is None:
+                parts = [(' AND a.date_published IS NULL AND a.id < ?', [after_id])]
+            else:
+                # A range on date_published lets SQLite seek the index; OR-ing
+                # in the NULL dates would make it scan every row before the page
+                parts = [(' AND a.date_published <= ? AND (a.date_published < ? OR a.id < ?)',
+                          [after_date, after_date, after_id]),
+                         (' AND a.date_published IS NULL', [])]
+        
+        remaining = int(limit) if limit else None
+        text_at = columns.index('text') if 'text' in columns else None
+        for condition, condition_params in parts:
+            part_query = query + condition + ' ORDER BY a.date_published DESC, a.id DESC'
+            part_params = params + condition_params
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                part_query += ' LIMIT ?'
+                part_params.append(remaining)
+            
+            # A cursor of its own, so other queries can run while this streams
+            for row in self.conn.execute(part_query, part_params):
+                if remaining is not None:
+                    remaining -= 1
+                if text_at is not None:
+                    row = row[:text_at] + (decompress_body(row[text_at], row[text_at + 1]),) + row[text_at + 2:]
+                yield row
+    
+    @staticmethod
+    def _field_sql(column):
+        """The select-list expression for a column of iter_articles_for_ticker"""
+        if column == 'text':
+            return 'b.codec, b.text'
+        if column == 'copies':
+            return '(SELECT COUNT(*) FROM articles d WHERE d.cluster_id = a.id AND d.ticker_id = a.ticker_id)'
+        return f'a.{column}'
+    
+    def get_article_page(self, ticker_symbol, columns=LISTING_COLUMNS, after=None, page_size=20, collapse=False):
+        """Get one page of a ticker's articles as (rows, next_cursor)
+        
+        next_cursor is None on the last page. See iter_articles_for_ticker.
+        """
+        keyed = tuple(columns) + ('date_published', 'id')
+        # One row past the page tells whether there is a next page
+        rows = list(self.iter_articles_for_ticker(ticker_symbol, keyed, after, page_size + 1, collapse))
+        next_cursor = self.make_page_cursor(*rows[page_size - 1][-2:]) if len(rows) > page_size else None
+        return [row[:len(columns)] for row in rows[:page_size]], next_cursor
+    
+    def find_page_cursor(self, ticker_symbol, page, page_size=20, collapse=False):
+        """Get the cursor that starts page number `page` (from 1) of a listing
+        
+        Walks the keys of the earlier pages only, without reading their rows.
+        """
+        after = None
+        for _ in range(page - 1):
+            keys = list(self.iter_articles_for_ticker(ticker_symbol, ('date_published', 'id'), after, page_size + 1,
+                                                      collapse))
+            if len(keys) <= page_size:
+                return None
+            after = self.make_page_cursor(*keys[page_size - 1])
+        return after
+    
+    def get_article_ticker(self, url):
+        """Get the ticker symbol a stored article belongs to"""
+        self.cursor.execute('''
+        SELECT t.symbol FROM articles a JOIN tickers t ON a.ticker_id = t.id WHERE a.url = ?
+        ''', (normalize_url(url),))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
     
     def get_article_by_url(self, url):
         """Get an article by its URL"""
+        self.cursor.execute(f'SELECT {ARTICLE_COLUMNS} FROM {ARTICLE_FROM} WHERE a.url = ?', (normalize_url(url),))
+        result = self.cursor.fetchone()
+        return _article_row(result) if result else None
+    
+    def get_article(self, article_id):
+        """Get an article by its id"""
+        self.cursor.execute(f'SELECT {ARTICLE_COLUMNS} FROM {ARTICLE_FROM} WHERE a.id = ?', (article_id,))
+        result = self.cursor.fetchone()
+        return _article_row(result) if result else None
+    
+    def get_article_text(self, article_id):
+        """Load just the text of an article, for callers that fetched metadata only"""
+        self.cursor.execute(f'SELECT b.codec, b.text FROM articles a {BODY_JOIN} WHERE a.id = ?', (article_id,))
+        result = self.cursor.fetchone()
+        return decompress_body(*result) if result else None
+    
+    @staticmethod
+    def _fts_query(query):
+        """Turn a user search string into an FTS5 MATCH expression
+        
+        Quoted phrases are kept as phrases, a trailing * makes a prefix search
+        (e.g. earn*), and AND/OR/NOT are passed through as operators. Every
+        other word is quoted so punctuation can't break the query syntax.
+        """
+        terms = []
+        for token in re.findall(r'"[^"]*"|\S+', query):
+            if token.startswith('"'):
+                phrase = token.strip('"').strip()
+                if phrase:
+                    terms.append(f'"{phrase}"')
+            elif token in ('AND', 'OR', 'NOT'):
+                terms.append(token)
+            elif token.endswith('*') and len(token) > 1:
+                terms.append('"' + token.rstrip('*').replace('"', '""') + '"*')
+            else:
+                terms.append('"' + token.replace('"', '""') + '"')
+        return ' '.join(terms)
+    
+    def search_articles(self, query, limit=10, order='rank'):
+        """Search for articles matching the query in title, summary or text
+        
+        Returns rows of (id, url, title, date_published, source, author, text,
+        summary, symbol, snippet). Results are ordered by relevance, or by
+        date with order='date'. Without FTS5 a slower LIKE scan is used and
+        snippet is None.
+        """
+        if not self.fts_enabled:
+            search_param = f"%{query}%"
+            with timed('db.search', index='like'):
+                self.cursor.execute(f'''
+                SELECT a.id, a.url, a.title, a.date_published, a.source, a.author, b.codec, b.text, a.summary, t.symbol, NULL
+                FROM articles a
+                {BODY_JOIN}
+                JOIN tickers t ON a.ticker_id = t.id
+                WHERE a.title LIKE ? OR body_text(b.codec, b.text) LIKE ?
+                ORDER BY a.date_published DESC
+                LIMIT ?
+                ''', (search_param, search_param, limit))
+            
+                return [_article_row(row) for row in self.cursor.fetchall()]
+        
+        match = self._fts_query(query)
+        if not match:
+            return []
+        
+        order_by = 'a.date_published DESC' if order == 'date' else 'articles_fts.rank'
+        with timed('db.search', index='fts') as timing:
+            try:
+                self.cursor.execute(f'''
+                SELECT a.id, a.url, a.title, a.date_published, a.source, a.author, b.codec, b.text, a.summary, t.symbol,
+                       snippet(articles_fts, -1, '[', ']', '...', 12)
+                FROM articles_fts
+                JOIN articles a ON a.id = articles_fts.rowid
+                {BODY_JOIN}
+                JOIN tickers t ON a.ticker_id = t.id
+                WHERE articles_fts MATCH ?
+                ORDER BY {order_by}
+                LIMIT ?
+                ''', (match, limit))
+            except sqlite3.OperationalError as e:
+                print(f"Invalid search query '{query}': {e}")
+                timing.outcome = 'invalid_query'
+                return []
+        
+            return [_article_row(row) for row in self.cursor.fetchall()]
+    
+    def get_pending_nlp(self, limit=200, after_id=0, ticker_symbol=None):
+        """Get articles waiting for their summary and keywords
+        
+        Returns up to `limit` rows of (id, title, text) with ids above
+        after_id, in id order, so callers can page through the backlog.
+        """
+        query = f'''
+        SELECT a.id, a.title, b.codec, b.text
+        FROM {ARTICLE_FROM}
+        WHERE a.nlp_status = '{NLP_PENDING}' AND a.cluster_id IS NULL AND a.id > ?
+        '''
+        params = [after_id]
+        if ticker_symbol:
+            ticker_id = self.get_ticker_id(ticker_symbol)
+            if not ticker_id:
+                return []
+            query += ' AND a.ticker_id = ?'
+            params.append(ticker_id)
+        query += ' ORDER BY a.id LIMIT ?'
+        params.append(limit)
+        
+        self.cursor.execute(query, params)
+        return [(article_id, title, decompress_body(codec, data))
+                for article_id, title, codec, data in self.cursor.fetchall()]
+    
+    def set_nlp_results(self, results):
+        """Store (article_id, summary, keywords, nlp_status) rows in one transaction
+        
+        Returns the number of articles updated.
+        """
+        rows = [(summary, _keywords_text(keywords), status, article_id)
+                for article_id, summary, keywords, status in results]
+        with timed('db.write') as timing:
+            try:
+                with self.conn:
+                    self.cursor.executemany(
+                        'UPDATE articles SET summary = ?, keywords = ?, nlp_status = ? WHERE id = ?', rows
+                    )
+                return len(rows)
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                timing.outcome = 'error'
+                return 0
+    
+    def count_pending_nlp(self):
+        """Count the articles waiting for their summary and keywords"""
+        # The status is written into the SQL so the partial index can be used
+        self.cursor.execute(f"SELECT COUNT(*) FROM articles WHERE nlp_status = '{NLP_PENDING}' AND cluster_id IS NULL")
+        return self.cursor.fetchone()[0]
+    
+    def get_unscored_articles(self, limit=2000, after_id=0, ticker_symbol=None):
+        """Get articles without a sentiment score
+        
+        Returns up to `limit` rows of (id, title, text) with ids above
+        after_id, in id order, so callers can page through the backlog.
+        """
+        query = f'''
+        SELECT a.id, a.title, b.codec, b.text
+        FROM {ARTICLE_FROM}
+        WHERE a.sentiment IS NULL AND a.cluster_id IS NULL AND a.id > ?
+        '''
+        params = [after_id]
+        if ticker_symbol:
+            ticker_id = self.get_ticker_id(ticker_symbol)
+            if not ticker_id:
+                return []
+            query += ' AND a.ticker_id = ?'
+            params.append(ticker_id)
+        query += ' ORDER BY a.id LIMIT ?'
+        params.append(limit)
+        
+        self.cursor.execute(query, params)
+        return [(article_id, title, decompress_body(codec, data))
+                for article_id, title, codec, data in self.cursor.fetchall()]
+    
+    def set_sentiments(self, scores):
+        """Store (sentiment, article_id) pairs in one transaction
+        
+        Returns the number of articles updated.
+        """
+        rows = list(scores)
+        with timed('db.write') as timing:
+            try:
+                with self.conn:
+                    self.cursor.executemany('UPDATE articles SET sentiment = ? WHERE id = ?', rows)
+                return len(rows)
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                timing.outcome = 'error'
+                return 0
+    
+    def count_unscored(self):
+        """Count the articles without a sentiment score"""
+        self.cursor.execute('SELECT COUNT(*) FROM articles WHERE sentiment IS NULL AND cluster_id IS NULL')
+        return self.cursor.fetchone()[0]
+    
+    def clear_sentiments(self, ticker_symbol=None):
+        """Remove sentiment scores, e.g. to rescore with a new lexicon"""
+        if ticker_symbol:
+            ticker_id = self.get_ticker_id(ticker_symbol)
+            if not ticker_id:
+                return 0
+            self.cursor.execute('UPDATE articles SET sentiment = NULL WHERE ticker_id = ?', (ticker_id,))
+        else:
+            self.cursor.execute('UPDATE articles SET sentiment = NULL')
+        self.conn.commit()
+        return self.cursor.rowcount
+    
+    def get_scrape_state(self, subject, source):
+        """Get the high-water mark (newest_date, newest_url) for a ticker or
+        search term and source, or None if it hasn't been scraped yet"""
         self.cursor.execute(
-            'SELECT id, url, title, date_published, source, author, text, summary, sentiment FROM articles WHERE url = ?', 
-            (url,)
+            'SELECT newest_date, newest_url FROM scrape_state WHERE subject = ? AND source = ?',
+            (subject, source)
         )
-        return self.cursor.fetchone()
+        result = self.cursor.fetchone()
+        if not result or not result[0]:
+            return None
+        return from_storage(result[0]), result[1]
     
-    def search_articles(self, query, limit=10):
-        """Search for articles containing the query in title or text"""
-        search_param = f"%{query}%"
-        self.cursor.execute('''
-        SELECT a.id, a.url, a.title, a.date_published, a.source, a.author, a.text, a.summary, t.symbol
-        FROM articles a
-        JOIN tickers t ON a.ticker_id = t.id
-        WHERE a.title LIKE ? OR a.text LIKE ?
-        ORDER BY a.date_published DESC
-        LIMIT ?
-        ''', (search_param, search_param, limit))
+    def update_scrape_state(self, subject, source, newest_date, newest_url):
+        """Record the newest article a scrape has seen
         
-        return self.cursor.fetchall()
+        The mark only moves forward: an older date (e.g. from a scrape of a
+        past date range) leaves the stored mark as it is.
+        """
+        newest_date = to_storage(newest_date)
+        now = to_storage(datetime.now())
+        try:
+            self.cursor.execute('''
+            INSERT INTO scrape_state (subject, source, newest_date, newest_url, last_run)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(subject, source) DO UPDATE SET
+                newest_date = CASE WHEN excluded.newest_date >= scrape_state.newest_date
+                                   THEN excluded.newest_date ELSE scrape_state.newest_date END,
+                newest_url = CASE WHEN excluded.newest_date >= scrape_state.newest_date
+                                  THEN excluded.newest_url ELSE scrape_state.newest_url END,
+                last_run = excluded.last_run
+            ''', (subject, source, newest_date, newest_url, now))
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return False
     
     def get_ticker_stats(self, ticker_symbol):
-        """Get statistics about articles for a ticker"""
+        """Get statistics about articles for a ticker
+        
+        Returns (article_count, oldest_date, newest_date, avg_sentiment),
+        read from the ticker_stats rollup rather than the articles.
+        """
         ticker_id = self.get_ticker_id(ticker_symbol)
         if not ticker_id:
             return None
         
         self.cursor.execute('''
         SELECT 
-            COUNT(*) as article_count,
-            MIN(date_published) as oldest_article,
-            MAX(date_published) as newest_article,
-            AVG(sentiment) as avg_sentiment
-        FROM articles 
+            article_count,
+            oldest_date,
+            newest_date,
+            CASE WHEN sentiment_count > 0 THEN sentiment_sum / sentiment_count END
+        FROM ticker_stats 
         WHERE ticker_id = ?
         ''', (ticker_id,))
         
-        return self.cursor.fetchone()
+        return self.cursor.fetchone() or (0, None, None, None)
     
     def close(self):
         """Close the database connection"""
+        if self._url_index is not None:
+            self._url_index.close()
+        if self._duplicate_index is not None:
+            self._duplicate_index.close()
         if self.conn:
-            self.conn.close()
+            self.conn.close()
@@ -1,12 +1,22 @@
 ﻿import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from article_fetcher import ArticleFetcher
 from news_database import NewsDatabase
+from browser_pool import get_browser_pool
 import os
 from YahooFinanceStockScraper import YahooFinanceStockScraper
 from datetime import datetime, timedelta
+from metrics import get_metrics, profiled, timed, PROFILERS
 
-def scrape_and_store(ticker, days=30):
-    """Scrape articles for a ticker and store them in the database"""
+def scrape_and_store(ticker, days=30, workers=1, incremental=True, defer_nlp=False):
+    """Scrape articles for a ticker and store them in the database
+    
+    With incremental=True the listing stops at the newest article the last
+    scrape of this ticker saw, so a refresh only walks the new news, and an
+    unchanged quote page isn't parsed at all. With defer_nlp=True summaries
+    are left for the summarize command.
+    """
     # Calculate date range
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
@@ -17,59 +27,250 @@ def scrape_and_store(ticker, days=30):
     
     print(f"Scraping news for {ticker} from {start_date_str} to {end_date_str}")
     
+    # Create a fetcher; its index of stored URLs lets the scraper skip known articles
+    fetcher = ArticleFetcher(workers=workers, defer_nlp=defer_nlp)
+    
     # Initialize scraper
-    scraper = YahooFinanceStockScraper("Yahoo Finance", ticker, start_date_str, end_date_str)
+    scraper = YahooFinanceStockScraper("Yahoo Finance", ticker, start_date_str, end_date_str,
+                                       url_index=fetcher.db.url_index)
+    if incremental:
+        scraper.html_cache = fetcher.cache
+        if scraper.load_high_water_mark(fetcher.db):
+            print(f"Stopping at articles seen before {scraper.high_water_mark[0]}")
     
     # Get article links
-    links = scraper.get_pages()
+    with timed('listing.get_pages', source=scraper.get_newspaper_name()):
+        links = scraper.get_pages()
     
     if not links:
-        print("No articles found!")
+        print("No new articles found!")
+        scraper.save_high_water_mark(fetcher.db)
+        fetcher.close()
         return False
     
-    print(f"Found {len(links)} articles for {ticker}")
-    
-    # Create a fetcher and add articles to database
-    fetcher = ArticleFetcher()
+    print(f"Found {len(links)} new articles for {ticker}")
     
-    success_count = 0
-    for url in links:
-        if fetcher.fetch_article(url, ticker):
-            success_count += 1
+    # Add articles to database
+    success_count, fail_count = fetcher.fetch_articles(links, ticker)
     
     print(f"Successfully added {success_count} out of {len(links)} articles to the database")
+    # Failed articles are listed again next time, so the mark only moves on a clean run
+    scraper.failed_count = fail_count
+    scraper.save_high_water_mark(fetcher.db)
     fetcher.close()
     
     return True
 
-def list_articles(ticker, limit=10):
-    """List articles for a ticker"""
+def read_watchlist(watchlist_file):
+    """Read ticker symbols from a file, one per line (or the first CSV column)
+    
+    Blank lines, lines starting with '#' and repeated tickers are skipped.
+    """
+    tickers = []
+    seen = set()
+    with open(watchlist_file, 'r') as f:
+        for line in f:
+            ticker = line.split('#')[0].split(',')[0].strip()
+            if ticker and ticker.lower() not in ('ticker', 'symbol') and ticker not in seen:
+                seen.add(ticker)
+                tickers.append(ticker)
+    return tickers
+
+def list_new_links(ticker, start_date_str, end_date_str, url_index, high_water_mark=None, html_cache=None):
+    """Get links to articles for a ticker that aren't stored yet
+    
+    Returns the links and the newest (date, url) seen, for the next
+    high-water mark.
+    """
+    scraper = YahooFinanceStockScraper("Yahoo Finance", ticker, start_date_str, end_date_str,
+                                       url_index=url_index)
+    scraper.high_water_mark = high_water_mark
+    scraper.html_cache = html_cache
+    with timed('listing.get_pages', source=scraper.get_newspaper_name()):
+        links = scraper.get_pages()
+    return links, scraper.newest_seen
+
+def scrape_watchlist(watchlist_file, days=30, workers=4, fetch_workers=8, incremental=True, defer_nlp=False):
+    """Scrape and store articles for every ticker in a watchlist file
+    
+    Up to `workers` tickers are listed at the same time on browsers from the
+    shared pool. As each listing finishes, its articles are downloaded with
+    `fetch_workers` threads through one shared fetcher, so all tickers share
+    the HTTP session, rate limits, URL index and database connection.
+    With incremental=True each ticker's listing stops at its high-water mark,
+    and with defer_nlp=True summaries are left for the summarize command.
+    """
+    tickers = read_watchlist(watchlist_file)
+    if not tickers:
+        print(f"No tickers found in {watchlist_file}")
+        return False
+    
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    end_date_str = end_date.strftime('%Y-%m-%d')
+    start_date_str = start_date.strftime('%Y-%m-%d')
+    
+    print(f"Scraping news for {len(tickers)} tickers from {start_date_str} to {end_date_str}")
+    
+    fetcher = ArticleFetcher(workers=fetch_workers, defer_nlp=defer_nlp)
+    url_index = fetcher.db.url_index
+    fetcher.db.get_ticker_ids(tickers)
+    get_browser_pool(workers)
+    # Read the marks here; the database connection stays on this thread
+    marks = {ticker: fetcher.db.get_scrape_state(ticker, "Yahoo Finance") if incremental else None
+             for ticker in tickers}
+    
+    started = time.monotonic()
+    total_stored = 0
+    total_failed = 0
+    failed_tickers = []
+    
+    try:
+        # Listing runs in the background while finished tickers are fetched here
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(list_new_links, ticker, start_date_str, end_date_str, url_index,
+                                marks[ticker], fetcher.cache if incremental else None): ticker
+                for ticker in tickers
+            }
+            
+            for done, future in enumerate(as_completed(futures), 1):
+                ticker = futures[future]
+                try:
+                    links, newest_seen = future.result()
+                except Exception as e:
+                    print(f"[{done}/{len(tickers)}] {ticker}: listing failed: {e}")
+                    failed_tickers.append(ticker)
+                    continue
+                
+                success_count, fail_count = fetcher.fetch_articles(links, ticker) if links else (0, 0)
+                # Failed articles are listed again next time, so the mark only moves on a clean run
+                if newest_seen and not fail_count:
+                    fetcher.db.update_scrape_state(ticker, "Yahoo Finance", *newest_seen)
+                total_stored += success_count
+                total_failed += fail_count
+                
+                elapsed = time.monotonic() - started
+                print(f"[{done}/{len(tickers)}] {ticker}: {len(links)} new links, "
+                      f"{success_count} stored, {fail_count} failed | "
+                      f"{done / elapsed * 60:.1f} tickers/min, {total_stored / elapsed:.2f} articles/s")
+    finally:
+        fetcher.close()
+    
+    elapsed = time.monotonic() - started
+    print(f"Finished {len(tickers)} tickers in {elapsed:.0f}s: "
+          f"{total_stored} articles stored, {total_failed} failed")
+    if failed_tickers:
+        print(f"Listing failed for: {', '.join(failed_tickers)}")
+    
+    return True
+
+def refresh_articles(ticker, limit=None, workers=1, defer_nlp=False):
+    """Re-fetch stored articles for a ticker, updating the ones that changed
+    
+    Each request is conditional on the validators from the last fetch, so
+    unchanged articles cost a 304 response and no parsing or writes.
+    """
+    fetcher = ArticleFetcher(workers=workers, defer_nlp=defer_nlp)
+    try:
+        urls = [url for url, in fetcher.db.iter_articles_for_ticker(ticker, ('url',), limit=limit)]
+        if not urls:
+            print(f"No articles found for {ticker}")
+            return False
+        
+        print(f"Refreshing {len(urls)} articles for {ticker}")
+        success_count, fail_count = fetcher.fetch_articles(urls, ticker, refresh=True)
+        print(f"Updated {success_count} articles, {fail_count} failed")
+        return True
+    finally:
+        fetcher.close()
+
+def summarize_articles(ticker=None, workers=1, limit=None):
+    """Compute summaries and keywords for articles stored with deferred NLP"""
+    fetcher = ArticleFetcher(workers=workers, cache_dir=None)
+    try:
+        success_count, fail_count = fetcher.summarize_pending(ticker, limit=limit)
+        print(f"Summarized {success_count} articles, {fail_count} failed")
+        return success_count, fail_count
+    finally:
+        fetcher.close()
+
+def score_sentiment(ticker=None, batch_size=2000, limit=None, lexicon_file=None, rescore=False):
+    """Score the sentiment of articles that don't have a score yet"""
+    # NumPy is only needed for this command
+    from sentiment import SentimentScorer, load_lexicon, score_unscored
+    
+    scorer = SentimentScorer(load_lexicon(lexicon_file) if lexicon_file else None)
+    db = NewsDatabase()
+    try:
+        if rescore:
+            print(f"Cleared the sentiment of {db.clear_sentiments(ticker)} articles")
+        started = time.monotonic()
+        scored = score_unscored(db, scorer, batch_size, limit, ticker)
+        print(f"Scored {scored} articles in {time.monotonic() - started:.1f}s")
+        return scored
+    finally:
+        db.close()
+
+def dedup_articles(batch_size=500, drop_text=False):
+    """Fingerprint articles stored before the duplicate index, linking copies"""
+    from near_duplicates import cluster_stored_articles
+    
+    db = NewsDatabase()
+    try:
+        started = time.monotonic()
+        indexed, linked = cluster_stored_articles(db, batch_size, drop_text)
+        print(f"Indexed {indexed} articles and linked {linked} copies in {time.monotonic() - started:.1f}s")
+        return indexed, linked
+    finally:
+        db.close()
+
+def list_articles(ticker, limit=10, after=None, page=None):
+    """List a page of articles for a ticker
+    
+    Pages are keyset-paginated: pass the cursor printed after a page as
+    `after` to get the next one, or a page number as `page`.
+    """
     db = NewsDatabase()
     
     try:
-        articles = db.get_articles_for_ticker(ticker, limit)
+        if page and page > 1:
+            after = db.find_page_cursor(ticker, page, limit)
+            if not after:
+                print(f"No page {page} of articles for {ticker}")
+                return
         
-        if not articles:
+        shown = 0
+        last = None
+        more = False
+        # One row past the page tells whether there is a next page
+        for id, date_published, title in db.iter_articles_for_ticker(ticker, ('id', 'date_published', 'title'),
+                                                                     after=after, limit=limit + 1):
+            if shown == limit:
+                more = True
+                break
+            if not shown:
+                print(f"Articles for {ticker}:")
+            shown += 1
+            last = (date_published, id)
+            print(f"ID: {id} | {date_published or 'Unknown'} | {title}")
+        
+        if not shown:
             print(f"No articles found for {ticker}")
             return
         
-        print(f"Showing {len(articles)} articles for {ticker}:")
-        for article in articles:
-            id, url, title, date_published, source, author, text, summary, sentiment = article
-            
-            # Format date
-            if isinstance(date_published, str):
-                date_str = date_published
-            else:
-                date_str = date_published.strftime('%Y-%m-%d') if date_published else 'Unknown'
-            
-            print(f"ID: {id} | {date_str} | {title}")
+        if more:
+            print(f"Next page: --after '{db.make_page_cursor(*last)}'")
         
     finally:
         db.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Financial News Article Manager')
+    parser.add_argument('--metrics', metavar='PREFIX',
+                        help='Write per-stage timings to PREFIX.json and PREFIX.prom (Prometheus text format)')
+    parser.add_argument('--profile', choices=PROFILERS, help='Profile the command')
+    parser.add_argument('--profile-output', help='Profile file (default run.prof, or run.html for pyinstrument)')
     
     subparsers = parser.add_subparsers(dest='command', help='command')
     
@@ -77,35 +278,114 @@ def main():
     scrape_parser = subparsers.add_parser('scrape', help='Scrape and store articles')
     scrape_parser.add_argument('ticker', help='Ticker symbol')
     scrape_parser.add_argument('--days', '-d', type=int, default=30, help='Number of days to look back')
+    scrape_parser.add_argument('--workers', '-w', type=int, default=1, help='Number of concurrent article downloads')
+    scrape_parser.add_argument('--full', action='store_true', help='List the whole date range, ignoring the last scrape')
+    scrape_parser.add_argument('--defer-nlp', action='store_true', help='Store articles without summaries; run the summarize command later')
+    
+    # Scrape a watchlist of tickers
+    watchlist_parser = subparsers.add_parser('scrape-watchlist', help='Scrape and store articles for every ticker in a file')
+    watchlist_parser.add_argument('file', help='Watchlist file with one ticker per line')
+    watchlist_parser.add_argument('--days', '-d', type=int, default=30, help='Number of days to look back')
+    watchlist_parser.add_argument('--workers', '-w', type=int, default=4, help='Number of tickers listed at the same time')
+    watchlist_parser.add_argument('--fetch-workers', '-f', type=int, default=8, help='Number of concurrent article downloads')
+    watchlist_parser.add_argument('--full', action='store_true', help='List the whole date range, ignoring the last scrape')
+    watchlist_parser.add_argument('--defer-nlp', action='store_true', help='Store articles without summaries; run the summarize command later')
     
     # Process CSV
     csv_parser = subparsers.add_parser('csv', help='Process articles from a CSV file')
     csv_parser.add_argument('file', help='CSV file path')
     csv_parser.add_argument('ticker', help='Ticker symbol')
+    csv_parser.add_argument('--workers', '-w', type=int, default=1, help='Number of concurrent article downloads')
+    csv_parser.add_argument('--defer-nlp', action='store_true', help='Store articles without summaries; run the summarize command later')
+    
+    # Re-fetch stored articles that may have been updated
+    refresh_parser = subparsers.add_parser('refresh', help='Re-fetch stored articles for a ticker, updating changed ones')
+    refresh_parser.add_argument('ticker', help='Ticker symbol')
+    refresh_parser.add_argument('--limit', '-l', type=int, help='Only refresh the newest N articles')
+    refresh_parser.add_argument('--workers', '-w', type=int, default=1, help='Number of concurrent article downloads')
+    refresh_parser.add_argument('--defer-nlp', action='store_true', help='Store articles without summaries; run the summarize command later')
+    
+    # Re-extract articles from the HTML cache
+    reextract_parser = subparsers.add_parser('reextract', help='Rebuild articles from cached HTML without downloading')
+    reextract_parser.add_argument('--ticker', '-t', help='Only re-extract articles for this ticker')
+    reextract_parser.add_argument('--workers', '-w', type=int, default=1, help='Number of parsing processes')
+    reextract_parser.add_argument('--defer-nlp', action='store_true', help='Store articles without summaries; run the summarize command later')
+    
+    # Fill in summaries for articles stored with --defer-nlp
+    summarize_parser = subparsers.add_parser('summarize', help='Compute summaries and keywords for pending articles')
+    summarize_parser.add_argument('--ticker', '-t', help='Only summarize articles for this ticker')
+    summarize_parser.add_argument('--workers', '-w', type=int, default=1, help='Number of NLP processes')
+    summarize_parser.add_argument('--limit', '-l', type=int, help='Summarize at most this many articles')
+    
+    # Score article sentiment
+    sentiment_parser = subparsers.add_parser('sentiment', help='Score the sentiment of articles without a score')
+    sentiment_parser.add_argument('--ticker', '-t', help='Only score articles for this ticker')
+    sentiment_parser.add_argument('--batch-size', '-b', type=int, default=2000, help='Articles scored per batch')
+    sentiment_parser.add_argument('--limit', '-l', type=int, help='Score at most this many articles')
+    sentiment_parser.add_argument('--lexicon', help='Lexicon CSV (Loughran-McDonald master dictionary, or word,score)')
+    sentiment_parser.add_argument('--rescore', action='store_true', help='Clear existing scores and score everything again')
+    
+    # Link copies of the same story among articles stored before the duplicate index
+    dedup_parser = subparsers.add_parser('dedup', help='Find copies of the same story among stored articles')
+    dedup_parser.add_argument('--batch-size', '-b', type=int, default=500, help='Articles fingerprinted per batch')
+    dedup_parser.add_argument('--drop-text', action='store_true', help='Delete the text of copies found')
     
     # List articles
     list_parser = subparsers.add_parser('list', help='List articles for a ticker')
     list_parser.add_argument('ticker', help='Ticker symbol')
-    list_parser.add_argument('--limit', '-l', type=int, default=10, help='Maximum number of articles to show')
+    list_parser.add_argument('--limit', '-l', type=int, default=10, help='Number of articles per page')
+    list_parser.add_argument('--after', help='Cursor printed after the previous page')
+    list_parser.add_argument('--page', '-p', type=int, help='Page number to show, from 1')
     
     args = parser.parse_args()
     
+    with profiled(args.profile, args.profile_output):
+        run_command(args, parser)
+    
+    if args.metrics:
+        print(get_metrics().summary())
+        json_path, prom_path = get_metrics().write_report(args.metrics)
+        print(f"Run report written to {json_path} and {prom_path}")
+
+def run_command(args, parser):
+    """Run the command chosen on the command line"""
     if args.command == 'scrape':
-        scrape_and_store(args.ticker, args.days)
+        scrape_and_store(args.ticker, args.days, args.workers, incremental=not args.full, defer_nlp=args.defer_nlp)
+    elif args.command == 'scrape-watchlist':
+        if not os.path.exists(args.file):
+            print(f"Error: File {args.file} does not exist")
+            return
+        
+        scrape_watchlist(args.file, args.days, args.workers, args.fetch_workers, incremental=not args.full,
+                         defer_nlp=args.defer_nlp)
     elif args.command == 'csv':
         if not os.path.exists(args.file):
             print(f"Error: File {args.file} does not exist")
             return
         
-        fetcher = ArticleFetcher()
+        fetcher = ArticleFetcher(workers=args.workers, defer_nlp=args.defer_nlp)
         try:
             fetcher.fetch_articles_from_csv(args.file, args.ticker)
         finally:
             fetcher.close()
+    elif args.command == 'refresh':
+        refresh_articles(args.ticker, args.limit, args.workers, args.defer_nlp)
+    elif args.command == 'reextract':
+        fetcher = ArticleFetcher(workers=args.workers, defer_nlp=args.defer_nlp)
+        try:
+            fetcher.reextract_from_cache(args.ticker)
+        finally:
+            fetcher.close()
+    elif args.command == 'summarize':
+        summarize_articles(args.ticker, args.workers, args.limit)
+    elif args.command == 'sentiment':
+        score_sentiment(args.ticker, args.batch_size, args.limit, args.lexicon, args.rescore)
+    elif args.command == 'dedup':
+        dedup_articles(args.batch_size, args.drop_text)
     elif args.command == 'list':
-        list_articles(args.ticker, args.limit)
+        list_articles(args.ticker, args.limit, args.after, args.page)
     else:
         parser.print_help()
 
 if __name__ == "__main__":
-    main()
+    main()
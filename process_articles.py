@@ -2,14 +2,14 @@
 import os
 from article_fetcher import ArticleFetcher
 
-def process_csv(csv_file, ticker_symbol):
+def process_csv(csv_file, ticker_symbol, workers=1):
     """Process a CSV file of article URLs"""
     
     if not os.path.exists(csv_file):
         print(f"Error: File {csv_file} does not exist")
         return False
     
-    fetcher = ArticleFetcher()
+    fetcher = ArticleFetcher(workers=workers)
     
     try:
         print(f"Processing articles for {ticker_symbol} from {csv_file}")
@@ -25,14 +25,15 @@ def process_csv(csv_file, ticker_symbol):
 
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python process_articles.py <csv_file> <ticker_symbol>")
+        print("Usage: python process_articles.py <csv_file> <ticker_symbol> [workers]")
         print("Example: python process_articles.py WOW.AX_links.csv WOW.AX")
         return
     
     csv_file = sys.argv[1]
     ticker_symbol = sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
     
-    process_csv(csv_file, ticker_symbol)
+    process_csv(csv_file, ticker_symbol, workers)
 
 if __name__ == "__main__":
-    main()
+    main()
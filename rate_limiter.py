@@ -0,0 +1,128 @@
+﻿import time
+import threading
+from urllib.parse import urlparse
+
+# Default request rate (requests per second) and burst size for hosts
+# without their own entry in DOMAIN_LIMITS
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 1
+
+# Per-domain (rate, burst) limits. A host matches an entry if it is the
+# domain itself or one of its subdomains, e.g. 'au.finance.yahoo.com'
+# matches 'yahoo.com'.
+DOMAIN_LIMITS = {
+    'yahoo.com': (1.0, 3),
+    'marketwatch.com': (0.5, 2),
+    'reuters.com': (0.5, 2),
+    'seekingalpha.com': (0.25, 1),
+    'barrons.com': (0.33, 1),
+    'ft.com': (0.33, 1)
+}
+
+
+class TokenBucket:
+    """A thread-safe token bucket that refills at `rate` tokens per second"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait to use it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Tokens may go negative: each waiting caller holds a reservation
+            # further in the future, so concurrent callers queue up in order
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available, returning the time spent waiting"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class HostRateLimiter:
+    """Token-bucket scheduler keyed by host
+
+    Every listing and fetch path asks the limiter before making a request, so
+    requests to the same site are coordinated across scrapers and threads
+    while different sites are not slowed down by each other.
+    """
+
+    def __init__(self, default_rate=DEFAULT_RATE, default_burst=DEFAULT_BURST, domain_limits=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.domain_limits = dict(DOMAIN_LIMITS if domain_limits is None else domain_limits)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def configure(self, domain, rate, burst=1):
+        """Set the rate and burst size for a domain and its subdomains"""
+        with self.lock:
+            self.domain_limits[domain.lower()] = (rate, burst)
+            # Drop existing buckets so the new limit takes effect
+            for key in list(self.buckets):
+                if self._match_domain(key) == domain.lower():
+                    del self.buckets[key]
+
+    def _match_domain(self, host):
+        """Return the most specific configured domain for a host, if any"""
+        parts = host.split('.')
+        for i in range(len(parts)):
+            domain = '.'.join(parts[i:])
+            if domain in self.domain_limits:
+                return domain
+        return None
+
+    def bucket_for(self, host):
+        """Get the token bucket for a host, creating it if needed
+
+        Hosts under a configured domain share that domain's bucket, so e.g.
+        finance.yahoo.com and au.finance.yahoo.com draw on one allowance.
+        Other hosts get a bucket each.
+        """
+        host = host.lower()
+        with self.lock:
+            domain = self._match_domain(host)
+            key = domain or host
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if domain:
+                    rate, burst = self.domain_limits[domain]
+                else:
+                    rate, burst = self.default_rate, self.default_burst
+                bucket = TokenBucket(rate, burst)
+                self.buckets[key] = bucket
+            return bucket
+
+    def wait(self, url):
+        """Block until a request to the URL's host is allowed
+
+        Returns the number of seconds spent waiting.
+        """
+        host = urlparse(url).netloc or url
+        return self.bucket_for(host).acquire()
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Get the rate limiter shared by all scrapers in this process"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = HostRateLimiter()
+        return _shared_limiter
@@ -7,6 +7,8 @@ set params=%*
 
 if "%1"=="scrape" (
     python %~dp0news_manager.py %params%
+) else if "%1"=="scrape-watchlist" (
+    python %~dp0news_manager.py %params%
 ) else if "%1"=="browse" (
     python %~dp0browse_articles.py %params:~7%
 ) else if "%1"=="process" (
@@ -18,6 +20,7 @@ if "%1"=="scrape" (
     echo Available commands:
     echo.
     echo scrape [ticker] --days [days]    - Scrape and store news for a ticker
+    echo scrape-watchlist [file]          - Scrape and store news for every ticker in a file
     echo browse list [ticker]             - List articles for a ticker
     echo browse search [query]            - Search for articles
     echo browse view --id [id]            - View a specific article
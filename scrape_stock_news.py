@@ -24,6 +24,9 @@ def parse_arguments():
     parser.add_argument('--marketwatch-only', action='store_true',
                         help='Only scrape from MarketWatch')
     
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Number of sources to scrape in parallel (default: 1)')
+    
     return parser.parse_args()
 
 def main():
@@ -38,7 +41,7 @@ def main():
     elif args.marketwatch_only:
         scraper.scrape_marketwatch()
     else:
-        scraper.scrape_all_sources()
+        scraper.scrape_all_sources(args.workers)
     
     # Print summary and save results
     scraper.print_summary()
@@ -47,4 +50,4 @@ def main():
     print(f"Saved results to {output_file}")
 
 if __name__ == "__main__":
-    main()
+    main()
@@ -0,0 +1,169 @@
+﻿import csv
+import re
+import time
+from itertools import chain
+import numpy as np
+
+# Words that flip the sentiment of the lexicon words shortly after them,
+# e.g. "not profitable", "no growth"
+NEGATIONS = ('not', 'no', 'never', 'none', 'neither', 'nor', 'without', "isn't", "wasn't", "aren't",
+             "weren't", "doesn't", "didn't", "don't", "won't", "can't", 'cannot', 'hardly', 'barely')
+
+# How many tokens after a negation are flipped
+NEGATION_WINDOW = 3
+
+# Added to the number of lexicon hits, so an article with one or two
+# sentiment words doesn't score as strongly as one full of them
+SMOOTHING = 1.0
+
+# A compact finance lexicon in the style of the Loughran-McDonald word lists:
+# words that are positive or negative in financial reporting specifically
+# ("liability" and "tax" are neutral here, unlike in general-purpose lists).
+# Pass the full Loughran-McDonald master dictionary with --lexicon for more.
+POSITIVE_WORDS = '''
+achieve achieved achievement achievements achieving advance advanced advances advancing advantage
+advantageous attractive beat beats beneficial benefit benefited benefits boost boosted boosting
+breakthrough bullish confident delight delighted efficiencies efficiency efficient enhance enhanced
+enhancement enhancing exceed exceeded exceeding exceeds excellent exceptional expand expanded
+expanding expansion favorable favourable gain gained gaining gains good great grew grow growing
+grows growth improve improved improvement improvements improves improving increase increased
+innovative leadership lucrative momentum optimism optimistic outperform outperformed outperforming
+outperforms positive profitability profitable progress prosper prosperity rally rallied rallies
+rebound rebounded recover recovered recovery resilient rise rising robust rose solid stable strength
+strengthen strengthened strengthening strong stronger strongest succeed succeeded success successful
+successfully surge surged surpass surpassed upbeat upgrade upgraded upgrades upside upturn win
+winning
+'''.split()
+
+NEGATIVE_WORDS = '''
+adverse adversely bankrupt bankruptcy bearish breach breached challenge challenges challenging
+closure closures collapse collapsed concern concerned concerns cut cuts cutting damage damaged
+decline declined declines declining decrease decreased decreases default defaulted defaults deficit
+deteriorate deteriorated deteriorating deterioration difficult difficulties difficulty disappoint
+disappointed disappointing disappointment downgrade downgraded downgrades downside downturn drop
+dropped dropping drops fail failed failing fails failure fell fined fines fraud impairment
+impairments investigation lawsuit lawsuits layoffs litigation lose losing loss losses lost miss
+missed misses negative negatively penalties penalty plunge plunged plunges poor poorly recall
+recalls recession restructuring risky sank scandal shortfall slump slumped slowdown slower slowing
+sluggish strike strikes struggle struggled struggling suspend suspended tumble tumbled turmoil
+uncertain uncertainties uncertainty underperform underperformed unfavorable unfavourable volatile
+volatility warn warned warning warnings weak weaken weakened weaker weakest weakness worse worsen
+worsened worsening worst writedown writedowns
+'''.split()
+
+FINANCE_LEXICON = dict(chain(((word, 1.0) for word in POSITIVE_WORDS), ((word, -1.0) for word in NEGATIVE_WORDS)))
+
+TOKEN_RE = re.compile(r"[a-z][a-z']*")
+
+
+def load_lexicon(path):
+    """Read a lexicon CSV into a {word: weight} dict
+
+    Accepts the Loughran-McDonald master dictionary (Word, Positive and
+    Negative columns, where non-zero marks membership) or a plain CSV of
+    word and score columns.
+    """
+    lexicon = {}
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        if 'word' not in fields or not ({'positive', 'negative'} <= fields.keys() or 'score' in fields):
+            raise ValueError(f"{path} needs Word and Positive/Negative columns, or Word and Score columns")
+
+        for row in reader:
+            word = row[fields['word']].strip().lower()
+            if not word:
+                continue
+            if 'score' in fields:
+                weight = float(row[fields['score']] or 0)
+            else:
+                weight = (float(row[fields['positive']] or 0) != 0) - (float(row[fields['negative']] or 0) != 0)
+            if weight:
+                lexicon[word] = float(weight)
+    return lexicon
+
+
+class SentimentScorer:
+    """Scores texts with a word lexicon, a batch of texts at a time
+
+    Tokens are mapped to lexicon weights once, and everything after that
+    (negation, per-article sums, normalizing) is done with array operations
+    over the whole batch. Scores run from -1 (negative) to 1 (positive); a
+    text with no lexicon words scores 0.
+    """
+
+    def __init__(self, lexicon=None, negations=NEGATIONS, negation_window=NEGATION_WINDOW, smoothing=SMOOTHING):
+        lexicon = FINANCE_LEXICON if lexicon is None else lexicon
+        # Id 0 is every word that is neither a lexicon word nor a negation
+        words = sorted(set(lexicon) | set(negations))
+        self.vocabulary = {word: i for i, word in enumerate(words, 1)}
+        self.weights = np.zeros(len(words) + 1, dtype=np.float64)
+        self.is_negation = np.zeros(len(words) + 1, dtype=bool)
+        for word, weight in lexicon.items():
+            self.weights[self.vocabulary[word]] = weight
+        for word in negations:
+            self.is_negation[self.vocabulary[word]] = True
+        self.negation_window = negation_window
+        self.smoothing = smoothing
+
+    def score_texts(self, texts):
+        """Score a batch of texts, returning a NumPy array of scores"""
+        token_lists = [TOKEN_RE.findall(text.lower()) if text else [] for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(len(token_lists))
+
+        vocabulary = self.vocabulary
+        ids = np.fromiter((vocabulary.get(token, 0) for token in chain.from_iterable(token_lists)),
+                          dtype=np.int32, count=total)
+        # Which text each token belongs to
+        text_of = np.repeat(np.arange(len(token_lists)), lengths)
+
+        # Flip words that follow a negation within the window, in the same text
+        negation = self.is_negation[ids]
+        negated = np.zeros(total, dtype=bool)
+        for offset in range(1, self.negation_window + 1):
+            if offset >= total:
+                break
+            negated[offset:] |= negation[:-offset] & (text_of[offset:] == text_of[:-offset])
+
+        weights = self.weights[ids]
+        weights[negated] *= -1
+
+        net = np.bincount(text_of, weights=weights, minlength=len(token_lists))
+        hits = np.bincount(text_of, weights=np.abs(weights), minlength=len(token_lists))
+        return net / (hits + self.smoothing)
+
+    def score_text(self, text):
+        return float(self.score_texts([text])[0])
+
+
+def score_unscored(db, scorer=None, batch_size=2000, limit=None, ticker_symbol=None):
+    """Score the articles in a NewsDatabase that have no sentiment yet
+
+    Articles are read in id order, a batch at a time, and each batch's
+    scores are written back in one transaction. The title is scored with
+    the text. Returns the number of articles scored.
+    """
+    scorer = scorer or SentimentScorer()
+    scored = 0
+    after_id = 0
+    started = time.monotonic()
+
+    print(f"{db.count_unscored()} articles without sentiment")
+
+    while limit is None or scored < limit:
+        size = batch_size if limit is None else min(batch_size, limit - scored)
+        articles = db.get_unscored_articles(size, after_id, ticker_symbol)
+        if not articles:
+            break
+        after_id = articles[-1][0]
+
+        scores = scorer.score_texts([f"{title or ''}\n{text or ''}" for article_id, title, text in articles])
+        scored += db.set_sentiments(zip(scores.tolist(), (article_id for article_id, title, text in articles)))
+
+        elapsed = time.monotonic() - started
+        print(f"Scored {scored} articles ({scored / elapsed if elapsed else 0:.0f}/s)")
+
+    return scored
@@ -1,44 +1,66 @@
 ﻿from datetime import datetime, timedelta
-import time
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from rate_limiter import get_rate_limiter
+from browser_pool import get_browser_pool
+from http_client import fetch_html
+from listing_parser import parse_results, parse_browser_results
+from url_normalizer import normalize_url
 
 def scrape_yahoo_finance_stock_news(ticker):
     """A simplified function to scrape Yahoo Finance stock news"""
     
-    # Initialize Chrome driver
-    service = Service(ChromeDriverManager().install())
-    browser = webdriver.Chrome(service=service)
-    
-    # Navigate to the stock page
     url = f'https://au.finance.yahoo.com/quote/{ticker}'
-    print(f"Navigating to {url}")
-    browser.get(url)
     
-    # Wait for page to load
-    time.sleep(5)
+    # Try a plain HTTP fetch first; the news panel is usually server-rendered
+    print(f"Fetching {url}")
+    html = fetch_html(url)
+    # Parse only the news panel rather than the whole page
+    panels = parse_results(html, 'div', id='tabpanel-news') if html else []
+    news_panel = panels[0] if panels else None
+    listing_path = 'http'
+    
+    if not news_panel:
+        listing_path = 'browser'
+        
+        # Lease a browser from the shared pool
+        with get_browser_pool().lease() as browser:
+            # Navigate to the stock page
+            print(f"Navigating to {url}")
+            get_rate_limiter().wait(url)
+            browser.get(url)
+            
+            # Wait for the news panel to load
+            try:
+                WebDriverWait(browser, 5).until(
+                    EC.presence_of_element_located((By.ID, "tabpanel-news"))
+                )
+            except TimeoutException:
+                print("News panel did not load in time")
+            
+            # Parse just the news panel out of the rendered page
+            panels = parse_browser_results(browser, '#tabpanel-news', 'div', id='tabpanel-news')
+            news_panel = panels[0] if panels else None
     
-    # Get page source and parse with BeautifulSoup
-    soup = BeautifulSoup(browser.page_source, 'html.parser')
+    print(f"Loaded quote page via {listing_path}")
     
     # Find all news links
     links = []
+    seen = set()
     
-    # Find the news panel
-    news_panel = soup.find('div', id='tabpanel-news')
     if news_panel:
         # Find all links in the news panel
         for link in news_panel.find_all('a'):
             href = link.get('href')
             if href and '/news/' in href:
-                if href not in links:
+                href = normalize_url(href, base=url)
+                if href not in seen:
+                    seen.add(href)
                     links.append(href)
     
-    browser.close()
-    
     # Save links to CSV
     with open(f"{ticker}_links.csv", "w") as f:
         f.write("article_link\n")
@@ -55,4 +77,4 @@ def scrape_yahoo_finance_stock_news(ticker):
 
 if __name__ == "__main__":
     ticker = "WOW.AX"  # Woolworths on ASX
-    scrape_yahoo_finance_stock_news(ticker)
+    scrape_yahoo_finance_stock_news(ticker)
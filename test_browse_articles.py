@@ -0,0 +1,64 @@
+﻿import io
+import os
+import sys
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+import browse_articles
+from news_database import NewsDatabase
+
+
+def run_browse(*args):
+    """Run browse_articles with the given command line, returning its output"""
+    output = io.StringIO()
+    argv = sys.argv
+    sys.argv = ['browse_articles.py'] + list(args)
+    try:
+        with redirect_stdout(output):
+            browse_articles.main()
+    finally:
+        sys.argv = argv
+    return output.getvalue()
+
+
+def test_stats():
+    """Check that the stats command prints a ticker's rollup"""
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    # browse_articles opens the default database in the working directory
+    os.chdir(work_dir)
+    try:
+        db = NewsDatabase()
+        db.add_articles([{
+            'ticker_symbol': 'WOW.AX', 'url': f'https://www.example.com/news/woolworths-{day}',
+            'title': f'Woolworths story {day}', 'date_published': f'2025-02-{day} 12:00:00+00:00',
+            'source': 'Example', 'author': 'Unknown',
+            'text': f'Story {day} about Woolworths results and supermarket sales. ' * (day * 3),
+        } for day in (24, 26)])
+
+        # No scores yet
+        output = run_browse('stats', 'WOW.AX')
+        assert 'Total articles: 2' in output, output
+        assert 'Date range: 2025-02-24 12:00:00 to 2025-02-26 12:00:00' in output, output
+        assert 'Average sentiment: N/A' in output, output
+        print("Stats shown for an unscored ticker")
+
+        ids = [row[0] for row in db.cursor.execute('SELECT id FROM articles ORDER BY id')]
+        db.set_sentiments(zip((0.25, 0.5), ids))
+        db.close()
+
+        output = run_browse('stats', 'WOW.AX')
+        assert 'Average sentiment: 0.38' in output, output
+        print("Stats shown with the average sentiment")
+
+        output = run_browse('stats', 'ZZZ.AX')
+        assert 'No data found for ticker ZZZ.AX' in output, output
+        print("Unknown ticker reported")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_stats()
+    print("Browse articles test complete!")
@@ -0,0 +1,247 @@
+﻿import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from news_database import NewsDatabase
+from near_duplicates import fingerprinting_available
+
+WORDS = ('Woolworths Coles supermarket shares profit revenue guidance quarter analysts investors market '
+         'dividend earnings growth sales margin costs inflation prices customers online stores results '
+         'the a of to in and for on with as by from said reported expects higher lower rose fell percent '
+         'billion million year half first second chief executive officer company group retail food').split()
+
+
+def make_text(seed, words=600):
+    """Article-like text: sentences of words drawn from a small vocabulary"""
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        length = rng.randint(8, 20)
+        sentences.append(' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.')
+        words -= length
+    return ' '.join(sentences)
+
+
+def test_compressed_bodies():
+    """Check that bodies migrated out of articles read back unchanged and take less space"""
+    work_dir = tempfile.mkdtemp()
+    path = os.path.join(work_dir, 'news.db')
+    try:
+        # A database from before article_bodies, with the text inline
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE tickers (id INTEGER PRIMARY KEY, symbol TEXT UNIQUE, name TEXT, exchange TEXT, '
+                     'last_updated TIMESTAMP)')
+        conn.execute('CREATE TABLE articles (id INTEGER PRIMARY KEY, ticker_id INTEGER, url TEXT UNIQUE, title TEXT, '
+                     'date_published TIMESTAMP, source TEXT, author TEXT, text TEXT, summary TEXT, sentiment REAL, '
+                     'fetch_date TIMESTAMP)')
+        conn.execute("INSERT INTO tickers (symbol) VALUES ('WOW.AX')")
+        texts = [make_text(i) for i in range(50)]
+        conn.executemany(
+            'INSERT INTO articles (ticker_id, url, title, date_published, source, author, text, fetch_date) '
+            "VALUES (1, ?, ?, '2025-02-26 10:00:00', 'Yahoo Finance', 'Unknown', ?, '2025-02-26 11:00:00')",
+            [(f'https://finance.yahoo.com/news/story-{i}.html', f'Story {i}', text) for i, text in enumerate(texts)]
+        )
+        conn.commit()
+        conn.close()
+
+        db = NewsDatabase(path)
+        try:
+            for article_id, text in enumerate(texts, 1):
+                assert db.get_article_text(article_id) == text, article_id
+                assert db.get_article(article_id)[6] == text, article_id
+            print("Migrated bodies read back unchanged")
+
+            raw_size = sum(len(text.encode('utf-8')) for text in texts)
+            stored_size = db.cursor.execute('SELECT SUM(length(text)) FROM article_bodies').fetchone()[0]
+            assert stored_size < raw_size / 2, (stored_size, raw_size)
+            print(f"Bodies stored in {stored_size} bytes instead of {raw_size}")
+
+            # New articles are compressed the same way
+            text = make_text(100)
+            db.add_articles([{
+                'ticker_symbol': 'WOW.AX', 'url': 'https://finance.yahoo.com/news/story-new.html',
+                'title': 'New story', 'date_published': '2025-02-27', 'source': 'Yahoo Finance',
+                'author': 'Unknown', 'text': text,
+            }])
+            article_id = db.cursor.execute(
+                "SELECT id FROM articles WHERE url = 'https://finance.yahoo.com/news/story-new.html'").fetchone()[0]
+            assert db.get_article_text(article_id) == text
+            stored = db.cursor.execute('SELECT length(text) FROM article_bodies WHERE article_id = ?',
+                                       (article_id,)).fetchone()[0]
+            assert stored < len(text.encode('utf-8')) / 2, stored
+            print("New bodies round-trip compressed")
+        finally:
+            db.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_keyset_pages():
+    """Check that pages cover a listing in order and deep pages seek the index"""
+    work_dir = tempfile.mkdtemp()
+    db = NewsDatabase(os.path.join(work_dir, 'news.db'))
+    try:
+        ticker_id = db.get_ticker_ids(['WOW.AX'])['WOW.AX']
+        # Several articles per date, and undated ones, which are listed last
+        rows = [(ticker_id, f'https://finance.yahoo.com/news/story-{i}.html', f'Story {i}',
+                 None if i % 50 == 0 else f'2025-01-01 00:{i // 100 % 60:02d}:{i // 6000:02d}')
+                for i in range(12000)]
+        with db.conn:
+            db.cursor.executemany('INSERT INTO articles (ticker_id, url, title, date_published) VALUES (?, ?, ?, ?)',
+                                  rows)
+        expected = [row[0] for row in db.cursor.execute(
+            'SELECT id FROM articles WHERE ticker_id = ? ORDER BY date_published DESC, id DESC', (ticker_id,))]
+
+        listed = []
+        after = None
+        while True:
+            page, after = db.get_article_page('WOW.AX', ('id',), after=after, page_size=500)
+            listed += [article_id for article_id, in page]
+            if after is None:
+                break
+        assert listed == expected, "pages don't match the listing order"
+        # 12000 rows make exactly 24 pages, and no empty 25th page is offered
+        assert db.find_page_cursor('WOW.AX', 24, 500) is not None
+        assert db.find_page_cursor('WOW.AX', 25, 500) is None
+        print(f"{len(listed)} articles listed in order over {len(listed) // 500} pages")
+
+        # The queries for a deep page range-seek the (ticker_id, date_published) index
+        statements = []
+        db.conn.set_trace_callback(statements.append)
+        deep = db.make_page_cursor(*db.cursor.execute(
+            'SELECT date_published, id FROM articles WHERE id = ?', (expected[11000],)).fetchone())
+        page, _ = db.get_article_page('WOW.AX', ('id',), after=deep, page_size=500)
+        db.conn.set_trace_callback(None)
+        assert [article_id for article_id, in page] == expected[11001:11501]
+        plans = [' '.join(row[-1] for row in db.conn.execute('EXPLAIN QUERY PLAN ' + statement))
+                 for statement in statements if statement.lstrip().startswith('SELECT a.id')]
+        assert any('date_published<?' in plan for plan in plans), plans
+        assert all('idx_article_ticker_date' in plan for plan in plans), plans
+        print("Deep pages seek the index")
+    finally:
+        db.close()
+        shutil.rmtree(work_dir)
+
+
+def check_ticker_stats(db):
+    """Compare ticker_stats with the same figures recomputed from articles"""
+    stats = {row[0]: row[1:] for row in db.cursor.execute(
+        'SELECT ticker_id, article_count, oldest_date, newest_date, sentiment_sum, sentiment_count '
+        'FROM ticker_stats WHERE article_count > 0')}
+    expected = {row[0]: row[1:] for row in db.cursor.execute(
+        'SELECT ticker_id, COUNT(*), MIN(date_published), MAX(date_published), coalesce(SUM(sentiment), 0), '
+        'COUNT(sentiment) FROM articles GROUP BY ticker_id')}
+    assert stats.keys() == expected.keys(), (stats, expected)
+    for ticker_id, (count, oldest, newest, total, scored) in expected.items():
+        row = stats[ticker_id]
+        assert row[:3] == (count, oldest, newest) and row[4] == scored, (ticker_id, row, expected[ticker_id])
+        assert abs(row[3] - total) < 1e-9, (ticker_id, row, expected[ticker_id])
+
+
+def test_ticker_stats():
+    """Check that the ticker_stats triggers follow inserts, updates, moves and deletes"""
+    work_dir = tempfile.mkdtemp()
+    db = NewsDatabase(os.path.join(work_dir, 'news.db'))
+    try:
+        ids = db.get_ticker_ids(['WOW.AX', 'COL.AX'])
+        rng = random.Random(7)
+        rows = [(ids['WOW.AX'], f'https://finance.yahoo.com/news/story-{i}.html', f'Story {i}',
+                 None if i % 9 == 0 else f'2025-02-{1 + i % 28:02d} 10:00:00', None)
+                for i in range(200)]
+        with db.conn:
+            db.cursor.executemany('INSERT INTO articles (ticker_id, url, title, date_published, sentiment) '
+                                  'VALUES (?, ?, ?, ?, ?)', rows)
+        check_ticker_stats(db)
+        print("Stats follow inserts")
+
+        article_ids = [row[0] for row in db.cursor.execute('SELECT id FROM articles ORDER BY id')]
+        db.set_sentiments((rng.uniform(-1, 1), article_id) for article_id in article_ids[::2])
+        with db.conn:
+            db.cursor.executemany('UPDATE articles SET date_published = ? WHERE id = ?',
+                                  [(f'2024-12-{1 + i % 28:02d} 09:00:00', article_id)
+                                   for i, article_id in enumerate(article_ids[::7])])
+            db.cursor.executemany('UPDATE articles SET ticker_id = ? WHERE id = ?',
+                                  [(ids['COL.AX'], article_id) for article_id in article_ids[::3]])
+            db.cursor.executemany('DELETE FROM articles WHERE id = ?', [(article_id,) for article_id in article_ids[::5]])
+        check_ticker_stats(db)
+        print("Stats follow sentiment, date and ticker updates and deletes")
+
+        # Taking every scored article out again leaves no rounding error behind
+        db.clear_sentiments()
+        with db.conn:
+            db.cursor.execute('DELETE FROM articles')
+        check_ticker_stats(db)
+        leftover = db.cursor.execute('SELECT sentiment_sum, sentiment_count FROM ticker_stats').fetchall()
+        assert all(row == (0, 0) for row in leftover), leftover
+        print("Sentiment sums return to exactly 0")
+    finally:
+        db.close()
+        shutil.rmtree(work_dir)
+
+
+def test_clusters():
+    """Check that near-duplicates share the first copy's body, and keep it through updates and deletes"""
+    if not fingerprinting_available():
+        print("NumPy isn't installed, skipping the cluster test")
+        return
+    work_dir = tempfile.mkdtemp()
+    db = NewsDatabase(os.path.join(work_dir, 'news.db'))
+    try:
+        def article(name, text, summary=None):
+            return {'ticker_symbol': 'WOW.AX', 'url': f'https://www.example.com/news/{name}', 'title': name,
+                    'date_published': '2025-02-26 10:00:00', 'source': 'Example', 'author': 'Unknown',
+                    'text': text, 'summary': summary}
+
+        def article_id(name):
+            return db.cursor.execute('SELECT id FROM articles WHERE url = ?',
+                                     (f'https://www.example.com/news/{name}',)).fetchone()[0]
+
+        def cluster_of(name):
+            return db.cursor.execute('SELECT cluster_id FROM articles WHERE id = ?', (article_id(name),)).fetchone()[0]
+
+        def has_body(name):
+            return db.cursor.execute('SELECT 1 FROM article_bodies WHERE article_id = ?',
+                                     (article_id(name),)).fetchone() is not None
+
+        text = make_text(1)
+        # Syndicated copies: the same story with a different sign-off
+        db.add_articles([article('original', text, 'First summary')])
+        db.add_articles([article('copy-1', text + ' Reporting by a wire service.'),
+                         article('copy-2', text + ' Additional reporting by staff.')])
+        assert db.add_articles([article('other', make_text(2))]) == 1
+        for name in ('copy-1', 'copy-2'):
+            assert cluster_of(name) == article_id('original'), name
+            assert not has_body(name), name
+            assert db.get_article_text(article_id(name)) == text, name
+            assert db.get_article(article_id(name))[7] == 'First summary', name
+        assert cluster_of('other') is None and has_body('other')
+        print("Near-duplicates are linked and share the first copy's body and summary")
+
+        # Re-fetching the first copy with new text and summary reaches its copies
+        updated = make_text(3)
+        db.add_articles([article('original', updated, 'Second summary')])
+        for name in ('copy-1', 'copy-2'):
+            assert db.get_article_text(article_id(name)) == updated, name
+            assert db.get_article(article_id(name))[7] == 'Second summary', name
+        print("Updates of the first copy reach the others")
+
+        # Deleting the first copy hands its body to the oldest remaining copy
+        with db.conn:
+            db.cursor.execute('DELETE FROM articles WHERE id = ?', (article_id('original'),))
+        assert cluster_of('copy-1') is None and has_body('copy-1')
+        assert cluster_of('copy-2') == article_id('copy-1') and not has_body('copy-2')
+        for name in ('copy-1', 'copy-2'):
+            assert db.get_article_text(article_id(name)) == updated, name
+        print("Deleting the first copy hands its body over")
+    finally:
+        db.close()
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_compressed_bodies()
+    test_keyset_pages()
+    test_ticker_stats()
+    test_clusters()
+    print("News database test complete!")
@@ -0,0 +1,123 @@
+﻿import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from html_cache import HtmlCache
+from http_client import download_html, fetch_html, NotModified
+from rate_limiter import HostRateLimiter
+
+# Served by the stand-in server; change it to simulate an updated article
+PAGE = {'body': '<html><body><p>First version</p></body></html>', 'etag': '"v1"'}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves PAGE with an ETag and answers matching conditional requests with 304"""
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == PAGE['etag']:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = PAGE['body'].encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', PAGE['etag'])
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_revalidation():
+    """Check that re-fetches send validators and stop on 304"""
+    server = HTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/article'
+    listing_url = f'http://127.0.0.1:{server.server_port}/listing'
+
+    cache_dir = tempfile.mkdtemp()
+    cache = HtmlCache(cache_dir)
+    limiter = HostRateLimiter(default_rate=1000, default_burst=1000)
+
+    try:
+        # First fetch downloads the page and stores its ETag
+        html = download_html(url, cache=cache, rate_limiter=limiter)
+        assert 'First version' in html
+        assert cache.conditional_headers(url) == {'If-None-Match': '"v1"'}
+        print("Initial download stored the ETag")
+
+        # Unchanged page: the revalidation gets a 304
+        try:
+            download_html(url, cache=cache, rate_limiter=limiter, revalidate=True)
+            raise AssertionError("Expected NotModified for an unchanged page")
+        except NotModified:
+            print("Unchanged page raised NotModified")
+
+        # Updated page: the new body and ETag replace the old ones
+        PAGE['body'] = '<html><body><p>Second version</p></body></html>'
+        PAGE['etag'] = '"v2"'
+        html = download_html(url, cache=cache, rate_limiter=limiter, revalidate=True)
+        assert 'Second version' in html
+        assert cache.get(url).html == html
+        assert cache.conditional_headers(url) == {'If-None-Match': '"v2"'}
+        print("Updated page was downloaded again")
+
+        # Listing pages keep validators only
+        assert fetch_html(listing_url, rate_limiter=limiter, cache=cache) is not None
+        assert cache.get(listing_url) is None
+        try:
+            fetch_html(listing_url, rate_limiter=limiter, cache=cache)
+            raise AssertionError("Expected NotModified for an unchanged listing")
+        except NotModified:
+            print("Unchanged listing raised NotModified")
+    finally:
+        server.shutdown()
+        cache.close()
+        shutil.rmtree(cache_dir)
+
+
+def test_old_cache_keys():
+    """Check that a cache keyed by the old URL normalization is re-keyed when opened"""
+    cache_dir = tempfile.mkdtemp()
+    # Regional Yahoo hosts were separate keys; they are now one story
+    au_url = 'https://au.finance.yahoo.com/news/woolworths-results-044323455.html?.tsrc=rss'
+    uk_url = 'https://uk.finance.yahoo.com/news/woolworths-results-044323455.html'
+    try:
+        cache = HtmlCache(cache_dir, max_age_days=None)
+        older = cache.put(au_url, '<html><body><p>Older copy</p></body></html>')
+        newer = cache.put(uk_url, '<html><body><p>Newer copy</p></body></html>')
+        # Rewrite the index the way an older version left it
+        with cache.conn:
+            cache.conn.execute('DELETE FROM pages')
+            cache.conn.execute('DELETE FROM validators')
+            cache.conn.executemany(
+                'INSERT INTO pages (url, original_url, content_hash, size, fetched_at, status, headers, extra) '
+                "VALUES (?, ?, ?, 0, ?, 200, '{}', '{}')",
+                [(au_url, au_url, older, 1000.0), (uk_url, uk_url, newer, 2000.0)]
+            )
+            cache.conn.executemany('INSERT INTO validators (url, etag, checked_at) VALUES (?, ?, ?)',
+                                   [(au_url, '"older"', 1000.0), (uk_url, '"newer"', 2000.0)])
+            cache.conn.execute('PRAGMA user_version = 0')
+        cache.close()
+
+        cache = HtmlCache(cache_dir, max_age_days=None)
+        try:
+            for url in (au_url, uk_url, 'https://finance.yahoo.com/news/woolworths-results-044323455.html'):
+                assert 'Newer copy' in cache.get(url).html, url
+                assert cache.conditional_headers(url) == {'If-None-Match': '"newer"'}, url
+            assert cache.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0] == 1
+            assert cache.conn.execute('SELECT COUNT(*) FROM validators').fetchone()[0] == 1
+            print("Old cache keys were merged under the normalized URL, keeping the newest page")
+        finally:
+            cache.close()
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    test_revalidation()
+    test_old_cache_keys()
+    print("Revalidation test complete!")
@@ -0,0 +1,206 @@
+﻿import os
+import shutil
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from url_normalizer import normalize_url, canonical_link
+
+# (link, base, expected) for each per-source rule
+CASES = [
+    # Relative Yahoo links, regional hosts and Yahoo's tracking parameters
+    ('/news/woolworths-results-044323455.html?.tsrc=rss', 'https://au.finance.yahoo.com/quote/WOW.AX',
+     'https://finance.yahoo.com/news/woolworths-results-044323455.html'),
+    ('https://au.finance.yahoo.com/news/woolworths-results-044323455.html/', None,
+     'https://finance.yahoo.com/news/woolworths-results-044323455.html'),
+    ('https://uk.finance.yahoo.com/amphtml/news/woolworths-results-044323455.html?guccounter=1', None,
+     'https://finance.yahoo.com/news/woolworths-results-044323455.html'),
+    # Reuters article paths end in a slash, and AMP is a query parameter
+    ('/markets/asia/woolworths-profit-2025-02-26', 'https://www.reuters.com',
+     'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26/'),
+    ('https://reuters.com/markets/asia/woolworths-profit-2025-02-26/?outputType=amp&utm_source=twitter', None,
+     'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26/'),
+    # FT: relative links, AMP subdomain and Google's AMP cache
+    ('/content/8d7c3f4e-1b2a-4c5d-9e8f-0a1b2c3d4e5f?accessToken=abc&sharetype=gift', 'https://www.ft.com',
+     'https://www.ft.com/content/8d7c3f4e-1b2a-4c5d-9e8f-0a1b2c3d4e5f'),
+    ('https://amp.ft.com/content/8d7c3f4e-1b2a-4c5d-9e8f-0a1b2c3d4e5f', None,
+     'https://www.ft.com/content/8d7c3f4e-1b2a-4c5d-9e8f-0a1b2c3d4e5f'),
+    ('https://www-ft-com.cdn.ampproject.org/c/s/www.ft.com/content/8d7c3f4e-1b2a-4c5d-9e8f-0a1b2c3d4e5f', None,
+     'https://www.ft.com/content/8d7c3f4e-1b2a-4c5d-9e8f-0a1b2c3d4e5f'),
+    # MarketWatch and Barron's tag search results with ?mod=
+    ('https://www.marketwatch.com/amp/story/woolworths-shares-fall-2025-02-26?mod=search_headline', None,
+     'https://www.marketwatch.com/story/woolworths-shares-fall-2025-02-26'),
+    ('http://barrons.com/articles/woolworths-stock-51740000000?mod=hp_minor', None,
+     'https://www.barrons.com/articles/woolworths-stock-51740000000'),
+    # Seeking Alpha
+    ('/article/4712345-woolworths-valuation?source=feed_all', 'https://seekingalpha.com',
+     'https://seekingalpha.com/article/4712345-woolworths-valuation'),
+    # Other sites: only tracking parameters go, the rest are sorted
+    ('HTTPS://News.Example.com:443/story/123/?b=2&utm_medium=email&a=1#comments', None,
+     'https://news.example.com/story/123?a=1&b=2'),
+    ('http://127.0.0.1:8000/news/article.html', None, 'http://127.0.0.1:8000/news/article.html'),
+    # AMP-looking paths are only rewritten on sites known to serve AMP pages
+    ('//news.example.com/story/123.amp.html', None, 'https://news.example.com/story/123.amp.html'),
+    ('https://www.example.com/blog/amp/', None, 'https://www.example.com/blog/amp'),
+    ('https://seekingalpha.com/amp/article/4712345-woolworths-valuation', None,
+     'https://seekingalpha.com/article/4712345-woolworths-valuation'),
+]
+
+
+def test_normalize_url():
+    """Check the per-source rules"""
+    for link, base, expected in CASES:
+        result = normalize_url(link, base=base)
+        assert result == expected, f"{link}: expected {expected}, got {result}"
+        # Normalizing again changes nothing
+        assert normalize_url(result) == result, f"{result} is not stable"
+    print(f"Normalized {len(CASES)} links")
+
+    # Links that aren't web pages are left alone
+    for link in (None, '', 'mailto:news@example.com', 'javascript:void(0)'):
+        assert normalize_url(link) == link
+    print("Non-web links were left as they are")
+
+
+def test_canonical_link():
+    """Check the canonical URL stored as an article's dedup key"""
+    url = 'https://au.finance.yahoo.com/news/woolworths-results-044323455.html'
+
+    # A syndicated page names the original as its canonical URL
+    assert canonical_link(url, 'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26?taid=1') == \
+        'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26/'
+
+    # No canonical URL, or one pointing at the home page, falls back to the page's own
+    expected = 'https://finance.yahoo.com/news/woolworths-results-044323455.html'
+    for declared in (None, '', '/', 'https://finance.yahoo.com/'):
+        assert canonical_link(url, declared) == expected, declared
+    print("Canonical links resolved")
+
+
+def test_stored_variants():
+    """Check that stored articles are found by any variant of their URL"""
+    from news_database import NewsDatabase
+
+    work_dir = tempfile.mkdtemp()
+    db = NewsDatabase(os.path.join(work_dir, 'news.db'))
+    try:
+        text = 'Woolworths reported higher first half sales. ' * 20
+        written = db.add_articles([{
+            'ticker_symbol': 'WOW.AX', 'url': 'https://au.finance.yahoo.com/news/woolworths-results-044323455.html',
+            'canonical_url': 'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26/',
+            'title': 'Woolworths results', 'date_published': '2025-02-26', 'source': 'Yahoo Finance',
+            'author': 'Unknown', 'text': text,
+        }])
+        assert written == 1, written
+
+        for variant in ('https://finance.yahoo.com/news/woolworths-results-044323455.html?.tsrc=rss',
+                        'https://uk.finance.yahoo.com/amphtml/news/woolworths-results-044323455.html',
+                        'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26?utm_source=twitter'):
+            assert db.url_exists(variant), variant
+        assert not db.url_exists('https://finance.yahoo.com/news/other-story-1.html')
+        print("Stored article found by its URL variants and canonical URL")
+
+        # The same page listed under its canonical URL isn't stored twice
+        written = db.add_articles([{
+            'ticker_symbol': 'WOW.AX', 'url': 'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26',
+            'title': 'Woolworths profit', 'date_published': '2025-02-26', 'source': 'Reuters',
+            'author': 'Unknown', 'text': text,
+        }])
+        assert written == 0, f"skipped article counted as written ({written})"
+        count = db.cursor.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+        assert count == 1, f"expected 1 stored article, found {count}"
+        print("Page with an already stored canonical URL was skipped")
+
+        # A page under another URL that names the stored one as canonical is
+        # reported as known, and its URL is kept as an alias
+        known = []
+        written = db.add_articles([{
+            'ticker_symbol': 'WOW.AX', 'url': 'https://www.marketwatch.com/story/woolworths-profit-rises',
+            'canonical_url': 'https://www.reuters.com/markets/asia/woolworths-profit-2025-02-26/',
+            'title': 'Woolworths profit rises', 'date_published': '2025-02-26', 'source': 'MarketWatch',
+            'author': 'Unknown', 'text': text,
+        }], known=known)
+        assert written == 0, written
+        assert known == ['https://www.marketwatch.com/story/woolworths-profit-rises'], known
+        assert db.url_exists('https://www.marketwatch.com/story/woolworths-profit-rises?mod=mw_latestnews')
+        db.close()
+        db = NewsDatabase(os.path.join(work_dir, 'news.db'))
+        assert db.url_exists('https://www.marketwatch.com/story/woolworths-profit-rises')
+        print("Skipped page's URL recorded as an alias")
+    finally:
+        db.close()
+        shutil.rmtree(work_dir)
+
+
+# Paths served by the stand-in server; the syndicated page names the story as canonical
+STORY_PATHS = ('/news/story', '/syndicated/story')
+STORY_BODY = ''.join(f'<p>Woolworths reported a {n} per cent rise in first half sales as shoppers returned to '
+                     'its supermarkets, and said online orders kept growing through the quarter.</p>'
+                     for n in range(3, 12))
+
+
+class StoryHandler(BaseHTTPRequestHandler):
+    """Serves one story under two URLs, recording every request"""
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path not in STORY_PATHS:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        canonical = f'http://127.0.0.1:{self.server.server_port}{STORY_PATHS[0]}'
+        body = (f'<html><head><title>Woolworths sales rise</title><link rel="canonical" href="{canonical}">'
+                f'</head><body><article><h1>Woolworths sales rise</h1>{STORY_BODY}</article></body></html>')
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_canonical_aliases():
+    """Check that a page fetched under a second URL is known, not failed, and isn't fetched again"""
+    from article_fetcher import ArticleFetcher
+    from rate_limiter import HostRateLimiter
+
+    server = HTTPServer(('127.0.0.1', 0), StoryHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{server.server_port}{path}' for path in STORY_PATHS]
+    work_dir = tempfile.mkdtemp()
+    limiter = HostRateLimiter(default_rate=1000, default_burst=1000)
+
+    try:
+        for run in (1, 2):
+            # A new fetcher each run, as each scrape is a new process
+            fetcher = ArticleFetcher(os.path.join(work_dir, 'news.db'), rate_limiter=limiter, cache_dir=None)
+            try:
+                StoryHandler.requests.clear()
+                success_count, fail_count = fetcher.fetch_articles(urls, 'WOW.AX')
+                assert fail_count == 0, f"run {run}: {fail_count} failures"
+                assert all(fetcher.db.url_exists(url) for url in urls), run
+                if run == 1:
+                    assert success_count == 1, success_count
+                    assert StoryHandler.requests == list(STORY_PATHS), StoryHandler.requests
+                else:
+                    assert success_count == 0, success_count
+                    assert StoryHandler.requests == [], StoryHandler.requests
+            finally:
+                fetcher.close()
+        print("Second URL of a stored page is known on the first run and not downloaded on the next")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    test_normalize_url()
+    test_canonical_link()
+    test_stored_variants()
+    test_canonical_aliases()
+    print("URL normalizer test complete!")
@@ -0,0 +1,121 @@
+﻿import math
+import sqlite3
+import hashlib
+import threading
+
+# Above this many stored URLs the index switches from a set to a Bloom filter
+BLOOM_THRESHOLD = 1000000
+
+# Every stored article URL, each canonical URL that differs from its article's
+# URL, and the other URLs the same pages were found under
+STORED_URLS_SQL = '''
+SELECT url FROM articles
+UNION ALL
+SELECT canonical_url FROM articles WHERE canonical_url IS NOT NULL AND canonical_url <> url
+UNION ALL
+SELECT url FROM article_aliases
+'''
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter for strings"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: derive k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class UrlIndex:
+    """In-memory index of article URLs that are already stored
+
+    The index holds article URLs, canonical URLs and aliases. It is loaded once from
+    the database and kept in sync as articles are added, so checking a URL
+    costs no database round trip. Small stores are held in a set. Large
+    stores are held in a Bloom filter, and a positive match is confirmed
+    against the database to rule out false positives.
+    The index can be shared between threads, e.g. listing and fetch stages.
+    """
+
+    def __init__(self, db_name, bloom_threshold=BLOOM_THRESHOLD):
+        self.db_name = db_name
+        self.bloom_threshold = bloom_threshold
+        self.lock = threading.Lock()
+        self.urls = set()
+        self.bloom = None
+        self._conn = None
+        self.load()
+
+    def load(self):
+        """Load every stored URL from the database"""
+        conn = self._connection()
+        with self.lock:
+            count = conn.execute('SELECT (SELECT COUNT(*) FROM articles) + '
+                                 '(SELECT COUNT(*) FROM article_aliases)').fetchone()[0]
+            self.urls = set()
+            self.bloom = None
+
+            if count > self.bloom_threshold:
+                # Leave room for canonical URLs, and for the store to keep
+                # growing during the run
+                self.bloom = BloomFilter(count * 3)
+                for (url,) in conn.execute(STORED_URLS_SQL):
+                    self.bloom.add(url)
+            else:
+                self.urls = {url for (url,) in conn.execute(STORED_URLS_SQL)}
+
+    def _connection(self):
+        """Separate read connection, so the index can be used from any thread"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        return self._conn
+
+    def add(self, url):
+        """Record a URL as stored"""
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(url)
+            # URLs added during the run are also kept exactly, so they never
+            # need a database confirmation
+            self.urls.add(url)
+
+    def add_many(self, urls):
+        """Record several URLs as stored"""
+        for url in urls:
+            self.add(url)
+
+    def __contains__(self, url):
+        if url in self.urls:
+            return True
+        if self.bloom is None or url not in self.bloom:
+            return False
+
+        # Possible Bloom filter false positive, confirm with the database
+        with self.lock:
+            row = self._connection().execute(
+                'SELECT 1 FROM articles WHERE url = ?1 OR canonical_url = ?1 '
+                'UNION ALL SELECT 1 FROM article_aliases WHERE url = ?1', (url,)
+            ).fetchone()
+        return row is not None
+
+    def close(self):
+        """Close the read connection"""
+        if self._conn:
+            self._conn.close()
+            self._conn = None
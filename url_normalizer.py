@@ -0,0 +1,128 @@
+﻿import re
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only say where a click came from (or ask for the
+# AMP version). Other parameters on unknown sites are kept, as they may
+# pick the page.
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'ncid', 'soc_src', 'soc_trk', '.tsrc', 'tsrc',
+    'guccounter', 'cmpid', 'taid', 'ftcamp', 'mailingid', 'mbid', 'smid', 'xtor', 'amp', 'outputtype',
+}
+TRACKING_PREFIXES = ('utm_', 'guce_', 'mc_', 'pk_', 'itm_', 'at_')
+
+# Per-source rules, keyed by the domain they apply to (and its subdomains):
+#   host: the host every variant of the site is rewritten to, so regional,
+#       mobile and AMP subdomains (au.finance.yahoo.com, amp.ft.com) match
+#   trailing_slash: whether the site's article paths end in '/'
+#   amp: whether the site serves AMP variants of its article paths, which
+#       are rewritten to the article's path (see AMP_SEGMENT_RE)
+# Article URLs on these sites are identified by their path alone, so the
+# whole query string is dropped.
+SOURCE_RULES = {
+    'finance.yahoo.com': {'host': 'finance.yahoo.com', 'trailing_slash': False, 'amp': True},
+    'reuters.com': {'host': 'www.reuters.com', 'trailing_slash': True, 'amp': False},
+    'marketwatch.com': {'host': 'www.marketwatch.com', 'trailing_slash': False, 'amp': True},
+    'barrons.com': {'host': 'www.barrons.com', 'trailing_slash': False, 'amp': True},
+    'ft.com': {'host': 'www.ft.com', 'trailing_slash': False, 'amp': False},
+    'seekingalpha.com': {'host': 'seekingalpha.com', 'trailing_slash': False, 'amp': True},
+    'bloomberg.com': {'host': 'www.bloomberg.com', 'trailing_slash': False, 'amp': False},
+}
+
+# Pages served from Google's AMP cache, e.g.
+# https://www-ft-com.cdn.ampproject.org/c/s/www.ft.com/content/...
+AMP_CACHE_SUFFIX = '.cdn.ampproject.org'
+AMP_CACHE_PATH_RE = re.compile(r'^/[cv]/(s/)?([^/]+)(/.*)?$')
+# AMP variants of a page's path: /amp/story/..., /amphtml/news/..., .../amp, .amp.html.
+# Only applied to sites whose rule sets 'amp', as elsewhere they may be real paths.
+AMP_SEGMENT_RE = re.compile(r'/amp(html)?(?=/)')
+AMP_SUFFIX_RE = re.compile(r'(/amp|\.amp)$')
+AMP_EXTENSION_RE = re.compile(r'\.amp\.html$')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _source_rule(host):
+    for domain, rule in SOURCE_RULES.items():
+        if host == domain or host.endswith('.' + domain):
+            return rule
+    return None
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url, base=None):
+    """Turn an article link into the canonical form used as its identity
+
+    Relative links are resolved against base. The host is lowercased, the
+    fragment, default port and tracking parameters are removed, pages from
+    Google's AMP cache are unwrapped, and the remaining query parameters are
+    sorted. Known news sites (see SOURCE_RULES) also get one host, https, no
+    query string, their own trailing slash convention and, for sites that
+    serve them, AMP paths rewritten to the article's. Links that aren't
+    http(s) are returned as they are.
+    """
+    if not url:
+        return url
+
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+    elif url.startswith('//'):
+        url = 'https:' + url
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower()
+    path = parts.path or '/'
+
+    # Unwrap pages served from the AMP cache into the publisher's URL
+    if host.endswith(AMP_CACHE_SUFFIX):
+        match = AMP_CACHE_PATH_RE.match(path)
+        if match:
+            scheme = 'https' if match.group(1) else 'http'
+            host = match.group(2).lower()
+            path = match.group(3) or '/'
+
+    rule = _source_rule(host)
+    if rule:
+        scheme = 'https'
+        host = rule['host']
+        query = ''
+        if rule['amp']:
+            path = AMP_EXTENSION_RE.sub('.html', AMP_SUFFIX_RE.sub('', AMP_SEGMENT_RE.sub('', path))) or '/'
+        if path != '/':
+            path = path.rstrip('/') + ('/' if rule['trailing_slash'] else '')
+    else:
+        params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                  if not _is_tracking(name)]
+        query = urlencode(sorted(params))
+        if path != '/':
+            path = path.rstrip('/')
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS[scheme] and not rule:
+        netloc = f'{host}:{parts.port}'
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def canonical_link(url, declared=None):
+    """The canonical URL of an article, used to spot the same page under two URLs
+
+    declared is the page's own <link rel="canonical"> (newspaper3k's
+    Article.canonical_link), normalized and resolved against url. Pages
+    that declare no canonical URL, or the site's home page, get their own
+    normalized URL.
+    """
+    if declared:
+        canonical = normalize_url(declared, base=url)
+        parts = urlsplit(canonical)
+        if parts.scheme in DEFAULT_PORTS and parts.path not in ('', '/'):
+            return canonical
+    return normalize_url(url)